@@ -0,0 +1,68 @@
+"""
+Synthetic inputs for benchmarks.
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+
+def icosphere(subdivisions: int = 6, radius: float = 100.0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Create a sphere mesh by subdividing an icosahedron.
+
+    With the default of 6 subdivisions, it has the same size as a standard CIVET
+    surface: 40962 vertices and 81920 triangles.
+
+    :returns: points and triangles
+    """
+    t = (1 + 5 ** 0.5) / 2
+    points = [
+        (-1, t, 0), (1, t, 0), (-1, -t, 0), (1, -t, 0),
+        (0, -1, t), (0, 1, t), (0, -1, -t), (0, 1, -t),
+        (t, 0, -1), (t, 0, 1), (-t, 0, -1), (-t, 0, 1),
+    ]
+    triangles = [
+        (0, 11, 5), (0, 5, 1), (0, 1, 7), (0, 7, 10), (0, 10, 11),
+        (1, 5, 9), (5, 11, 4), (11, 10, 2), (10, 7, 6), (7, 1, 8),
+        (3, 9, 4), (3, 4, 2), (3, 2, 6), (3, 6, 8), (3, 8, 9),
+        (4, 9, 5), (2, 4, 11), (6, 2, 10), (8, 6, 7), (9, 8, 1),
+    ]
+    for _ in range(subdivisions):
+        midpoints: dict[tuple[int, int], int] = {}
+
+        def midpoint(a: int, b: int) -> int:
+            key = (min(a, b), max(a, b))
+            if key not in midpoints:
+                midpoints[key] = len(points)
+                pa, pb = points[a], points[b]
+                points.append(tuple((x + y) / 2 for x, y in zip(pa, pb)))
+            return midpoints[key]
+
+        refined = []
+        for a, b, c in triangles:
+            ab, bc, ca = midpoint(a, b), midpoint(b, c), midpoint(c, a)
+            refined.extend(((a, ab, ca), (b, bc, ab), (c, ca, bc), (ab, bc, ca)))
+        triangles = refined
+
+    p = np.array(points, dtype=np.float64)
+    p *= radius / np.linalg.norm(p, axis=1, keepdims=True)
+    return p.astype(np.float32), np.array(triangles, dtype=np.int32)
+
+
+def write_sphere_obj(path: Path, subdivisions: int = 6, radius: float = 100.0) -> Path:
+    """
+    Write an icosphere to an ASCII MNI .obj file.
+    """
+    points, triangles = icosphere(subdivisions, radius)
+    normals = points / np.linalg.norm(points, axis=1, keepdims=True)
+    with path.open('w') as f:
+        f.write(f'P 0.3 0.3 0.4 10 1 {len(points)}\n')
+        np.savetxt(f, points, fmt='%g')
+        f.write('\n')
+        np.savetxt(f, normals, fmt='%g')
+        f.write(f'\n{len(triangles)}\n0 1 1 1 1\n\n')
+        np.savetxt(f, np.arange(3, 3 * len(triangles) + 1, 3).reshape(-1, 8), fmt='%d')
+        f.write('\n')
+        np.savetxt(f, triangles.reshape(-1, 8), fmt='%d')
+    return path
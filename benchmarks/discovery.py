@@ -0,0 +1,86 @@
+"""
+Time input discovery over a synthetic tree of 10,000 subjects (half of them with
+left and right files in the same folder, half in separate folders), comparing
+``SubjectMapper`` against walking the tree with ``PathMapper.dir_mapper_deep``
+and ``glob``, which is how inputs were found before ``DirIndex``.
+
+Usage: python -m benchmarks.discovery [n_subjects] [directory]
+
+Give a directory on the file system of interest (e.g. NFS) to measure it there,
+otherwise a temporary directory is used.
+"""
+
+import sys
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from chris_plugin import PathMapper
+
+from surfigures.inputs.find import SubjectMapper
+from surfigures.inputs.index import DirIndex
+
+LAYERS = ('gray_surface', 'white_surface')
+DATA = ('thickness.txt', 'smtherr.txt')
+
+
+def make_tree(root: Path, n_subjects: int):
+    for i in range(n_subjects):
+        site = root / f'site{i % 10}'
+        if i % 2 == 0:
+            folder = site / f'sub-{i:05d}'
+            folder.mkdir(parents=True)
+            for side in ('left', 'right'):
+                for layer in LAYERS:
+                    (folder / f'{layer}_{side}_81920.obj').touch()
+                for data in DATA:
+                    (folder / f'sub-{i:05d}_{side}.{data}').touch()
+        else:
+            for side in ('left', 'right'):
+                folder = site / f'sub-{i:05d}-{side}'
+                folder.mkdir(parents=True)
+                for layer in LAYERS:
+                    (folder / f'{layer}_81920.obj').touch()
+                for data in DATA:
+                    (folder / f'sub-{i:05d}.{data}').touch()
+
+
+def legacy_walk(input_dir: Path, output_dir: Path) -> int:
+    """
+    Walk the tree the way inputs were found before: globbing leaf directories for .obj files.
+    """
+    def contains_obj(folder: Path) -> bool:
+        return next(folder.glob('*.obj'), None) is not None
+
+    mapper = PathMapper.dir_mapper_deep(input_dir, output_dir, fail_if_empty=False, filter=contains_obj)
+    return sum(1 for _ in mapper)
+
+
+def timed(f):
+    start = time.perf_counter()
+    result = f()
+    return time.perf_counter() - start, result
+
+
+def main():
+    n_subjects = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    parent = sys.argv[2] if len(sys.argv) > 2 else None
+    with TemporaryDirectory(dir=parent) as tmp_dir:
+        input_dir = Path(tmp_dir) / 'incoming'
+        output_dir = Path(tmp_dir) / 'outgoing'
+        output_dir.mkdir()
+        make_tree(input_dir, n_subjects)
+        print(f'{n_subjects} subjects in {input_dir}')
+
+        t, n = timed(lambda: legacy_walk(input_dir, output_dir))
+        print(f'glob walk only (before): {t:7.2f} s, {n} folders')
+        t, index = timed(lambda: DirIndex(input_dir))
+        print(f'DirIndex:                {t:7.2f} s, {sum(1 for _ in index.directories())} folders')
+        mapper = SubjectMapper(input_dir, output_dir)
+        t, results = timed(lambda: list(mapper.map('.txt', '{}.png')))
+        n_ok = sum(1 for ok, _ in results if ok is not None)
+        print(f'SubjectMapper.map:       {t:7.2f} s, {n_ok} subjects, {len(results) - n_ok} errors')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Compare the wall time of rendering the 10 tiles of one section, running
+``ray_trace`` once per tile versus ``surfigures.draw.raster`` loading the
+surfaces once for all tiles.
+"""
+
+import os
+import shutil
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from benchmarks._synthetic import icosphere
+from surfigures.draw import constants
+from surfigures.draw.raster import render_tiles
+from surfigures.draw.section import Section
+from surfigures.io import cache as io_cache
+from surfigures.io.obj import Surface, write_obj
+from surfigures.run import LoggedRunner
+
+REPEAT = 3
+BG = 'white'
+
+
+def write_hemispheres(directory: Path) -> tuple[Path, Path]:
+    """
+    Write two ellipsoids of 81920 triangles, placed like left and right hemispheres.
+    """
+    points, triangles = icosphere(radius=1.0)
+    paths = []
+    for name, x in (('left', -35.0), ('right', 35.0)):
+        path = directory / f'{name}.obj'
+        write_obj(path, Surface.from_points(points * (30, 70, 50) + (x, 0, 0), triangles))
+        paths.append(path)
+    return paths[0], paths[1]
+
+
+def bench(f) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        f()
+    return (time.perf_counter() - start) / REPEAT
+
+
+def main():
+    with TemporaryDirectory() as tmp_dir, open(os.devnull, 'w') as log:
+        tmp_dir = Path(tmp_dir)
+        left, right = write_hemispheres(tmp_dir)
+        section = Section(left, right, '', '')
+        tiles = [
+            (tile.ray_trace, tmp_dir / f'{i}.rgb')
+            for i, tile in enumerate(section.to_row_pair()) if not tile.is_blank
+        ]
+        runner = LoggedRunner(tmp_dir, log)
+
+        def numpy_section():
+            io_cache.shared.clear()  # include loading the surfaces
+            render_tiles(runner, (left, right), tiles, BG, constants.TILE_SIZE)
+
+        print(f'numpy ({len(tiles)} tiles, 1 load):     {bench(numpy_section):6.2f} s/section')
+        if shutil.which('ray_trace') is None:
+            print('ray_trace: not found in PATH, skipped')
+            return
+
+        def ray_trace_section():
+            for rt, output in tiles:
+                runner.run(rt.to_cmd(BG, constants.TILE_SIZE, constants.TILE_SIZE, output))
+
+        print(f'ray_trace ({len(tiles)} processes):     {bench(ray_trace_section):6.2f} s/section')
+
+
+if __name__ == '__main__':
+    main()
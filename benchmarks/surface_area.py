@@ -0,0 +1,39 @@
+"""
+Compare ``surface-stats -face_area`` against ``surfigures.io.obj`` for
+computing the total area of an 81920-triangle surface.
+"""
+
+import shutil
+import subprocess as sp
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from benchmarks._synthetic import write_sphere_obj
+from surfigures.io.obj import read_obj
+
+REPEAT = 10
+
+
+def bench(f) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        f()
+    return (time.perf_counter() - start) / REPEAT
+
+
+def main():
+    with TemporaryDirectory() as tmp_dir:
+        obj = write_sphere_obj(Path(tmp_dir) / 'sphere_81920.obj')
+        print(f'numpy:         {bench(lambda: read_obj(obj).area()) * 1000:8.1f} ms '
+              f'(area={read_obj(obj).area():.2f})')
+        if shutil.which('surface-stats') is None:
+            print('surface-stats: not found in PATH, skipped')
+            return
+        cmd = ('surface-stats', '-face_area', obj)
+        t = bench(lambda: sp.run(cmd, stdout=sp.DEVNULL, stderr=sp.DEVNULL, check=True))
+        print(f'surface-stats: {t * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
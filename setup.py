@@ -26,11 +26,13 @@ setup(
     author='Jennings Zhang',
     author_email='Jennings.Zhang@childrens.harvard.edu',
     url='https://github.com/FNNDSC/pl-surfigures',
-    install_requires=['chris_plugin==0.2.0a1', 'loguru~=0.6.0'],
+    install_requires=['chris_plugin==0.2.0a1', 'loguru~=0.6.0', 'numpy>=1.24', 'Pillow>=10.1'],
     license='MIT',
     entry_points={
         'console_scripts': [
-            'surfigures = surfigures.__main__:main'
+            'surfigures = surfigures.__main__:main',
+            'surfigures-merge-timings = surfigures.shard:merge_main',
+            'surfigures-plan = surfigures.plan:main'
         ]
     },
     classifiers=[
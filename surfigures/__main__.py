@@ -1,19 +1,41 @@
 #!/usr/bin/env python
-import os
+import contextlib
+import dataclasses
 import sys
+import threading
+import time
 from pathlib import Path
-import itertools
+from tempfile import TemporaryDirectory
+from typing import ContextManager, Iterable, Iterator, Optional, Sequence
 
 from loguru import logger
 from chris_plugin import chris_plugin
 
 from surfigures import DISPLAY_TITLE, __version__
 from surfigures.args import parser
+from surfigures.cost import CostModel, TIMINGS_NAME
+from surfigures.draw.composite import supports_colors
+from surfigures.draw.web import MANIFEST_NAME as WEB_MANIFEST_NAME, web_dir_of
 from surfigures.options import Options
+from surfigures.plan import MAKEFILE_NAME, NINJA_NAME, PLAN_NAME, Plan, PlanError, plan_subject
+from surfigures.inputs.err import InputError
 from surfigures.inputs.find import SubjectMapper
-from concurrent.futures import ThreadPoolExecutor
+from surfigures.inputs.subject import SubjectSet
+from surfigures.manifest import Manifest, MANIFEST_NAME
+from concurrent.futures import Future, ThreadPoolExecutor
 
-from surfigures.run import run_surfigures
+from surfigures.run import run_surfigures, RunContext
+from surfigures.shard import Shard, write_summary
+from surfigures.io import cache as io_cache
+from surfigures.io.obj import prune_sidecars
+from surfigures.util.cache import DEDUPLICATED_MAX_BYTES, ContentHasher, Deduplicator, RenderCache
+from surfigures.util.limits import Limits
+from surfigures.util.profile import Profile
+from surfigures.util.scheduler import LargestFirst, Scheduler
+from surfigures.util.tmp import MemoryTmp, memory_tmp_root
+from surfigures.util.workers import WorkerPool
+
+PROFILE_NAME = 'surfigures-profile.{}'
 
 
 @chris_plugin(
@@ -28,36 +50,281 @@ def main(given_args, inputdir: Path, outputdir: Path):
     print(DISPLAY_TITLE, file=sys.stderr)
     print(f'\tversion: {__version__}\n', file=sys.stderr, flush=True)
 
+    start = time.monotonic()
     options = Options.from_args(given_args)
+    shard: Optional[Shard] = given_args.shard
+    if given_args.web and given_args.plan:
+        logger.error('--web cannot be used with --plan, plans only create figures')
+        sys.exit(1)
+    if given_args.web and not supports_colors(options.bg):
+        logger.error('--web does not support the background color {}', options.bg)
+        sys.exit(1)
+
+    limits = Limits.detect()
+    if given_args.max_memory is not None:
+        limits = dataclasses.replace(limits, memory=given_args.max_memory)
+    data_cache_size = given_args.data_cache_size
+    # worker processes have caches of their own, of data_cache_size in total
+    caches = 2 if given_args.worker_processes else 1
+    if limits.memory is not None:
+        data_cache_size = min(data_cache_size, limits.memory // (2 * caches))
+    io_cache.shared.max_bytes = data_cache_size
+
+    nproc = given_args.jobs if given_args.jobs > 0 else limits.jobs(reserved_memory=caches * data_cache_size)
+    logger.debug('Using {} threads, limits: {}', nproc, limits)
+
+    # input files are hashed once for both deduplication and the caches
+    hasher = ContentHasher()
+    render_cache = None
+    section_cache = None
+    if given_args.cache_dir:
+        # --cache-size is the size of the whole cache directory: half of it for tiles,
+        # a quarter for images of sections, and a quarter for sidecars of surfaces
+        cache_size = given_args.cache_size
+        render_cache = RenderCache(Path(given_args.cache_dir) / 'tiles', cache_size // 2, hasher)
+        section_cache = RenderCache(Path(given_args.cache_dir) / 'sections', cache_size // 4, hasher)
+        logger.debug('Caching tiles in {}', render_cache.directory)
+
+    memory_root = memory_tmp_root() if given_args.tmp_mode == 'memory' else None
+    memory_tmp = MemoryTmp(memory_root) if memory_root is not None else None
+
+    manifest = None
+    if given_args.incremental:
+        manifest = Manifest(outputdir / MANIFEST_NAME, options)
+    # timings are only remembered in --cache-dir, so that outputs are only figures by default
+    cost_model = CostModel(Path(given_args.cache_dir) / TIMINGS_NAME if given_args.cache_dir else None)
+
+    profile = Profile() if given_args.profile else None
 
     mapper = SubjectMapper(input_dir=inputdir, output_dir=outputdir)
-    usable_mapper, skipped_inputs = zip(*mapper.map(given_args.suffix, given_args.output))
+    first_figure = _FirstFigure(start)
+    input_errors = []
+    n_up_to_date = 0
+    subjects = []
+    futures = []
 
-    skipped_inputs = list(filter(is_some, skipped_inputs))
-    if skipped_inputs:
-        logger.error('Unable to resolve inputs: {}', skipped_inputs)
-        sys.exit(1)
+    # subjects are rendered while the rest of the input directory is still being searched
+    discovered = _resolved(mapper.map(given_args.suffix, given_args.output), input_errors, given_args.fail_fast)
+    if given_args.only:
+        listed = _read_listed(Path(given_args.only))
+        discovered = (s for s in discovered if _is_listed(s[1], outputdir, listed))
+    if shard is not None:
+        # every subject must be known to divide them the same way as the other shards do
+        discovered = shard.select(discovered)
+        logger.info('Shard {}/{} has {} subjects', shard.index, shard.count, len(discovered))
 
-    nproc = len(os.sched_getaffinity(0))
-    logger.debug('Using {} threads', nproc)
+    if given_args.plan:
+        to_plan = [s for s in discovered if manifest is None or not manifest.is_up_to_date(*s)]
+        ok = _write_plan(Path(given_args.plan), to_plan, options, cost_model)
+        if manifest is not None:
+            manifest.save()
+        if input_errors:
+            logger.error('Unable to resolve inputs: {}', input_errors)
+        if input_errors or not ok:
+            sys.exit(1)
+        return
 
-    with ThreadPoolExecutor(max_workers=nproc) as pool:
-        timings = pool.map(__call_surfigures, filter(is_some, usable_mapper), itertools.repeat(options))
+    # subject threads mostly wait on their commands, which are run by the shared scheduler.
+    # Worker processes are shut down last, after every subject is done.
+    with _sidecar_dir(given_args.cache_dir) as sidecar_dir, \
+            _worker_pool(given_args.worker_processes, nproc, data_cache_size, sidecar_dir) as workers, \
+            _renders_dir(memory_tmp) as renders_dir, \
+            Scheduler(max_workers=nproc) as scheduler, ThreadPoolExecutor(max_workers=nproc) as pool:
+        # whenever a subject is done, the most expensive of the subjects found so far is started
+        queue = LargestFirst(pool)
+        io_cache.default_sidecar_dir = sidecar_dir
+        # outputs of identical commands are kept for the whole run, after their subject is done
+        deduplicator = Deduplicator(renders_dir, hasher)
+        context = RunContext(scheduler=scheduler, render_cache=render_cache, section_cache=section_cache,
+                             sidecar_dir=sidecar_dir,
+                             memory_tmp=memory_tmp,
+                             memory_tmp_limit=given_args.tmp_memory_limit,
+                             profile=profile,
+                             workers=workers,
+                             deduplicator=deduplicator,
+                             web=given_args.web)
+        for subject in discovered:
+            if manifest is not None and manifest.is_up_to_date(*subject) \
+                    and (not given_args.web or (web_dir_of(subject[1]) / WEB_MANIFEST_NAME).is_file()):
+                n_up_to_date += 1
+                continue
+            future = queue.submit(cost_model.estimate(subject[0]), __call_surfigures, subject, options, context)
+            future.add_done_callback(first_figure)
+            subjects.append(subject)
+            futures.append(future)
+        if input_errors and given_args.fail_fast:
+            for future in futures:
+                future.cancel()
 
-    timings = list(timings)
+    if manifest is not None:
+        logger.info('{} subjects were up to date, {} were rendered', n_up_to_date, len(subjects))
+    timings = [None if f.cancelled() else f.result() for f in futures]
+    if given_args.cache_dir and sidecar_dir.is_dir():
+        pruned = prune_sidecars(sidecar_dir, given_args.cache_size // 4)
+        logger.debug('Deleted the sidecars of {} surfaces from {}', pruned, sidecar_dir)
+    if deduplicator.deduplicated:
+        logger.info('{} renders were the same as another render and were not run again', deduplicator.deduplicated)
+    if profile is not None:
+        _write_profile(profile, outputdir)
+    if shard is not None:
+        write_summary(outputdir / shard.summary_name, shard, subjects, timings, time.monotonic() - start)
+    for subject, t in zip(subjects, timings):
+        if t is not None:
+            cost_model.record(subject[0], t)
+            if manifest is not None:
+                manifest.record(*subject)
+    cost_model.save()
+    if manifest is not None:
+        manifest.save()
+    if input_errors:
+        logger.error('Unable to resolve inputs: {}', input_errors)
+        sys.exit(1)
     if any(t is None for t in timings):
         logger.warning("errors occurred, see above.")
         sys.exit(1)
+    logger.debug('Parsed input files cache: {} hits, {} misses', io_cache.shared.hits, io_cache.shared.misses)
+    if not timings:
+        logger.info('All done! Nothing to render.')
+        return
     average = sum(timings) / len(timings)
-    logger.info(f'All done! Average time: {average:.1f}s')
+    logger.info(f'All done! Rendered {len(timings)} subjects, average time: {average:.1f}s')
+
+
+def _worker_pool(enabled: bool, n_workers: int, data_cache_size: int,
+                 sidecar_dir: Path) -> ContextManager[Optional[WorkerPool]]:
+    if not enabled:
+        return contextlib.nullcontext()
+    logger.debug('Using {} worker processes', n_workers)
+    return WorkerPool(n_workers, data_cache_size // n_workers, sidecar_dir)
+
+
+@contextlib.contextmanager
+def _renders_dir(memory_tmp: Optional[MemoryTmp]) -> Iterator[Path]:
+    """
+    Directory for keeping the outputs of deduplicated commands for the whole run, on the same
+    file system as the temporary files of subjects (if there is room in memory), so that
+    outputs are kept by hard links.
+    """
+    if memory_tmp is not None:
+        reservation = memory_tmp.reserve(DEDUPLICATED_MAX_BYTES, DEDUPLICATED_MAX_BYTES, 'deduplicated renders')
+    else:
+        reservation = contextlib.nullcontext()
+    with reservation as parent, TemporaryDirectory(prefix='surfigures-renders-', dir=parent) as tmp_dir:
+        yield Path(tmp_dir)
+
+
+@contextlib.contextmanager
+def _sidecar_dir(cache_dir: str) -> Iterator[Path]:
+    """
+    Directory of binary copies of surfaces, which every process memory-maps instead of
+    parsing ``.obj`` files: in ``--cache-dir`` if given, otherwise only for this run.
+    """
+    if cache_dir:
+        yield Path(cache_dir) / 'obj'
+        return
+    with TemporaryDirectory(prefix='surfigures-obj-') as tmp_dir:
+        yield Path(tmp_dir)
+
+
+def _write_plan(plan_dir: Path, subjects: Sequence[tuple[SubjectSet, Path]], options: Options,
+                cost_model: CostModel) -> bool:
+    """
+    Plan the commands of creating the figures of subjects, without running them.
+
+    :returns: whether every subject could be planned
+    """
+    plan_dir.mkdir(parents=True, exist_ok=True)
+    plan = Plan()
+    ok = True
+    cost = 0.0
+    for i, (input_set, output_file) in enumerate(subjects):
+        # steps of a subject which cannot be planned completely are left out
+        subject_plan = Plan()
+        try:
+            plan_subject(subject_plan, input_set, output_file, options, plan_dir / 'tmp' / f'{i}_{input_set.title}')
+        except (InputError, PlanError) as e:
+            logger.error('{} --> {} cannot be planned: {}', tuple(map(str, input_set.src)), output_file, e)
+            ok = False
+            continue
+        plan.extend(subject_plan)
+        cost += cost_model.estimate(input_set)
+    plan.write_json(plan_dir / PLAN_NAME)
+    plan.write_makefile(plan_dir / MAKEFILE_NAME, plan_dir / PLAN_NAME)
+    plan.write_ninja(plan_dir / NINJA_NAME, plan_dir / PLAN_NAME)
+
+    summary = plan.summary()
+    per_stage = ', '.join(f'{stage}: {n}' for stage, n in summary['processes_per_stage'].items())
+    logger.info('Planned {} subjects: {} processes ({}), at most {} of which must run one after the other',
+                summary['subjects'], summary['processes'], per_stage, summary['longest_chain'])
+    if cost_model.calibrated:
+        logger.info('Estimated time: {:.0f}s of work', cost)
+    else:
+        logger.info('Estimated cost: {:.3g} vertex-sections, there are no previous timings to estimate time', cost)
+    logger.info('Plan written to {}, run it with: surfigures-plan run {}', plan_dir, plan_dir / PLAN_NAME)
+    return ok
+
+
+def _write_profile(profile: Profile, outputdir: Path):
+    profile.write_json(outputdir / PROFILE_NAME.format('json'))
+    profile.write_csv(outputdir / PROFILE_NAME.format('csv'))
+    stages = profile.summary()['stages']
+    for stage, totals in sorted(stages.items(), key=lambda item: item[1]['wall_time'], reverse=True):
+        logger.info('{}: {} runs, {:.1f}s wall time, {:.1f}s CPU time', stage, totals['count'],
+                    totals['wall_time'], totals['cpu_time'])
+    logger.info('Profile written to {}', outputdir / PROFILE_NAME.format('json'))
+
+
+def _resolved(mapped: Iterable[tuple[Optional[tuple[SubjectSet, Path]], Optional[InputError]]],
+              errors: list[InputError], fail_fast: bool) -> Iterator[tuple[SubjectSet, Path]]:
+    """
+    Usable inputs from ``SubjectMapper.map``, while appending the others to ``errors``.
+
+    :param fail_fast: stop at the first input error
+    """
+    for subject, error in mapped:
+        if error is None:
+            yield subject
+            continue
+        errors.append(error)
+        if fail_fast:
+            logger.error('Stopping because of unresolved inputs: {}', error)
+            return
+
+
+def _read_listed(path: Path) -> set[str]:
+    """
+    Read a file of figures, e.g. which were flagged during review, one per line.
+    """
+    return {line.strip() for line in path.read_text().splitlines() if line.strip()}
+
+
+def _is_listed(output_file: Path, outputdir: Path, listed: set[str]) -> bool:
+    relative = output_file.relative_to(outputdir)
+    return str(relative) in listed or str(relative.with_suffix('')) in listed
+
+
+class _FirstFigure:
+    """
+    Callback for finished subjects which logs the time until the first figure was created.
+    """
 
+    def __init__(self, start: float):
+        self.__start = start
+        self.__lock = threading.Lock()
+        self.__done = False
 
-def __call_surfigures(t, o):
-    return run_surfigures(*t, o)
+    def __call__(self, future: Future):
+        if future.cancelled() or future.exception() is not None or future.result() is None:
+            return
+        with self.__lock:
+            if self.__done:
+                return
+            self.__done = True
+        logger.info('First figure created after {:.1f}s', time.monotonic() - self.__start)
 
 
-def is_some(x):
-    return x is not None
+def __call_surfigures(t, o, c):
+    return run_surfigures(*t, o, c)
 
 
 if __name__ == '__main__':
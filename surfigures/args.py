@@ -1,5 +1,29 @@
 from surfigures import __version__
-from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter, ArgumentTypeError
+
+from surfigures.shard import Shard
+from surfigures.util.cache import parse_size
+
+
+def _size(value: str) -> int:
+    """
+    Size in bytes, for ``type=`` of arguments such as ``--max-memory 4G``.
+    """
+    try:
+        size = parse_size(value)
+    except ValueError as e:
+        raise ArgumentTypeError(str(e))
+    if size < 0:
+        raise ArgumentTypeError(f'size must not be negative, got "{value}"')
+    return size
+
+
+def _shard(value: str) -> Shard:
+    try:
+        return Shard.parse(value)
+    except ValueError as e:
+        raise ArgumentTypeError(str(e))
+
 
 parser = ArgumentParser(description='Create figures of surfaces and vertex-wise data',
                         formatter_class=ArgumentDefaultsHelpFormatter)
@@ -10,6 +34,10 @@ parser.add_argument('-s', '--suffix', default='.txt', type=str,
                     help='file extension of vertex-wise data file inputs')
 parser.add_argument('-o', '--output', default='{}.png', type=str,
                     help='output file template and file type. "{}" is replaced by the subject name.')
+parser.add_argument('--web', action='store_true',
+                    help='next to every figure, also write a directory (e.g. subject.web/) for web viewers, with '
+                         'the image of every section at several resolutions and a manifest.json of the positions '
+                         'of tiles and labels')
 
 parser.add_argument('-r', '--range', default='.disterr.txt:-2.0:2.0,.abs.disterr.txt:0.0:2.0,.smtherr.txt:0.0:2.0',
                     type=str, help='Ranges for specific file extensions.')
@@ -21,3 +49,63 @@ parser.add_argument('-f', '--font-color', type=str, default='green',
                     help='Figure labels font color')
 parser.add_argument('-c', '--color-map', type=str, default='spectral',
                     help='color map to use for data value visualization')
+parser.add_argument('--renderer', type=str, default='ray_trace', choices=('ray_trace', 'numpy'),
+                    help='how to draw surfaces: ray_trace runs one process per tile, numpy renders '
+                         'every view of a section in-process from a single load of its surfaces (no shadows)')
+parser.add_argument('--compositor', type=str, default='numpy', choices=('numpy', 'imagemagick'),
+                    help='how to put tiles and labels together: numpy encodes the figure once in-process, '
+                         'imagemagick runs montage and convert. imagemagick is always used for colors '
+                         'which numpy does not know, e.g. green1')
+parser.add_argument('--preview', action='store_true',
+                    help='quickly render small figures for triage: smaller tiles without shadows, '
+                         'several times faster. Flagged subjects can be rendered again at full quality with --only')
+parser.add_argument('--only', type=str, default='',
+                    help='text file listing the figures to create, one per line as a path relative to '
+                         'the output directory (e.g. subject.png), with or without its extension. '
+                         'Other subjects are skipped.')
+parser.add_argument('--tmp-mode', type=str, default='disk', choices=('disk', 'memory'),
+                    help='where to write temporary files such as tiles. memory uses /dev/shm, '
+                         'so that tiles do not go through the (possibly network-backed) temporary directory')
+parser.add_argument('--tmp-memory-limit', type=_size, default='2G',
+                    help='with --tmp-mode=memory, maximum size of temporary files of one subject. '
+                         'Subjects which need more use the disk.')
+parser.add_argument('--incremental', action='store_true',
+                    help='skip subjects whose figure was already created from the same inputs and options, '
+                         'according to a manifest kept in the output directory')
+parser.add_argument('--jobs', type=int, default=0,
+                    help='number of commands to run at the same time. By default, it is the number of CPUs '
+                         'this container may use (according to its cgroup CPU quota), '
+                         'or fewer if they would not fit in memory')
+parser.add_argument('--max-memory', type=_size, default=None,
+                    help='memory available to this plugin, e.g. 4G. By default, it is the cgroup memory limit. '
+                         'It limits the number of commands to run at the same time, and --data-cache-size to half of it '
+                         '(a quarter with --worker-processes)')
+parser.add_argument('--worker-processes', action='store_true',
+                    help='run the in-process replacements of MNI tools (colouring, averaging, statistics, '
+                         'the numpy renderer and compositor) in long-lived worker processes instead of threads')
+parser.add_argument('--fail-fast', action='store_true',
+                    help='stop starting new subjects as soon as the inputs of a subject cannot be resolved. '
+                         'By default, such subjects are reported at the end and the others are rendered.')
+parser.add_argument('--shard', type=_shard, default=None,
+                    help='only render a share of the subjects, given as i/N for the i-th of N shards (from 1). '
+                         'Subjects are divided between shards by their expected cost, the same way by every shard, '
+                         'and a summary of timings is written to the output directory.')
+parser.add_argument('--profile', action='store_true',
+                    help='measure the wall time, CPU time and peak memory of every command, and write totals '
+                         'per stage and per subject to surfigures-profile.json and every measurement '
+                         'to surfigures-profile.csv in the output directory')
+parser.add_argument('--plan', type=str, default='',
+                    help='instead of creating figures, write the commands which would create them to this directory '
+                         'as plan.json, Makefile and build.ninja. Plans use the ray_trace renderer and the '
+                         'imagemagick compositor. Run plan.json with: surfigures-plan run plan.json')
+parser.add_argument('--cache-dir', type=str, default='',
+                    help='directory for caching rendered tiles between runs, e.g. on a shared volume, '
+                         'where the timings of subjects are also kept to start the slowest ones first next time. '
+                         'If not given, nothing is kept between runs.')
+parser.add_argument('--cache-size', type=_size, default='10G',
+                    help='maximum size of --cache-dir, least recently used tiles are deleted first. '
+                         'Half of it is for tiles, a quarter for images of sections, and a quarter for binary '
+                         'copies of surfaces, which are pruned at the end of every run')
+parser.add_argument('--data-cache-size', type=_size, default='1G',
+                    help='memory budget for keeping parsed surfaces and data files, '
+                         'so that each file is parsed once per run')
@@ -0,0 +1,139 @@
+"""
+Estimates of how long it takes to create the figure of a subject, for starting
+the most expensive subjects first.
+
+Most of the time is spent rendering the tiles of every section (one section per
+layer and per data file) of surfaces which all have the same number of vertices,
+so the estimate is proportional to the number of vertices times the number of
+sections. The number of vertices is read from the header of the ``.obj`` files.
+
+Actual timings are recorded in a JSON file, which refines the estimates of later runs:
+subjects which were timed before are expected to take as long as they did, and the
+estimates of other subjects are scaled by the measured time per vertex and section.
+"""
+
+import threading
+from pathlib import Path
+from typing import Iterable, Optional
+
+from surfigures.inputs.subject import SubjectSet
+from surfigures.util.files import locked, read_json, write_json
+
+TIMINGS_NAME = '.surfigures-timings.json'
+_FORMAT_VERSION = 1
+_DEFAULT_POINTS = 2 * 40962
+"""vertices of a pair of CIVET surfaces, assumed if a surface header cannot be read"""
+_HEADER_SIZE = 256
+
+
+class CostModel:
+    """
+    Expected time of creating the figure of subjects, learned from previous runs.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        """
+        :param path: JSON file of timings from previous runs, which is updated by ``save``.
+                     If not given, timings are not remembered.
+        """
+        self.__path = path
+        self.__lock = threading.Lock()
+        self.__subjects: dict[str, dict] = self.__load()
+        self.__subjects_before = len(self.__subjects)
+        self.__recorded: dict[str, dict] = {}
+        self.__rate = _rate(self.__subjects.values())
+
+    def __load(self) -> dict[str, dict]:
+        if self.__path is None:
+            return {}
+        return read_json(self.__path, _FORMAT_VERSION, 'timings').get('subjects', {})
+
+    @property
+    def calibrated(self) -> bool:
+        """
+        Whether estimates are in seconds, i.e. there are timings from previous runs.
+        """
+        return bool(self.__subjects_before)
+
+    def estimate(self, subject: SubjectSet) -> float:
+        """
+        Expected time of creating the figure of a subject, in seconds if there
+        are previous timings, otherwise in arbitrary units.
+        """
+        features = _features(subject)
+        with self.__lock:
+            previous = self.__subjects.get(_key(subject))
+        if previous is not None and previous['features'] == features:
+            return previous['seconds']
+        return self.__rate * _work(features)
+
+    def record(self, subject: SubjectSet, seconds: float):
+        """
+        Remember how long it took to create the figure of a subject.
+        """
+        entry = {'features': _features(subject), 'seconds': seconds}
+        with self.__lock:
+            self.__subjects[_key(subject)] = entry
+            self.__recorded[_key(subject)] = entry
+
+    def save(self):
+        """
+        Add the timings recorded since this model was created to their file, atomically.
+
+        The file is re-read under a lock, so that runs which share it (e.g. the shards
+        of a ``--cache-dir``) do not overwrite each other's timings.
+        """
+        if self.__path is None:
+            return
+        with locked(self.__path):
+            subjects = self.__load()
+            with self.__lock:
+                subjects.update(self.__recorded)
+            write_json(self.__path, _FORMAT_VERSION, {'subjects': subjects})
+
+
+def read_n_points(path: Path) -> int:
+    """
+    Number of vertices of an ASCII MNI .obj file, read from its header.
+
+    :raises ValueError: if the file does not start with a polygons header
+    """
+    with path.open('rb') as f:
+        tokens = f.read(_HEADER_SIZE).split()
+    if len(tokens) < 8 or tokens[0] != b'P':
+        raise ValueError(f'{path} is not an ASCII MNI polygonal .obj file')
+    return int(tokens[6])
+
+
+def _features(subject: SubjectSet) -> list[int]:
+    """
+    Number of vertices of both sides of a surface, number of layers, and number of data files.
+    """
+    if subject.surfaces:
+        try:
+            layer = subject.surfaces[0]
+            n_points = read_n_points(layer.left) + read_n_points(layer.right)
+        except (OSError, ValueError):
+            n_points = _DEFAULT_POINTS
+    else:
+        n_points = 0
+    return [n_points, len(subject.surfaces), len(subject.data_files)]
+
+
+def _rate(entries: Iterable[dict]) -> float:
+    """
+    Measured seconds per unit of work, or 1 if nothing was measured.
+    """
+    entries = list(entries)
+    work = sum(_work(e['features']) for e in entries)
+    seconds = sum(e['seconds'] for e in entries)
+    return seconds / work if work > 0 else 1.0
+
+
+def _work(features: list[int]) -> float:
+    n_points, n_layers, n_data_files = features
+    return n_points * (n_layers + n_data_files)
+
+
+def _key(subject: SubjectSet) -> str:
+    return ':'.join(map(str, subject.src)) + f':{subject.title}'
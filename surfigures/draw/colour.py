@@ -0,0 +1,140 @@
+"""
+In-process replacement for ``colour_object``.
+
+Colour maps are precomputed as 256-entry lookup tables, interpolated from the
+control points of the MNI colour codings. Values outside of the range are given
+the colour at the nearest end of the colour map.
+
+Colour maps which are not implemented here (e.g. ``label`` and ``rgba``) are
+handled by running ``colour_object``.
+"""
+
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+from loguru import logger
+
+from surfigures.io.cache import load_obj, load_vertstats
+from surfigures.io.obj import write_obj
+from surfigures.util.runnable import Runner, process_safe
+
+LUT_SIZE = 256
+
+_GRAY = ((0.0, 0.0, 0.0, 0.0), (1.0, 1.0, 1.0, 1.0))
+_HOT_METAL = (
+    (0.0, 0.0, 0.0, 0.0),
+    (0.25, 0.5, 0.0, 0.0),
+    (0.5, 1.0, 0.5, 0.0),
+    (0.75, 1.0, 1.0, 0.5),
+    (1.0, 1.0, 1.0, 1.0),
+)
+_COLD_METAL = (
+    (0.0, 0.0, 0.0, 0.0),
+    (0.25, 0.0, 0.0, 0.5),
+    (0.5, 0.0, 0.5, 1.0),
+    (0.75, 0.5, 1.0, 1.0),
+    (1.0, 1.0, 1.0, 1.0),
+)
+_GREEN_METAL = (
+    (0.0, 0.0, 0.0, 0.0),
+    (0.25, 0.0, 0.5, 0.0),
+    (0.5, 0.5, 1.0, 0.0),
+    (0.75, 1.0, 1.0, 0.5),
+    (1.0, 1.0, 1.0, 1.0),
+)
+_SPECTRAL = (
+    (0.00, 0.0000, 0.0000, 0.0000),
+    (0.05, 0.4667, 0.0000, 0.5333),
+    (0.10, 0.5333, 0.0000, 0.6000),
+    (0.15, 0.0000, 0.0000, 0.6667),
+    (0.20, 0.0000, 0.0000, 0.8667),
+    (0.25, 0.0000, 0.4667, 0.8667),
+    (0.30, 0.0000, 0.6000, 0.8667),
+    (0.35, 0.0000, 0.6667, 0.6667),
+    (0.40, 0.0000, 0.6667, 0.5333),
+    (0.45, 0.0000, 0.6000, 0.0000),
+    (0.50, 0.0000, 0.7333, 0.0000),
+    (0.55, 0.0000, 0.8667, 0.0000),
+    (0.60, 0.0000, 1.0000, 0.0000),
+    (0.65, 0.7333, 1.0000, 0.0000),
+    (0.70, 0.9333, 0.9333, 0.0000),
+    (0.75, 1.0000, 0.8000, 0.0000),
+    (0.80, 1.0000, 0.6000, 0.0000),
+    (0.85, 1.0000, 0.0000, 0.0000),
+    (0.90, 0.8667, 0.0000, 0.0000),
+    (0.95, 0.8000, 0.0000, 0.0000),
+    (1.00, 0.8000, 0.8000, 0.8000),
+)
+_RED = ((0.0, 0.0, 0.0, 0.0), (1.0, 1.0, 0.0, 0.0))
+_GREEN = ((0.0, 0.0, 0.0, 0.0), (1.0, 0.0, 1.0, 0.0))
+_BLUE = ((0.0, 0.0, 0.0, 0.0), (1.0, 0.0, 0.0, 1.0))
+
+
+def _lut(points: tuple[tuple[float, float, float, float], ...], inverted: bool = False) -> npt.NDArray[np.float32]:
+    """
+    Interpolate control points ``(position, r, g, b)`` into a lookup table of RGBA colours.
+    """
+    control = np.array(points, dtype=np.float64)
+    x = np.linspace(0.0, 1.0, LUT_SIZE)
+    if inverted:
+        x = x[::-1]
+    rgb = np.stack([np.interp(x, control[:, 0], control[:, c]) for c in (1, 2, 3)], axis=1)
+    alpha = np.ones((LUT_SIZE, 1))
+    return np.concatenate((rgb, alpha), axis=1).astype(np.float32)
+
+
+COLOR_MAPS: dict[str, npt.NDArray[np.float32]] = {
+    'gray': _lut(_GRAY),
+    'hot': _lut(_HOT_METAL),
+    'hot_inv': _lut(_HOT_METAL, inverted=True),
+    'cold_metal': _lut(_COLD_METAL),
+    'cold_metal_inv': _lut(_COLD_METAL, inverted=True),
+    'green_metal': _lut(_GREEN_METAL),
+    'green_metal_inv': _lut(_GREEN_METAL, inverted=True),
+    'spectral': _lut(_SPECTRAL),
+    'red': _lut(_RED),
+    'green': _lut(_GREEN),
+    'blue': _lut(_BLUE),
+}
+"""
+Lookup tables of the colour maps supported by ``colour_vertices``, a subset of ``colour_object -help``.
+"""
+
+
+def colour_vertices(data: npt.NDArray, color_map: str, data_min: float, data_max: float) -> npt.NDArray[np.float32]:
+    """
+    Map vertex-wise data to RGBA colours.
+
+    :returns: (len(data), 4) array of colours
+    """
+    lut = COLOR_MAPS[color_map]
+    scale = (LUT_SIZE - 1) / (data_max - data_min) if data_max != data_min else 0.0
+    indices = np.rint((data - data_min) * scale)
+    np.clip(indices, 0, LUT_SIZE - 1, out=indices)
+    return lut[indices.astype(np.intp)]
+
+
+@process_safe
+def colour_surface(sp: Runner, surface: Path, data_file: Path, output: Path,
+                   color_map: Optional[str], data_min: str, data_max: str):
+    """
+    Write a copy of ``surface`` coloured by the values of ``data_file``, like ``colour_object``.
+    """
+    cmd = ('colour_object', surface, data_file, output, color_map, data_min, data_max)
+    if color_map not in COLOR_MAPS:
+        sp.run(cmd)
+        return
+    try:
+        mesh = load_obj(surface)
+        data = load_vertstats(data_file)
+    except ValueError as e:
+        logger.debug('Falling back to colour_object: {}', e)
+        sp.run(cmd)
+        return
+    if len(data) != mesh.n_points:
+        raise ValueError(f'{data_file} has {len(data)} values but {surface} has {mesh.n_points} vertices')
+    colours = colour_vertices(data, color_map, float(data_min), float(data_max))
+    write_obj(output, mesh, colours)
+
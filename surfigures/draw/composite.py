@@ -0,0 +1,185 @@
+"""
+In-process replacement for ``montage`` followed by ``convert -annotate``.
+
+Tiles are copied into their cells of a single canvas, the same layout as
+``montage -geometry {size}x{size}+{spacing_x}+{spacing_y}``: every cell has
+the size of a tile plus the spacing on both sides, and each tile is scaled to fit
+the tile size and centered in its cell. Labels are then drawn over the canvas,
+which is encoded once.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+import numpy.typing as npt
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+from surfigures.io.sgi import read_sgi
+from surfigures.util.runnable import process_safe
+
+FONT_NAME = 'DejaVuSans.ttf'
+
+
+@dataclass(frozen=True)
+class Annotation:
+    """
+    Text to draw on the figure, like ``convert -annotate 0x0+{x}+{y} {msg}``.
+    """
+    x: int
+    """position of the left of the text"""
+    y: int
+    """position of the baseline of the first line of text"""
+    msg: str
+
+
+@dataclass(frozen=True)
+class Layout:
+    """
+    Geometry of a grid of tiles.
+    """
+    n_col: int
+    n_row: int
+    tile_size: int
+    spacing_x: int
+    spacing_y: int
+
+    @property
+    def cell_width(self) -> int:
+        return self.tile_size + 2 * self.spacing_x
+
+    @property
+    def cell_height(self) -> int:
+        return self.tile_size + 2 * self.spacing_y
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.n_row * self.cell_height, self.n_col * self.cell_width
+
+
+def supports_colors(*colors: str) -> bool:
+    """
+    Whether ``composite`` understands all of the given color names. Not every color
+    known to ImageMagick is supported (e.g. ``green1``).
+    """
+    try:
+        for color in colors:
+            ImageColor.getrgb(color)
+    except ValueError:
+        return False
+    return True
+
+
+@process_safe
+def composite(output: Path, tiles: Sequence[Optional[Path]], layout: Layout, annotations: Sequence[Annotation],
+              bg: str, font_color: str, font_size: int):
+    """
+    Put tiles together and draw text over them.
+
+    :param output: output image file, its type is given by its suffix
+    :param tiles: SGI images of tiles in row-major order, where ``None`` is a blank tile
+    :param layout: positions of tiles
+    :param annotations: text to draw
+    :param bg: background color, also the color of boxes behind the text
+    :param font_color: text color
+    :param font_size: text size in pixels
+    """
+    background = ImageColor.getrgb(bg)[:3]
+    image = Image.fromarray(arrange(tiles, layout, background))
+    draw = ImageDraw.Draw(image)
+    font = _font(font_size)
+    ascent, descent = font.getmetrics()
+    for annotation in annotations:
+        for i, line in enumerate(annotation.msg.split('\n')):
+            if not line.strip():
+                continue
+            xy = (annotation.x, annotation.y + i * (ascent + descent))
+            draw.rectangle(draw.textbbox(xy, line, font=font, anchor='ls'), fill=background)
+            draw.text(xy, line, fill=font_color, font=font, anchor='ls')
+    image.save(output)
+
+
+def arrange(tiles: Sequence[Optional[Path]], layout: Layout, background: tuple[int, ...]) -> npt.NDArray[np.uint8]:
+    """
+    Copy tiles into their cells of a canvas, without any text.
+
+    :param tiles: SGI images of tiles in row-major order, where ``None`` is a blank tile
+    :param layout: positions of tiles
+    :param background: RGB background color
+    :returns: RGB image
+    """
+    canvas = np.empty((*layout.shape, 3), dtype=np.uint8)
+    canvas[:] = background
+    for i, tile in enumerate(tiles):
+        if tile is not None:
+            row, col = divmod(i, layout.n_col)
+            _paste(canvas, _fit(read_sgi(tile), layout.tile_size), background,
+                   row * layout.cell_height + layout.spacing_y + layout.tile_size // 2,
+                   col * layout.cell_width + layout.spacing_x + layout.tile_size // 2)
+    return canvas
+
+
+@process_safe
+def stack(output: Path, images: Sequence[Path], bg: str):
+    """
+    Put images one above the other, e.g. images of sections created by ``composite``.
+    Images narrower than the widest one are aligned to the left.
+
+    :param output: output image file, its type is given by its suffix
+    :param images: image files
+    :param bg: background color
+    """
+    parts = []
+    for image in images:
+        with Image.open(image) as im:
+            parts.append(np.asarray(im.convert('RGB')))
+    canvas = np.empty((sum(p.shape[0] for p in parts), max(p.shape[1] for p in parts), 3), dtype=np.uint8)
+    canvas[:] = ImageColor.getrgb(bg)[:3]
+    top = 0
+    for part in parts:
+        canvas[top:top + part.shape[0], :part.shape[1]] = part
+        top += part.shape[0]
+    Image.fromarray(canvas).save(output)
+
+
+def _fit(tile: npt.NDArray[np.uint8], size: int) -> npt.NDArray[np.uint8]:
+    """
+    Scale a tile so that its larger side is ``size``, if it is not already.
+    """
+    height, width = tile.shape[:2]
+    if max(height, width) == size:
+        return tile
+    scale = size / max(height, width)
+    new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    channels = tile.shape[2]
+    modes = {1: 'L', 3: 'RGB', 4: 'RGBA'}
+    if channels not in modes:
+        raise ValueError(f'tiles with {channels} channels are not supported')
+    resized = Image.fromarray(tile.squeeze(axis=2) if channels == 1 else tile, modes[channels])
+    resized = np.asarray(resized.resize(new_size, Image.Resampling.LANCZOS))
+    return resized.reshape(new_size[1], new_size[0], channels)
+
+
+def _paste(canvas: npt.NDArray[np.uint8], tile: npt.NDArray[np.uint8], background: tuple[int, ...],
+           center_y: int, center_x: int):
+    """
+    Copy a gray, RGB or RGBA tile into the canvas, blending transparent pixels with the background.
+    """
+    height, width, channels = tile.shape
+    top = center_y - height // 2
+    left = center_x - width // 2
+    slot = canvas[top:top + height, left:left + width]
+    if channels == 4:
+        alpha = tile[:, :, 3:].astype(np.float32) / 255
+        blended = tile[:, :, :3] * alpha + np.array(background, dtype=np.float32) * (1 - alpha)
+        slot[:] = np.rint(blended)
+    else:
+        slot[:] = tile[:, :, :3]
+
+
+def _font(size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    try:
+        return ImageFont.truetype(FONT_NAME, size)
+    except OSError:
+        return ImageFont.load_default(size)
@@ -3,6 +3,10 @@ TILE_SIZE = 400
 FONT_SIZE = 28
 ROW_GAP = 50
 COL_CAP = 1
+CAPTION_OFFSET = 100
+
+PREVIEW_TILE_SIZE = 160
+"""tile size of ``--preview``, which has about 1/6 of the pixels of ``TILE_SIZE``"""
 
 HEMI_LABEL_RATIO_L = 0.13
 HEMI_LABEL_RATIO_R = 1 - HEMI_LABEL_RATIO_L
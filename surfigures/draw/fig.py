@@ -6,16 +6,21 @@ hard-coded anywhere. Here is the only place where the values for
 those options should be passed to the functions which accept them.
 """
 
+from concurrent.futures import Future
 from pathlib import Path
-from typing import Sequence
+from typing import Optional, Sequence
 from dataclasses import dataclass
 
-from surfigures.draw import constants
+from surfigures.draw import web
+from surfigures.draw.composite import Annotation, Layout, composite, stack, supports_colors
 from surfigures.draw.prep import SectionBuilder, BaseHemiPreparer, ColoredHemiPreparer
-from surfigures.draw.section import RowPair
+from surfigures.draw.raster import render_tiles
+from surfigures.draw.ray_trace import IRayTrace
+from surfigures.draw.section import RowPair, Section
 from surfigures.draw.tile import LazyTile
 from surfigures.inputs.subject import SubjectSet
 from surfigures.options import Options
+from surfigures.util.cache import RenderCache
 from surfigures.util.runnable import Runnable, Runner
 
 
@@ -25,10 +30,50 @@ class FigureCreator(Runnable[Path]):
     inputs: SubjectSet
     output_path: Path
     options: Options
+    section_cache: Optional[RenderCache] = None
+    """
+    cache of images of sections, so that only the sections whose inputs changed are created again.
+    Only used by the ``numpy`` compositor.
+    """
+    web_dir: Optional[Path] = None
+    """if given, images of sections and their manifest for web viewers are written to this directory"""
 
     def run(self, sp: Runner) -> Path:
-        mid_surface_left = self.inputs.mid_surface_left(sp)
-        mid_surface_right = self.inputs.mid_surface_right(sp)
+        web_sections: list[tuple[dict, Future[list[dict]]]] = []
+        output = self._create(sp, web_sections)
+        if self.web_dir is not None:
+            web.write_manifest(
+                self.web_dir, self.inputs.title, self.output_path,
+                [section for section, _ in web_sections], [images.result() for _, images in web_sections],
+                self.options.font_size, self.options.bg, self.options.font_color
+            )
+        return output
+
+    def _create(self, sp: Runner, web_sections: list[tuple[dict, Future[list[dict]]]]) -> Path:
+        """
+        Create the figure, and submit the writing of images of sections for web viewers.
+
+        :param web_sections: descriptions of sections and futures of their images are appended to it
+        """
+        section_captions = [
+            *(s.caption for s in self.inputs.surfaces),
+            *(s.caption for s in self.inputs.data_files)
+        ]
+
+        use_strips = self.section_cache is not None and self._can_composite()
+        strip_keys = [self._strip_key(i, caption) for i, caption in enumerate(section_captions)] if use_strips else []
+        strips: list[Path] = [sp.tmp_dir / f'section_{i}.png' for i in range(len(section_captions))]
+        if use_strips and self.web_dir is None:
+            cached = [self.section_cache.fetch(key, strip) for key, strip in zip(strip_keys, strips)]
+        else:
+            cached = [False] * len(section_captions)
+
+        # mid surfaces are only needed for data file sections which are not cached
+        if all(cached[len(self.inputs.surfaces):]):
+            mid_surface_left = mid_surface_right = None
+        else:
+            mid_surface_left = self.inputs.mid_surface_left(sp)
+            mid_surface_right = self.inputs.mid_surface_right(sp)
 
         figure_data: Sequence[SectionBuilder] = (
             *(
@@ -57,66 +102,178 @@ class FigureCreator(Runnable[Path]):
             )
         )
 
-        section_captions = [
-            *(s.caption for s in self.inputs.surfaces),
-            *(s.caption for s in self.inputs.data_files)
-        ]
-
-        figure_template = (f.run(sp) for f in figure_data)
-        row_pairs = [f.to_row_pair() for f in figure_template]
-        tile_grid = [row for rows in map(_rowpair2rows, row_pairs) for row in rows]
+        # all preprocessing is submitted before any section is awaited, so that
+        # tiles of the first sections can render while later sections are prepared.
+        figure_template = [None if hit else f.run(sp) for f, hit in zip(figure_data, cached)]
+        tile_grid: list[Sequence[LazyTile]] = []
         """2D matrix of LazyTile"""
-        lazy_tiles = [tile for row in tile_grid for tile in row]
-        """1D flattened structure of data and order as tile_grid"""
+        tile_files: list[Path | str] = []
+        blank_tile = f'xc:{self.options.bg}'
+        """ImageMagick built-in image of a solid color, used for tiles without a surface"""
+        for section_index, future_section in enumerate(figure_template):
+            if future_section is None:
+                continue
+            section = future_section.result()
+            rows = _rowpair2rows(section.to_row_pair())
+            tile_grid.extend(rows)
+            section_tiles: list[tuple[IRayTrace, Path]] = []
+            section_files: list[Path | str] = []
+            for tile in (tile for row in rows for tile in row):
+                if tile.is_blank:
+                    section_files.append(blank_tile)
+                    continue
+                name = sp.tmp_dir / f'{len(tile_files) + len(section_files)}_{section_captions[section_index]}.rgb'
+                section_tiles.append((tile.ray_trace, name))
+                section_files.append(name)
+            tile_files.extend(section_files)
+            self._submit_render(sp, section, section_tiles)
+            if self.web_dir is not None:
+                web_sections.append(self._submit_web_section(sp, section_index, section_captions[section_index],
+                                                             rows, section_files, blank_tile))
+            if use_strips:
+                annotations = _annotations(rows, section_captions[section_index], first_row=0,
+                                           options=self.options)
+                sp.submit_function(
+                    _composite_and_store, self.section_cache, strip_keys[section_index],
+                    strips[section_index], tuple(None if t == blank_tile else t for t in section_files),
+                    self._layout(len(rows[0]), len(rows)), tuple(annotations),
+                    self.options.bg, self.options.font_color, self.options.font_size,
+                    produces=(strips[section_index],)
+                )
+
+        if use_strips:
+            sp.submit_function(stack, self.output_path, tuple(strips), self.options.bg,
+                               produces=(self.output_path,)).result()
+            return self.output_path
+
         n_row = len(tile_grid)
         n_col = len(tile_grid[0])
 
-        tile_files = [sp.tmp_dir / f'{i}_{section_captions[i // (n_col * 2)]}.rgb' for i in range(len(lazy_tiles))]
+        annotations: list[Annotation] = []
+        for section_index, caption in enumerate(section_captions):
+            rows = tile_grid[2 * section_index:2 * section_index + 2]
+            annotations.extend(_annotations(rows, caption, first_row=2 * section_index, options=self.options))
 
-        for tile, name in zip(lazy_tiles, tile_files):
-            cmd = tile.ray_trace.to_cmd(self.options.bg, constants.TILE_SIZE, constants.TILE_SIZE, name)
-            sp.run(cmd)
+        if self._can_composite():
+            tiles = tuple(None if t == blank_tile else t for t in tile_files)
+            sp.submit_function(
+                composite, self.output_path, tiles, self._layout(n_col, n_row), tuple(annotations),
+                self.options.bg, self.options.font_color, self.options.font_size,
+                produces=(self.output_path,)
+            ).result()
+            return self.output_path
 
         montage_file = sp.tmp_dir / 'montage_output.png'
+        size = self.options.tile_size
         montage_cmd = (
             'montage',
             '-tile', f'{n_col}x{n_row}',
             '-background', self.options.bg,
-            '-geometry', f'{constants.TILE_SIZE}x{constants.TILE_SIZE}+{constants.COL_CAP}+{constants.ROW_GAP}',
+            '-geometry', f'{size}x{size}+{self.options.col_cap}+{self.options.row_gap}',
             *tile_files,
             montage_file
         )
-        sp.run(montage_cmd)
+        sp.submit(montage_cmd, produces=(montage_file,))
 
         annotation_flags = []
-        for row, row_tiles in enumerate(tile_grid):
-            for col, tile in enumerate(row_tiles):
-                annotation_flags.extend(tile.labels2args(
-                    row, col,
-                    constants.TILE_SIZE, constants.TILE_SIZE,
-                    constants.COL_CAP, constants.ROW_GAP
-                ))
-
-        caption_x = round(constants.COL_CAP * 5 + constants.TILE_SIZE * 2 + 100)
-        for i, caption in enumerate(section_captions):
-            row = i * 2
-            caption_y = round(constants.ROW_GAP * (0.5 + 2 * row) + constants.TILE_SIZE * row)
-            annot = ['-annotate', f'0x0+{caption_x}+{caption_y}', caption]
-            annotation_flags.extend(annot)
+        for annotation in annotations:
+            annotation_flags.extend(('-annotate', f'0x0+{annotation.x}+{annotation.y}', annotation.msg))
 
         convert_cmd = (
             'convert',
             '-box', self.options.bg,
             '-fill', self.options.font_color,
-            '-pointsize', str(constants.FONT_SIZE),
+            '-pointsize', str(self.options.font_size),
             *annotation_flags,
             montage_file,
             self.output_path
         )
-        sp.run(convert_cmd)
+        sp.submit(convert_cmd, produces=(self.output_path,)).result()
 
         return self.output_path
 
+    def _submit_web_section(self, sp: Runner, section_index: int, caption: str, rows: Sequence[Sequence[LazyTile]],
+                            section_files: Sequence[Path | str], blank_tile: str
+                            ) -> tuple[dict, Future[list[dict]]]:
+        layout = self._layout(len(rows[0]), len(rows))
+        labels = _annotations(rows, caption, first_row=0, options=self.options)
+        images = sp.submit_function(
+            web.write_section, self.web_dir, section_index,
+            tuple(None if t == blank_tile else t for t in section_files), layout, self.options.bg,
+            produces=web.section_images(self.web_dir, section_index)
+        )
+        return web.describe_section(caption, rows, layout, labels), images
+
+    def _can_composite(self) -> bool:
+        return self.options.compositor == 'numpy' and supports_colors(self.options.bg, self.options.font_color)
+
+    def _layout(self, n_col: int, n_row: int) -> Layout:
+        return Layout(n_col, n_row, self.options.tile_size, self.options.col_cap, self.options.row_gap)
+
+    def _strip_key(self, section_index: int, caption: str) -> str:
+        """
+        Identify the image of a section by the contents of the files it is created from,
+        its caption and the options.
+        """
+        n_layers = len(self.inputs.surfaces)
+        if section_index < n_layers:
+            layer = self.inputs.surfaces[section_index]
+            sources = ('surface', layer.left, layer.right)
+        else:
+            files = self.inputs.data_files[section_index - n_layers]
+            sources = (
+                'data', files.left, files.right,
+                *self.options.range_for(files.left), *self.options.range_for(files.right),
+                'mid', *self.inputs.surfaces_left(), 'mid', *self.inputs.surfaces_right()
+            )
+        layout = (self.options.tile_size, self.options.col_cap, self.options.row_gap, self.options.font_size)
+        return self.section_cache.key(
+            (self.options.fingerprint(), *map(str, layout), caption, *sources), Path('section.png')
+        )
+
+    def _submit_render(self, sp: Runner, section: Section, tiles: Sequence[tuple[IRayTrace, Path]]):
+        if self.options.renderer == 'numpy':
+            surfaces = (section.surface_left, section.surface_right)
+            outputs = tuple(output for _, output in tiles)
+            sp.submit_function(render_tiles, sp, surfaces, tuple(tiles), self.options.bg, self.options.tile_size,
+                               self.options.shadows, produces=outputs)
+            return
+        for rt, output in tiles:
+            cmd = rt.to_cmd(self.options.bg, self.options.tile_size, self.options.tile_size, output,
+                            self.options.shadows)
+            sp.submit(cmd, produces=(output,), cacheable=True)
+
+
+def _annotations(rows: Sequence[Sequence[LazyTile]], caption: str, first_row: int,
+                 options: Options) -> list[Annotation]:
+    """
+    Labels of the tiles of a section, and its caption.
+
+    :param rows: rows of tiles of the section
+    :param caption: caption of the section
+    :param first_row: row of the figure where the section starts
+    :param options: sizes of tiles and spacing
+    """
+    annotations = []
+    for i, row_tiles in enumerate(rows):
+        for col, tile in enumerate(row_tiles):
+            for label in tile.labels:
+                x, y = label.position(
+                    first_row + i, col,
+                    options.tile_size, options.tile_size,
+                    options.col_cap, options.row_gap
+                )
+                annotations.append(Annotation(x, y, label.msg))
+    caption_x = round(options.col_cap * 5 + options.tile_size * 2 + options.caption_offset)
+    caption_y = round(options.row_gap * (0.5 + 2 * first_row) + options.tile_size * first_row)
+    annotations.append(Annotation(caption_x, caption_y, caption))
+    return annotations
+
+
+def _composite_and_store(cache: RenderCache, key: str, output: Path, *args):
+    composite(output, *args)
+    cache.store(key, output)
+
 
 def _rowpair2rows(row_pair: RowPair) -> tuple[Sequence[LazyTile], Sequence[LazyTile]]:
     half = len(row_pair) // 2
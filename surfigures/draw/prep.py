@@ -3,19 +3,26 @@ Helper functions for preparing surfaces for figure generation.
 """
 
 import os
+from concurrent.futures import Future
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional, Sequence
 
+from surfigures.draw.colour import colour_surface
 from surfigures.draw.section import Section
+from surfigures.draw.stats import vertstats_stats
 from surfigures.util.runnable import Runnable, Runner
+from surfigures.util.scheduler import completed, gather, then
 
 
 @dataclass(frozen=True)
-class BaseHemiPreparer(Runnable[tuple[Path, str]]):
+class BaseHemiPreparer(Runnable[tuple[Path, Future[str]]]):
     """
     No-op surface file wrapper. Subclasses of ``DrawableHemiBuilder`` apply preprocessing
     to the surface to prepare the file for use with ``ray_trace``.
+
+    The preprocessing commands are submitted to run in the background. The returned
+    surface path can be used as an argument to other submitted commands right away.
     """
     surface: Path
 
@@ -25,23 +32,35 @@ class BaseHemiPreparer(Runnable[tuple[Path, str]]):
     def generate_textblock_cmd(self) -> Optional[Sequence[str | os.PathLike]]:
         return None
 
+    def submit_preprocess_surface(self, sp: Runner, output: Path) -> Future:
+        """
+        Submit the preprocessing of the surface, writing its result to ``output``.
+        """
+        return sp.submit(self.preprocess_surface_cmd(output), produces=(output,))
+
+    def submit_generate_textblock(self, sp: Runner) -> Future[str]:
+        """
+        Submit the creation of the text block which describes this hemisphere.
+        """
+        return then(sp.submit(self.generate_textblock_cmd(), stdout=sp.PIPE), lambda p: p.stdout)
+
     def get_uniqueish_name(self) -> str:
         return self.surface.name
 
-    def run(self, sp: Runner) -> tuple[Path, str]:
+    def run(self, sp: Runner) -> tuple[Path, Future[str]]:
         tmp_colored = sp.tmp_dir / (self.get_uniqueish_name() + self.surface.suffix)
         color_cmd = self.preprocess_surface_cmd(tmp_colored)
         if color_cmd:
-            sp.run(color_cmd)
+            self.submit_preprocess_surface(sp, tmp_colored)
             colored_surface = tmp_colored
         else:
             colored_surface = self.surface
 
         stats_cmd = self.generate_textblock_cmd()
         if stats_cmd:
-            textblock = sp.run(stats_cmd, stdout=sp.PIPE).stdout
+            textblock = self.submit_generate_textblock(sp)
         else:
-            textblock = ''
+            textblock = completed('')
 
         return colored_surface, textblock
 
@@ -51,7 +70,9 @@ class ColoredHemiPreparer(BaseHemiPreparer):
     """
     Wraps a surface file with a corresponding vertex-wise data file.
 
-    It runs the commands ``colour_object`` and ``vertstats_stats``.
+    It colours the surface and computes summary statistics in-process (see
+    ``surfigures.draw.colour`` and ``surfigures.draw.stats``), falling back to
+    ``colour_object`` and ``vertstats_stats``.
     """
     data_file: Path
     data_min: str
@@ -73,16 +94,26 @@ class ColoredHemiPreparer(BaseHemiPreparer):
     def preprocess_surface_cmd(self, output: Path) -> Optional[Sequence[str | os.PathLike]]:
         return 'colour_object', self.surface, self.data_file, output, self.color_map, self.data_min, self.data_max
 
+    def submit_preprocess_surface(self, sp: Runner, output: Path) -> Future:
+        return sp.submit_function(
+            colour_surface, sp, self.surface, self.data_file, output,
+            self.color_map, self.data_min, self.data_max,
+            produces=(output,)
+        )
+
     def generate_textblock_cmd(self) -> Optional[Sequence[str | os.PathLike]]:
         return 'vertstats_stats', self.data_file
 
+    def submit_generate_textblock(self, sp: Runner) -> Future[str]:
+        return sp.submit_function(vertstats_stats, sp, self.data_file)
+
     def get_uniqueish_name(self) -> str:
         parts = [self.surface.name, self.data_file.name, self.color_map, self.data_min, self.data_max]
         return '_'.join(map(str, parts))
 
 
 @dataclass(frozen=True)
-class SectionBuilder(Runnable[Section]):
+class SectionBuilder(Runnable[Future[Section]]):
     """
     Builder for ``DrawableBrain``.
     """
@@ -90,7 +121,13 @@ class SectionBuilder(Runnable[Section]):
     left: BaseHemiPreparer
     right: BaseHemiPreparer
 
-    def run(self, sp: Runner) -> Section:
+    def run(self, sp: Runner) -> Future[Section]:
+        """
+        :returns: a future which is done once the text blocks of both hemispheres are ready
+        """
         surface_left, textblock_left = self.left.run(sp)
         surface_right, textblock_right = self.right.run(sp)
-        return Section(surface_left, surface_right, textblock_left, textblock_right)
+        return then(
+            gather(textblock_left, textblock_right),
+            lambda textblocks: Section(surface_left, surface_right, *textblocks)
+        )
@@ -0,0 +1,215 @@
+"""
+In-process renderer of surfaces, an alternative to running ``ray_trace`` once per tile.
+
+Every tile of a section shows the same one or two surfaces from different views.
+``render_tiles`` loads each surface once and rasterizes all of the views from the
+arrays in memory, using a z-buffer over NumPy arrays.
+
+The images resemble those of ``ray_trace -crop``: vertex colours are shaded by a
+light from the direction of the viewer, the object is scaled to fit the image size
+and the image is cropped to the object. Pixels outside of the object are transparent.
+Shadows are not drawn.
+"""
+
+import os
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+import numpy.typing as npt
+from loguru import logger
+
+from surfigures.draw.ray_trace import IRayTrace
+from surfigures.io.cache import load_obj
+from surfigures.io.obj import Surface
+from surfigures.io.sgi import write_sgi
+from surfigures.util.runnable import Runner, process_safe
+
+AMBIENT = 0.3
+DIFFUSE = 0.7
+_EXACT_BOX = 4
+
+NAMED_VIEWS: dict[str, tuple[tuple[float, float, float], tuple[float, float, float]]] = {
+    '-top': ((0, 0, -1), (0, 1, 0)),
+    '-bottom': ((0, 0, 1), (0, 1, 0)),
+    '-left': ((1, 0, 0), (0, 0, 1)),
+    '-right': ((-1, 0, 0), (0, 0, 1)),
+    '-front': ((0, -1, 0), (0, 0, 1)),
+    '-back': ((0, 1, 0), (0, 0, 1)),
+}
+"""
+Line of sight and up direction of the ``ray_trace`` view options.
+"""
+
+
+def camera(view_args: Sequence[str]) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """
+    Parse the view orientation options of ``ray_trace``.
+
+    :param view_args: either a named view such as ``('-left',)`` or ``('-view', x, y, z, up_x, up_y, up_z)``
+    :returns: unit vectors of the line of sight and of the up direction,
+              orthogonal to each other
+    :raises ValueError: if the options are not understood
+    """
+    if len(view_args) == 1 and view_args[0] in NAMED_VIEWS:
+        line_of_sight, up = NAMED_VIEWS[view_args[0]]
+    elif len(view_args) == 7 and view_args[0] == '-view':
+        values = tuple(map(float, view_args[1:]))
+        line_of_sight, up = values[:3], values[3:]
+    else:
+        raise ValueError(f'unsupported view: {view_args}')
+    line_of_sight = _unit(np.array(line_of_sight, dtype=np.float64))
+    up = np.array(up, dtype=np.float64)
+    up = _unit(up - np.dot(up, line_of_sight) * line_of_sight)
+    return line_of_sight, up
+
+
+def render(surfaces: Sequence[Surface], view_args: Sequence[str], size: int) -> npt.NDArray[np.uint8]:
+    """
+    Render surfaces together.
+
+    :param surfaces: surfaces to render. Surfaces without per-vertex colours are white.
+    :param view_args: view orientation, see ``camera``
+    :param size: maximum width and height of the image
+    :returns: (height, width, 4) RGBA image, cropped to the rendered surfaces
+    """
+    line_of_sight, up = camera(view_args)
+    right = np.cross(line_of_sight, up)
+    points = np.concatenate([s.points for s in surfaces]).astype(np.float64)
+    normals = np.concatenate([s.normals for s in surfaces]).astype(np.float64)
+    colours = np.concatenate([_colours_of(s) for s in surfaces])
+    offsets = np.cumsum([0] + [s.n_points for s in surfaces[:-1]])
+    triangles = np.concatenate([s.triangles + offset for s, offset in zip(surfaces, offsets)])
+
+    x = points @ right
+    y = points @ up
+    depth = points @ line_of_sight
+    extent = max(np.ptp(x), np.ptp(y))
+    scale = size / extent if extent > 0 else 1.0
+    sx = (x - x.min()) * scale
+    sy = (y.max() - y) * scale
+    width = max(1, min(size, int(np.ceil(sx.max()))))
+    height = max(1, min(size, int(np.ceil(sy.max()))))
+
+    shade = AMBIENT + DIFFUSE * np.abs(normals @ line_of_sight)
+    shaded = colours[:, :3] * shade[:, np.newaxis]
+
+    pixels, triangle, weights = _rasterize(sx, sy, depth, triangles, width, height)
+    image = np.zeros((height * width, 4), dtype=np.float64)
+    corners = triangles[triangle]
+    image[pixels, :3] = np.einsum('ij,ijk->ik', weights, shaded[corners])
+    image[pixels, 3] = 1.0
+    image = image.reshape(height, width, 4)
+    return np.rint(np.clip(image, 0, 1) * 255).astype(np.uint8)
+
+
+@process_safe
+def render_tiles(sp: Runner, surfaces: Sequence[Path], tiles: Sequence[tuple[IRayTrace, Path]],
+                 bg: str, size: int, shadows: bool = True):
+    """
+    Render many views of the same surfaces, loading each surface once.
+
+    If a surface cannot be read, ``ray_trace`` is run for every tile instead.
+
+    :param sp: runner for falling back to ``ray_trace``
+    :param surfaces: every surface which appears in ``tiles``
+    :param tiles: pairs of what to render and the output ``.rgb`` file
+    :param bg: background color, only used by ``ray_trace``
+    :param size: maximum width and height of every tile
+    :param shadows: whether ``ray_trace`` renders shadows (the numpy renderer never does)
+    """
+    try:
+        loaded = {os.fspath(s): load_obj(s) for s in surfaces}
+    except ValueError as e:
+        logger.debug('Falling back to ray_trace: {}', e)
+        for rt, output in tiles:
+            sp.run(rt.to_cmd(bg, size, size, output, shadows))
+        return
+    for rt, output in tiles:
+        meshes = [loaded[os.fspath(s)] for s in rt.surfaces()]
+        write_sgi(output, render(meshes, rt.view_args(), size))
+
+
+def _rasterize(sx: npt.NDArray, sy: npt.NDArray, depth: npt.NDArray, triangles: npt.NDArray,
+               width: int, height: int) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.intp], npt.NDArray]:
+    """
+    Find the nearest triangle covering the center of every pixel.
+
+    Triangles are grouped by the size of their bounding box in pixels, so that the
+    candidate pixels of each group can be tested all at once.
+
+    :returns: indices of covered pixels (row-major), the triangle covering each pixel,
+              and the barycentric coordinates of each pixel center in its triangle.
+    """
+    ax, bx, cx = (sx[triangles[:, i]] for i in range(3))
+    ay, by, cy = (sy[triangles[:, i]] for i in range(3))
+    x0 = np.floor(np.minimum(np.minimum(ax, bx), cx) - 0.5).astype(np.intp)
+    y0 = np.floor(np.minimum(np.minimum(ay, by), cy) - 0.5).astype(np.intp)
+    x1 = np.floor(np.maximum(np.maximum(ax, bx), cx) - 0.5).astype(np.intp)
+    y1 = np.floor(np.maximum(np.maximum(ay, by), cy) - 0.5).astype(np.intp)
+    denominator = (by - cy) * (ax - cx) + (cx - bx) * (ay - cy)
+    valid = denominator != 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # barycentric coordinates of (x, y) are w0 = u0 * (x - cx) + v0 * (y - cy), same for w1
+        u0, v0 = (by - cy) / denominator, (cx - bx) / denominator
+        u1, v1 = (cy - ay) / denominator, (ax - cx) / denominator
+
+    fragments = []
+    for (box_w, box_h), group in _group_by_box(x1 - x0 + 1, y1 - y0 + 1, valid):
+        oy, ox = (o.ravel() for o in np.mgrid[0:box_h, 0:box_w])
+        px = x0[group, np.newaxis] + ox
+        py = y0[group, np.newaxis] + oy
+        fx = px + (0.5 - cx[group, np.newaxis])
+        fy = py + (0.5 - cy[group, np.newaxis])
+        w0 = u0[group, np.newaxis] * fx + v0[group, np.newaxis] * fy
+        w1 = u1[group, np.newaxis] * fx + v1[group, np.newaxis] * fy
+        inside = (w0 >= 0) & (w1 >= 0) & (w0 + w1 <= 1) & (px >= 0) & (px < width) & (py >= 0) & (py < height)
+        rows, cols = np.nonzero(inside)
+        t = group[rows]
+        a, b = w0[rows, cols], w1[rows, cols]
+        w = np.stack((a, b, 1 - a - b), axis=1)
+        z = np.einsum('ij,ij->i', w, depth[triangles[t]])
+        fragments.append((py[rows, cols] * width + px[rows, cols], t, w, z))
+
+    if not fragments:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty((0, 3))
+    pixels, triangle, weights, z = (np.concatenate(parts) for parts in zip(*fragments))
+    order = np.lexsort((z, pixels))
+    pixels = pixels[order]
+    nearest = np.ones(len(pixels), dtype=bool)
+    nearest[1:] = pixels[1:] != pixels[:-1]
+    keep = order[nearest]
+    return pixels[nearest], triangle[keep], weights[keep]
+
+
+def _group_by_box(box_w: npt.NDArray, box_h: npt.NDArray, valid: npt.NDArray[np.bool_]):
+    """
+    Group triangles by a box size which fits their bounding box, exact for small boxes
+    (which are the majority) and rounded up to a power of 2 for larger ones.
+
+    :returns: generator of box width and height, and the indices of triangles
+    """
+    box_w, box_h = (np.where(b <= _EXACT_BOX, b, 2 ** np.ceil(np.log2(b)).astype(np.intp)) for b in (box_w, box_h))
+    keys = box_w * (box_h.max(initial=0) + 1) + box_h
+    keys[~valid] = -1
+    order = np.argsort(keys, kind='stable')
+    unique, starts = np.unique(keys[order], return_index=True)
+    ends = np.append(starts[1:], len(order))
+    for key, start, end in zip(unique.tolist(), starts.tolist(), ends.tolist()):
+        if key < 0:
+            continue
+        group = order[start:end]
+        yield (int(box_w[group[0]]), int(box_h[group[0]])), group
+
+
+def _colours_of(surface: Surface) -> npt.NDArray:
+    if surface.colours is None:
+        return np.ones((surface.n_points, 4))
+    return np.asarray(surface.colours, dtype=np.float64)
+
+
+def _unit(v: npt.NDArray) -> npt.NDArray:
+    norm = np.linalg.norm(v)
+    if norm == 0:
+        raise ValueError('direction must not be zero')
+    return v / norm
@@ -14,21 +14,35 @@ class IRayTrace(abc.ABC):
     ``ray_trace`` inputs and pre-configuration.
     """
 
-    def to_cmd(self, bg: str, x_size: int, y_size: int, output: str | os.PathLike) -> Sequence[str]:
+    def to_cmd(self, bg: str, x_size: int, y_size: int, output: str | os.PathLike,
+               shadows: bool = True) -> Sequence[str]:
         """
         Produce a command which runs ``ray_trace`` with this as input.
         """
         return (
-            'ray_trace', '-shadows', '-output', str(output),
+            'ray_trace', '-shadows' if shadows else '-noshadows', '-output', str(output),
             '-bg', bg, '-crop', '-size', str(x_size), str(y_size),
             *self.to_args()
         )
 
-    @abc.abstractmethod
     def to_args(self) -> Iterable[str]:
         """
         Produce arguments for ``ray_trace`` which specify this as input.
         """
+        return *self.view_args(), *self.surfaces()
+
+    @abc.abstractmethod
+    def view_args(self) -> Sequence[str]:
+        """
+        Arguments for ``ray_trace`` which specify the view orientation.
+        """
+        ...
+
+    @abc.abstractmethod
+    def surfaces(self) -> Sequence[os.PathLike]:
+        """
+        Surfaces to render together.
+        """
         ...
 
 
@@ -37,8 +51,11 @@ class EmptyRayTrace(IRayTrace):
     Empty image file ``ray_trace`` configuration.
     """
 
-    def to_args(self) -> Iterable[str]:
-        return []
+    def view_args(self) -> Sequence[str]:
+        return ()
+
+    def surfaces(self) -> Sequence[os.PathLike]:
+        return ()
 
 
 class HemiPos(tuple[str, ...], enum.Enum):
@@ -66,8 +83,11 @@ class HemiRayTrace(IRayTrace):
     surface: os.PathLike
     view: HemiPos
 
-    def to_args(self) -> Iterable[str]:
-        return *self.view.value, self.surface
+    def view_args(self) -> Sequence[str]:
+        return self.view.value
+
+    def surfaces(self) -> Sequence[os.PathLike]:
+        return self.surface,
 
 
 @dataclass(frozen=True)
@@ -76,5 +96,8 @@ class WholeBrainRayTrace(IRayTrace):
     surface_right: os.PathLike
     view: WholeBrainPos
 
-    def to_args(self) -> Iterable[str]:
-        return self.view.value, self.surface_left, self.surface_right
+    def view_args(self) -> Sequence[str]:
+        return self.view.value,
+
+    def surfaces(self) -> Sequence[os.PathLike]:
+        return self.surface_left, self.surface_right
@@ -0,0 +1,50 @@
+"""
+In-process replacement for ``vertstats_stats``.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+from loguru import logger
+
+from surfigures.io.cache import load_vertstats
+from surfigures.util.runnable import Runner, process_safe
+
+
+def summarize(data: npt.NDArray) -> str:
+    """
+    Summary statistics of vertex-wise data, formatted like the output of ``vertstats_stats``.
+
+    Like ``vertstats_stats``, the median of an even number of values is the upper of the
+    two middle values, and the standard deviation is of the population.
+    """
+    n = len(data)
+    upper_middle = n // 2
+    median = np.partition(data, upper_middle)[upper_middle]
+    total = data.sum()
+    mean = total / n
+    stdev = np.sqrt(np.mean(np.square(data - mean)))
+    return (
+        'Column0: \n'
+        f' Maximum: {data.max():g}\n'
+        f' Minimum: {data.min():g}\n'
+        f' Median:  {median:g}\n'
+        f' Mean:    {mean:g}\n'
+        f' Stdev:   {stdev:g}\n'
+        f' Sum:     {total:g}\n'
+    )
+
+
+@process_safe
+def vertstats_stats(sp: Runner, data_file: Path) -> str:
+    """
+    Summarize a vertex-wise data file, falling back to running ``vertstats_stats``
+    if the file cannot be read in-process.
+    """
+    try:
+        data = load_vertstats(data_file)
+    except ValueError as e:
+        logger.debug('Falling back to vertstats_stats: {}', e)
+        return sp.run(('vertstats_stats', data_file), stdout=sp.PIPE).stdout
+    return summarize(data)
@@ -4,7 +4,7 @@ Representations of tiles and parts of tiles.
 
 import dataclasses
 from dataclasses import dataclass
-from typing import Iterable, Sequence, Self
+from typing import Iterable, Self
 
 from surfigures.draw.ray_trace import IRayTrace, EmptyRayTrace
 
@@ -12,7 +12,7 @@ from surfigures.draw.ray_trace import IRayTrace, EmptyRayTrace
 @dataclass(frozen=True)
 class PositionedLabel:
     """
-    Some text to draw using ImageMagick over a tile.
+    Some text to draw over a tile, see ``Annotation``.
     """
     x: float
     """x position ratio"""
@@ -21,17 +21,15 @@ class PositionedLabel:
     msg: str
     """label contents"""
 
-    def at(self, row: int, col: int, tile_size_x: int, tile_size_y: int, spacing_x: int, spacing_y: int) -> Sequence[str]:
+    def position(self, row: int, col: int, tile_size_x: int, tile_size_y: int,
+                 spacing_x: int, spacing_y: int) -> tuple[int, int]:
         """
-        Produce an ``-annotate`` option which draws this label on a montage.
+        Position of the baseline of this label on a figure, in pixels, where tiles are
+        laid out like ``montage -geometry {tile_size_x}x{tile_size_y}+{spacing_x}+{spacing_y}``.
         """
         x = round((self.x + col) * tile_size_x + (2 * col + 1) * spacing_x)
         y = round((self.y + row) * tile_size_y + (2 * row + 1) * spacing_y)
-        return (
-            '-annotate',
-            f'0x0+{x}+{y}',
-            self.msg
-        )
+        return x, y
 
 
 @dataclass(frozen=True)
@@ -43,13 +41,12 @@ class LazyTile:
     ray_trace: IRayTrace
     labels: Iterable[PositionedLabel] = dataclasses.field(default_factory=tuple)
 
-    def labels2args(self, row: int, col: int, tile_size_x: int, tile_size_y: int,
-                    spacing_x: int, spacing_y: int) -> list[str]:
+    @property
+    def is_blank(self) -> bool:
         """
-        :returns: ``-annotate`` flags for all labels in this tile
+        Whether this tile has no image, in which case there is no need to run ``ray_trace``.
         """
-        annots = (label.at(row, col, tile_size_x, tile_size_y, spacing_x, spacing_y) for label in self.labels)
-        return [arg for annot in annots for arg in annot]
+        return isinstance(self.ray_trace, EmptyRayTrace)
 
     @classmethod
     def text_only(cls, text: str, x: float = 0.15, y: float = 0.20) -> Self:
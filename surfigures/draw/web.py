@@ -0,0 +1,139 @@
+"""
+Figures for web viewers, which only load the parts of a figure which are visible.
+
+Next to the figure, a directory is written with the image of every section at several
+resolutions (without any text), and a JSON manifest of where the sections, tiles and
+labels are. Viewers load the images of the sections which are scrolled into view, at
+the resolution which they are shown at, and draw the labels themselves.
+
+Positions in the manifest are in pixels of the full-resolution figure, where sections
+are stacked from top to bottom like in the figure. Within a section, positions of tiles
+and labels are relative to the top left corner of the section.
+"""
+
+import json
+from pathlib import Path
+from typing import Optional, Sequence
+
+from PIL import Image, ImageColor, features
+
+from surfigures.draw.composite import Annotation, Layout, arrange
+from surfigures.draw.tile import LazyTile
+from surfigures.util.runnable import process_safe
+
+MANIFEST_NAME = 'manifest.json'
+LEVELS = (1, 2, 4)
+"""downsampling factors of the images of every section"""
+_FORMAT_VERSION = 1
+
+
+def web_dir_of(output_file: Path) -> Path:
+    """
+    Directory of the web viewer files of a figure.
+    """
+    return output_file.with_suffix('.web')
+
+
+def image_suffix() -> str:
+    """
+    WebP if Pillow supports it, which is much smaller than PNG without loss, otherwise PNG.
+    """
+    return '.webp' if features.check('webp') else '.png'
+
+
+def section_images(web_dir: Path, index: int) -> tuple[Path, ...]:
+    """
+    Image files of a section, one per level of ``LEVELS``.
+    """
+    return tuple(web_dir / f'section_{index}_{factor}x{image_suffix()}' for factor in LEVELS)
+
+
+@process_safe
+def write_section(web_dir: Path, index: int, tiles: Sequence[Optional[Path]], layout: Layout, bg: str) -> list[dict]:
+    """
+    Write the image of a section at every level of ``LEVELS``.
+
+    :param web_dir: output directory
+    :param index: index of the section in the figure
+    :param tiles: SGI images of tiles in row-major order, where ``None`` is a blank tile
+    :param layout: positions of tiles
+    :param bg: background color
+    :returns: description of every image for the manifest
+    """
+    web_dir.mkdir(parents=True, exist_ok=True)
+    image = Image.fromarray(arrange(tiles, layout, ImageColor.getrgb(bg)[:3]))
+    images = []
+    for factor, path in zip(LEVELS, section_images(web_dir, index)):
+        scaled = image if factor == 1 else image.reduce(factor)
+        scaled.save(path, **({'lossless': True} if path.suffix == '.webp' else {}))
+        images.append({'downsample': factor, 'file': path.name, 'width': scaled.width, 'height': scaled.height})
+    return images
+
+
+def describe_section(caption: str, rows: Sequence[Sequence[LazyTile]], layout: Layout,
+                     labels: Sequence[Annotation]) -> dict:
+    """
+    Positions of the tiles and labels of a section.
+
+    :param caption: caption of the section
+    :param rows: rows of tiles of the section
+    :param layout: positions of tiles
+    :param labels: text drawn over the section, including its caption
+    """
+    tiles = []
+    for row, row_tiles in enumerate(rows):
+        for col, tile in enumerate(row_tiles):
+            if tile.is_blank:
+                continue
+            tiles.append({
+                'row': row,
+                'col': col,
+                'x': col * layout.cell_width + layout.spacing_x,
+                'y': row * layout.cell_height + layout.spacing_y,
+                'width': layout.tile_size,
+                'height': layout.tile_size,
+                'labels': [label.msg for label in tile.labels if label.msg.strip()]
+            })
+    height, width = layout.shape
+    return {
+        'caption': caption,
+        'width': width,
+        'height': height,
+        'tiles': tiles,
+        'labels': [{'x': label.x, 'y': label.y, 'text': label.msg} for label in labels if label.msg.strip()]
+    }
+
+
+def write_manifest(web_dir: Path, title: str, figure: Path, sections: Sequence[dict], images: Sequence[list[dict]],
+                   font_size: int, bg: str, font_color: str):
+    """
+    Write the manifest of a figure.
+
+    :param web_dir: output directory
+    :param title: name of the subject
+    :param figure: the full figure, which is next to ``web_dir``
+    :param sections: descriptions from ``describe_section``
+    :param images: descriptions from ``write_section`` of every section
+    :param font_size: size of labels in pixels
+    :param bg: background color, also the color of boxes behind labels
+    :param font_color: color of labels
+    """
+    described = []
+    top = 0
+    for section, levels in zip(sections, images):
+        described.append({'top': top, **section, 'images': levels})
+        top += section['height']
+    manifest = {
+        'version': _FORMAT_VERSION,
+        'title': title,
+        'figure': figure.name,
+        'width': max((s['width'] for s in sections), default=0),
+        'height': top,
+        'levels': list(LEVELS),
+        'font_size': font_size,
+        'background': bg,
+        'font_color': font_color,
+        'sections': described
+    }
+    web_dir.mkdir(parents=True, exist_ok=True)
+    (web_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=1))
@@ -0,0 +1,157 @@
+"""
+In-memory index of an input directory tree.
+
+Finding inputs asks the same questions about the same directories many times
+(does it contain ``.obj`` files? which files match a pattern? does the right-sided
+counterpart of a file exist?). On network file systems, every one of those is
+a round trip. ``DirIndex`` lists every directory once using ``os.scandir``,
+after which all of those questions are answered from memory.
+
+Directories are listed lazily, when they are first reached by ``directories`` or asked
+about, so subjects can be found (and rendered) while the rest of a large tree is not
+listed yet.
+"""
+
+import fnmatch
+import os
+import re
+from pathlib import Path
+from functools import lru_cache
+from typing import Callable, Iterator, Optional
+
+
+class DirIndex:
+    """
+    Names of the files and subdirectories of every directory under a root directory.
+
+    Symbolic links to directories are followed, once.
+    """
+
+    def __init__(self, root: Path):
+        self.__root = root
+        self.__root_str = os.fspath(root)
+        # keyed by str, which is much faster to hash than Path
+        self.__files: dict[str, tuple[str, ...]] = {}
+        self.__file_sets: dict[str, frozenset[str]] = {}
+        self.__subdirs: dict[str, tuple[str, ...]] = {}
+        self.__subdir_sets: dict[str, frozenset[str]] = {}
+        self.__followed_links: set[str] = set()
+
+    @property
+    def root(self) -> Path:
+        return self.__root
+
+    def __list(self, directory: str):
+        if directory in self.__files:
+            return
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if not _is_dir(entry):
+                        files.append(entry.name)
+                    elif _follow_once(entry, self.__followed_links):
+                        subdirs.append(entry.name)
+        except OSError:
+            pass
+        files.sort()
+        subdirs.sort()
+        self.__files[directory] = tuple(files)
+        self.__file_sets[directory] = frozenset(files)
+        self.__subdirs[directory] = tuple(subdirs)
+        self.__subdir_sets[directory] = frozenset(subdirs)
+
+    def __listed(self, directory: str) -> bool:
+        """
+        List a directory if it is in the tree and was not listed yet.
+
+        :returns: whether it is a directory of the tree
+        """
+        if directory not in self.__files:
+            if not self.__is_dir(directory):
+                return False
+            self.__list(directory)
+        return True
+
+    def __is_dir(self, directory: str) -> bool:
+        if directory == self.__root_str:
+            return True
+        if not directory.startswith(self.__root_str + os.sep):
+            return False
+        parent, name = os.path.split(directory)
+        return self.__listed(parent) and name in self.__subdir_sets[parent]
+
+    def directories(self) -> Iterator[Path]:
+        """
+        Every directory, including the root, parents before their subdirectories,
+        depth-first in sorted order. Directories are listed as they are reached.
+        """
+        stack = [self.__root_str]
+        while stack:
+            directory = stack.pop()
+            self.__list(directory)
+            yield Path(directory)
+            stack.extend(os.path.join(directory, name) for name in reversed(self.__subdirs[directory]))
+
+    def leaf_directories(self) -> Iterator[Path]:
+        """
+        Directories which do not contain subdirectories.
+        """
+        return (d for d in self.directories() if not self.__subdirs[os.fspath(d)])
+
+    def files(self, directory: Path) -> tuple[str, ...]:
+        """
+        Names of files (and anything else which is not a directory) in a directory.
+        """
+        key = os.fspath(directory)
+        return self.__files[key] if self.__listed(key) else ()
+
+    def glob(self, directory: Path, pattern: str) -> list[Path]:
+        """
+        Same as ``directory.glob(pattern)`` for files, where ``pattern`` has no ``/``.
+        """
+        match = _compile(pattern)
+        return [directory / name for name in self.files(directory) if match(name)]
+
+    def contains(self, directory: Path, pattern: str) -> bool:
+        """
+        Whether any file in a directory matches the pattern.
+        """
+        match = _compile(pattern)
+        return any(match(name) for name in self.files(directory))
+
+    def is_file(self, path: Path) -> bool:
+        parent, name = os.path.split(path)
+        return self.__listed(parent) and name in self.__file_sets[parent]
+
+    def is_dir(self, path: Path) -> bool:
+        return self.__is_dir(os.fspath(path))
+
+    def exists(self, path: Path) -> bool:
+        return self.is_file(path) or self.is_dir(path)
+
+
+@lru_cache(maxsize=64)
+def _compile(pattern: str) -> Callable[[str], Optional[re.Match]]:
+    return re.compile(fnmatch.translate(pattern)).match
+
+
+def _is_dir(entry: os.DirEntry) -> bool:
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+
+def _follow_once(entry: os.DirEntry, followed: set[str]) -> bool:
+    """
+    Whether to list a subdirectory: always, unless it is a symbolic link to a directory which was already listed.
+    """
+    if not entry.is_symlink():
+        return True
+    target = os.path.realpath(entry.path)
+    if target in followed:
+        return False
+    followed.add(target)
+    return True
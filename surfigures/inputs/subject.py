@@ -1,15 +1,15 @@
 import dataclasses
-import shlex
-import subprocess
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Self, Iterable
+from typing import Self, Iterable, Optional, Sequence
 
 from loguru import logger
 
 from surfigures.inputs.err import InputError
 from surfigures.inputs.groups import Layer, DataFiles
-from surfigures.util.runnable import Runner
+from surfigures.io.cache import load_obj, load_vertstats
+from surfigures.io.obj import average, write_obj
+from surfigures.util.runnable import Runner, process_safe
 
 
 @dataclass(frozen=True)
@@ -23,14 +23,42 @@ class SubjectSet:
     surfaces: list[Layer]
     data_files: list[DataFiles]
 
-    def sort(self) -> Self:
+    def sort(self, sidecar_dir: Optional[Path] = None) -> Self:
         """
         Sort the surfaces from outer to inner.
+
+        :param sidecar_dir: directory for binary copies of surfaces, see ``surfigures.io.obj.read_obj``
         """
         surfaces = self.surfaces.copy()
-        surfaces.sort(key=_surface_area_of_left, reverse=True)
+        surfaces.sort(key=lambda layer: _surface_area_of_left(layer, sidecar_dir), reverse=True)
         return dataclasses.replace(self, surfaces=surfaces)
 
+    def validate(self, sidecar_dir: Optional[Path] = None):
+        """
+        Check that every data file has one value per vertex of the surfaces.
+
+        Data files which cannot be parsed in-process are not checked.
+
+        :raises InputError: if a data file does not match the surfaces
+        """
+        if not self.surfaces:
+            return
+        for side in ('left', 'right'):
+            surface = getattr(self.surfaces[0], side)
+            try:
+                n_points = load_obj(surface, sidecar_dir).n_points
+            except (OSError, ValueError) as e:
+                raise InputError(f'Unable to read surface: {e}')
+            for files in self.data_files:
+                data_file = getattr(files, side)
+                try:
+                    n_values = len(load_vertstats(data_file))
+                except ValueError:
+                    continue
+                if n_values != n_points:
+                    raise InputError(f'{data_file} has {n_values} values, '
+                                     f'but {surface} has {n_points} vertices')
+
     def surfaces_left(self) -> Iterable[Path]:
         return (layer.left for layer in self.surfaces)
 
@@ -45,18 +73,27 @@ class SubjectSet:
 
     def _mid_surface_of(self, sp: Runner, suffix: str, surfaces: Iterable[Path]) -> Path:
         name = sp.tmp_dir / f'{self.title}_{suffix}.obj'
-        sp.run(('average_surfaces', name, 'none', 'none', '1', *surfaces))
+        sp.submit_function(_average_surfaces, sp, name, tuple(surfaces), produces=(name,))
         return name
 
-def _surface_area_of_left(layer: Layer) -> float:
-    cmd = ('surface-stats', '-face_area', layer.left)
-    str_cmd = shlex.join(map(str, cmd))
-    p = subprocess.run(cmd, text=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
-    if p.returncode != 0:
-        raise InputError(f'Command failed: {str_cmd}')
+
+@process_safe
+def _average_surfaces(sp: Runner, output: Path, surfaces: Sequence[Path]):
+    """
+    Compute the mean of surfaces in-process, falling back to ``average_surfaces``
+    if the surfaces cannot be averaged vertex-wise.
+    """
+    try:
+        write_obj(output, average([load_obj(s) for s in surfaces]))
+    except ValueError as e:
+        logger.debug('Falling back to average_surfaces for {}: {}', output, e)
+        sp.run(('average_surfaces', output, 'none', 'none', '1', *surfaces))
+
+
+def _surface_area_of_left(layer: Layer, sidecar_dir: Optional[Path]) -> float:
     try:
-        area = float(p.stderr.rsplit('=', 1)[-1].strip())
-    except ValueError:
-        raise InputError(f'Unable to parse output from command: {str_cmd} :::: output: {p.stderr}')
-    logger.info('running: {} => Total Surface Area = {}', str_cmd, area)
+        area = load_obj(layer.left, sidecar_dir).area()
+    except (OSError, ValueError) as e:
+        raise InputError(f'Unable to read surface: {e}')
+    logger.info('{} => Total Surface Area = {}', layer.left, area)
     return area
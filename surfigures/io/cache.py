@@ -0,0 +1,139 @@
+"""
+A thread-safe, memory-bounded cache of parsed input files, shared by every stage of a run.
+
+A file is parsed at most once while it stays in the cache, no matter how many stages
+(validation, colouring, statistics, ...) or subjects need it, nor by which path it was
+found. Entries are identified by resolved path, modification time and size, so a file
+which is modified is parsed again.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Optional, TypeVar
+
+import numpy as np
+import numpy.typing as npt
+
+from surfigures.io.obj import Surface, read_obj
+from surfigures.io.vertstats import read_vertstats
+
+T = TypeVar('T')
+
+DEFAULT_MAX_BYTES = 1024 ** 3
+
+
+class ArrayCache:
+    """
+    Least-recently-used cache of arrays parsed from files, bounded by the total size of the arrays.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.__max_bytes = max_bytes
+        self.__lock = threading.Lock()
+        self.__entries: OrderedDict[tuple, tuple[object, int]] = OrderedDict()
+        self.__loading: dict[tuple, Future] = {}
+        self.__size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_bytes(self) -> int:
+        return self.__max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value: int):
+        with self.__lock:
+            self.__max_bytes = value
+            self.__evict()
+
+    def get(self, path: Path, loader: Callable[[Path], T], kind: str = '') -> T:
+        """
+        Get the parsed contents of a file, calling ``loader(path)`` if they are not cached.
+        If another thread is already parsing the same file, wait for its result.
+
+        :param path: file to parse
+        :param loader: parser
+        :param kind: distinguishes between different parsers of the same file
+        """
+        st = path.stat()
+        key = (kind, path.resolve(), st.st_mtime_ns, st.st_size)
+        with self.__lock:
+            if key in self.__entries:
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return self.__entries[key][0]
+            pending = self.__loading.get(key)
+            if pending is None:
+                self.misses += 1
+                pending = Future()
+                self.__loading[key] = pending
+                is_loader = True
+            else:
+                is_loader = False
+        if not is_loader:
+            return pending.result()
+        try:
+            value = loader(path)
+        except BaseException as e:
+            with self.__lock:
+                del self.__loading[key]
+            pending.set_exception(e)
+            raise
+        size = _nbytes(value)
+        with self.__lock:
+            del self.__loading[key]
+            if size <= self.__max_bytes:
+                self.__entries[key] = (value, size)
+                self.__size += size
+                self.__evict()
+        pending.set_result(value)
+        return value
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__size = 0
+
+    def __evict(self):
+        while self.__size > self.__max_bytes and self.__entries:
+            _, (_, size) = self.__entries.popitem(last=False)
+            self.__size -= size
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, np.ndarray):
+        return 0 if isinstance(value, np.memmap) else value.nbytes
+    if isinstance(value, Surface):
+        return sum(_nbytes(a) for a in (value.points, value.normals, value.triangles, value.colours) if a is not None)
+    return 0
+
+
+shared = ArrayCache()
+"""The cache used by ``load_obj`` and ``load_vertstats``."""
+
+default_sidecar_dir: Optional[Path] = None
+"""
+Directory of binary copies of surfaces used by ``load_obj``, see ``surfigures.io.obj.read_obj``.
+It is set for the whole run, so that every process (see ``surfigures.util.workers``)
+memory-maps the same copies instead of parsing ``.obj`` files again.
+"""
+
+
+def load_obj(path: Path, sidecar_dir: Optional[Path] = None) -> Surface:
+    """
+    Same as ``surfigures.io.obj.read_obj``, using the shared cache.
+
+    :param sidecar_dir: directory of binary copies of surfaces, ``default_sidecar_dir`` if not given
+    """
+    if sidecar_dir is None:
+        sidecar_dir = default_sidecar_dir
+    return shared.get(path, lambda p: read_obj(p, sidecar_dir), 'obj')
+
+
+def load_vertstats(path: Path) -> npt.NDArray[np.float64]:
+    """
+    Same as ``surfigures.io.vertstats.read_vertstats``, using the shared cache.
+    """
+    return shared.get(path, read_vertstats, 'vertstats')
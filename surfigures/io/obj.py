@@ -0,0 +1,266 @@
+"""
+Reading and writing MNI .obj polygonal surface files as NumPy arrays.
+
+Only the ASCII format of triangle meshes is supported, which is what CIVET
+and the MNI tools produce. The file layout is::
+
+    P ambient diffuse specular shininess transparency n_points
+    (n_points lines of) x y z
+    (n_points lines of) normal_x normal_y normal_z
+    n_items
+    colour_flag (1 or n_items or n_points of) r g b a
+    (n_items) end indices
+    (3 * n_items) vertex indices
+
+Parsing ASCII is slow compared to loading binary data, so ``read_obj`` can
+keep a memory-mapped copy of the arrays in a sidecar directory. Sidecars of
+modified or deleted surfaces are never read again, ``prune_sidecars`` deletes
+the least recently used ones.
+"""
+
+import hashlib
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from surfigures.util.files import atomic_writer
+
+_N_SURFPROP = 5
+_DEFAULT_SURFPROP = '0.3 0.3 0.4 10 1'
+_COLOUR_FLAGS = (0, 1, 2)
+"""ONE_COLOUR, PER_ITEM_COLOURS, PER_VERTEX_COLOURS"""
+_ONE_COLOUR = 0
+_PER_VERTEX_COLOURS = 2
+_SIDECAR_PARTS = ('points', 'normals', 'triangles', 'colours')
+
+
+@dataclass(frozen=True)
+class Surface:
+    """
+    Vertex coordinates and triangles of an MNI polygonal surface.
+    """
+    points: npt.NDArray[np.float32]
+    """(n_points, 3) vertex coordinates"""
+    normals: npt.NDArray[np.float32]
+    """(n_points, 3) vertex normals"""
+    triangles: npt.NDArray[np.int32]
+    """(n_triangles, 3) indices of vertices"""
+    colours: Optional[npt.NDArray[np.float32]] = None
+    """(n_points, 4) RGBA colour of every vertex, or ``None`` if colours are not per-vertex"""
+
+    @classmethod
+    def from_points(cls, points: npt.ArrayLike, triangles: npt.NDArray[np.int32]) -> 'Surface':
+        """
+        Create a surface, computing its normals.
+        """
+        points = np.asarray(points, dtype=np.float32)
+        return cls(points, vertex_normals(points, triangles), triangles)
+
+    @property
+    def n_points(self) -> int:
+        return len(self.points)
+
+    def same_topology(self, other: 'Surface') -> bool:
+        return self.n_points == other.n_points and np.array_equal(self.triangles, other.triangles)
+
+    def face_areas(self) -> npt.NDArray[np.float64]:
+        """
+        Area of every triangle.
+        """
+        return 0.5 * np.linalg.norm(_face_cross_products(self.points, self.triangles), axis=1)
+
+    def area(self) -> float:
+        """
+        Total surface area, same as the output of ``surface-stats -face_area``.
+        """
+        return float(self.face_areas().sum())
+
+
+def average(surfaces: Sequence[Surface]) -> Surface:
+    """
+    Vertex-wise mean of surfaces, same as ``average_surfaces`` (without ``-rms``).
+
+    :raises ValueError: if the surfaces do not all have the same topology
+    """
+    first = surfaces[0]
+    if not all(first.same_topology(other) for other in surfaces[1:]):
+        raise ValueError('surfaces do not have the same topology')
+    points = np.mean([s.points for s in surfaces], axis=0, dtype=np.float64)
+    return Surface.from_points(points, first.triangles)
+
+
+def vertex_normals(points: npt.NDArray, triangles: npt.NDArray[np.int32]) -> npt.NDArray[np.float32]:
+    """
+    Unit normal vector of every vertex, the area-weighted average of the normals of its faces.
+    """
+    face_normals = _face_cross_products(points, triangles)
+    normals = np.zeros((len(points), 3), dtype=np.float64)
+    for i in range(3):
+        np.add.at(normals, triangles[:, i], face_normals)
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    lengths[lengths == 0] = 1
+    return (normals / lengths).astype(np.float32)
+
+
+def _face_cross_products(points: npt.NDArray, triangles: npt.NDArray[np.int32]) -> npt.NDArray[np.float64]:
+    a, b, c = (points[triangles[:, i]].astype(np.float64) for i in range(3))
+    return np.cross(b - a, c - a)
+
+
+def read_obj(path: Path, sidecar_dir: Optional[Path] = None) -> Surface:
+    """
+    Read an ASCII MNI .obj file of a triangle mesh.
+
+    :param path: .obj file
+    :param sidecar_dir: if given, a binary copy of the surface is kept in this directory
+                        and memory-mapped by later calls, until the .obj file is modified.
+    :raises ValueError: if the file is not a supported .obj file
+    """
+    if sidecar_dir is None:
+        return _parse_obj(path)
+    sidecars = _sidecar_paths(path, sidecar_dir)
+    try:
+        points, normals, triangles, colours = (np.load(p, mmap_mode='r') for p in sidecars)
+        os.utime(sidecars[0])  # modification time of the points is used as the LRU timestamp
+        return Surface(points, normals, triangles, colours if len(colours) else None)
+    except (OSError, ValueError):
+        pass
+    surface = _parse_obj(path)
+    colours = surface.colours if surface.colours is not None else np.empty((0, 4), dtype=np.float32)
+    try:
+        sidecar_dir.mkdir(parents=True, exist_ok=True)
+        for array, sidecar in zip((surface.points, surface.normals, surface.triangles, colours), sidecars):
+            _atomic_save(sidecar, array)
+    except OSError:
+        pass  # the sidecar is only an optimization
+    return surface
+
+
+def prune_sidecars(sidecar_dir: Path, max_bytes: int) -> int:
+    """
+    Delete the sidecars of the least recently used surfaces until the total size
+    of ``sidecar_dir`` is at most ``max_bytes``.
+
+    :returns: number of surfaces whose sidecars were deleted
+    """
+    surfaces: dict[str, list[Path]] = {}
+    for sidecar in sidecar_dir.glob('*.npy'):
+        if not sidecar.name.startswith('.'):
+            surfaces.setdefault(sidecar.name.rsplit('.', 2)[0], []).append(sidecar)
+    entries = []
+    for sidecars in surfaces.values():
+        try:
+            stats = [p.stat() for p in sidecars]
+        except FileNotFoundError:
+            continue
+        entries.append((max(st.st_mtime for st in stats), sum(st.st_size for st in stats), sidecars))
+    entries.sort(key=lambda entry: entry[0])
+    total = sum(size for _, size, _ in entries)
+    pruned = 0
+    for _, size, sidecars in entries:
+        if total <= max_bytes:
+            break
+        for sidecar in sidecars:
+            sidecar.unlink(missing_ok=True)
+        total -= size
+        pruned += 1
+    return pruned
+
+
+def write_obj(path: Path, surface: Surface, colours: Optional[npt.NDArray] = None):
+    """
+    Write an ASCII MNI .obj file.
+
+    :param path: output file
+    :param surface: surface to write
+    :param colours: (n_points, 4) RGBA values between 0 and 1 for every vertex.
+                    If not given, the surface is white (``surface.colours`` is not written).
+    """
+    n_triangles = len(surface.triangles)
+    with path.open('w') as f:
+        f.write(f'P {_DEFAULT_SURFPROP} {surface.n_points}\n')
+        f.write(_format_rows(surface.points, '%g'))
+        f.write('\n')
+        f.write(_format_rows(surface.normals, '%g'))
+        f.write(f'\n{n_triangles}\n')
+        if colours is None:
+            f.write('0 1 1 1 1\n\n')
+        else:
+            if colours.shape != (surface.n_points, 4):
+                raise ValueError(f'expected colours of shape {(surface.n_points, 4)}, got {colours.shape}')
+            f.write(f'{_PER_VERTEX_COLOURS}\n')
+            f.write(_format_rows(colours, '%.3f'))
+            f.write('\n')
+        f.write(_format_flat(np.arange(3, 3 * n_triangles + 1, 3), 8))
+        f.write('\n')
+        f.write(_format_flat(surface.triangles.ravel(), 8))
+
+
+def _format_rows(array: npt.NDArray, fmt: str) -> str:
+    row = ' '.join([fmt] * array.shape[1]) + '\n'
+    return (row * len(array)) % tuple(array.ravel().tolist())
+
+
+def _format_flat(array: npt.NDArray, per_line: int) -> str:
+    n_full = len(array) // per_line * per_line
+    text = _format_rows(array[:n_full].reshape(-1, per_line), '%d')
+    if n_full < len(array):
+        text += _format_rows(array[n_full:].reshape(1, -1), '%d')
+    return text
+
+
+def _parse_obj(path: Path) -> Surface:
+    tokens = path.read_bytes().split()
+    if not tokens or tokens[0] != b'P':
+        raise ValueError(f'{path} is not an ASCII MNI polygonal .obj file')
+    try:
+        return _parse_polygons(tokens)
+    except (IndexError, ValueError) as e:
+        raise ValueError(f'{path} is not a valid .obj file: {e}')
+
+
+def _parse_polygons(tokens: list[bytes]) -> Surface:
+    pos = 1 + _N_SURFPROP
+    n_points = int(tokens[pos])
+    pos += 1
+    points = np.array(tokens[pos:pos + 3 * n_points], dtype=np.float32).reshape(n_points, 3)
+    pos += 3 * n_points
+    normals = np.array(tokens[pos:pos + 3 * n_points], dtype=np.float32).reshape(n_points, 3)
+    pos += 3 * n_points
+    n_items = int(tokens[pos])
+    colour_flag = int(tokens[pos + 1])
+    pos += 2
+    if colour_flag not in _COLOUR_FLAGS:
+        raise ValueError(f'unknown colour flag {colour_flag}')
+    n_colours = (1, n_items, n_points)[colour_flag]
+    colours = np.array(tokens[pos:pos + 4 * n_colours], dtype=np.float32).reshape(n_colours, 4)
+    pos += 4 * n_colours
+    end_indices = np.array(tokens[pos:pos + n_items], dtype=np.int64)
+    pos += n_items
+    if not np.array_equal(end_indices, np.arange(3, 3 * n_items + 1, 3)):
+        raise ValueError('polygons are not all triangles')
+    indices = tokens[pos:pos + 3 * n_items]
+    if len(indices) != 3 * n_items:
+        raise ValueError('file is truncated')
+    triangles = np.array(indices, dtype=np.int32).reshape(n_items, 3)
+    if colour_flag == _ONE_COLOUR:
+        colours = np.broadcast_to(colours, (n_points, 4))
+    elif colour_flag != _PER_VERTEX_COLOURS:
+        colours = None
+    return Surface(points, normals, triangles, colours)
+
+
+def _sidecar_paths(path: Path, sidecar_dir: Path) -> tuple[Path, ...]:
+    st = path.stat()
+    stamp = f'{path.resolve()}:{st.st_mtime_ns}:{st.st_size}'
+    digest = hashlib.sha1(stamp.encode()).hexdigest()[:16]
+    return tuple(sidecar_dir / f'{path.stem}.{digest}.{part}.npy' for part in _SIDECAR_PARTS)
+
+
+def _atomic_save(path: Path, array: npt.NDArray):
+    with atomic_writer(path, 'wb', suffix='.npy') as f:
+        np.save(f, array)
@@ -0,0 +1,88 @@
+"""
+Reading and writing SGI images (``.rgb``), the output format of ``ray_trace``.
+
+Only uncompressed ("verbatim") and run-length encoded images with one byte per
+channel are supported. The layout is a 512-byte big-endian header followed by
+every channel, one after the other, each stored bottom row first.
+"""
+
+import struct
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+_MAGIC = 474
+_HEADER = struct.Struct('>hbbHHHHii4x80si')
+_HEADER_SIZE = 512
+_VERBATIM = 0
+_RLE = 1
+
+
+def write_sgi(path: Path, image: npt.NDArray[np.uint8]):
+    """
+    Write an uncompressed SGI image.
+
+    :param path: output file
+    :param image: (height, width, channels) array, where channels is 1 (gray), 3 (RGB) or 4 (RGBA)
+    """
+    if image.ndim == 2:
+        image = image[:, :, np.newaxis]
+    height, width, channels = image.shape
+    header = _HEADER.pack(_MAGIC, _VERBATIM, 1, 3, width, height, channels, 0, 255, b'', 0)
+    planes = np.ascontiguousarray(image[::-1].transpose(2, 0, 1), dtype=np.uint8)
+    with path.open('wb') as f:
+        f.write(header.ljust(_HEADER_SIZE, b'\0'))
+        f.write(planes.tobytes())
+
+
+def read_sgi(path: Path) -> npt.NDArray[np.uint8]:
+    """
+    Read an SGI image having one byte per channel.
+
+    :returns: (height, width, channels) array, top row first
+    :raises ValueError: if the file is not a supported SGI image
+    """
+    data = path.read_bytes()
+    if len(data) < _HEADER_SIZE:
+        raise ValueError(f'{path} is not an SGI image')
+    magic, storage, bpc, dimension, width, height, channels, *_ = _HEADER.unpack_from(data)
+    if magic != _MAGIC or bpc != 1:
+        raise ValueError(f'{path} is not an SGI image with 1 byte per channel')
+    if dimension < 3:
+        channels = 1
+        if dimension < 2:
+            height = 1
+    if storage == _VERBATIM:
+        n = width * height * channels
+        planes = np.frombuffer(data, dtype=np.uint8, count=n, offset=_HEADER_SIZE)
+        planes = planes.reshape(channels, height, width)
+    elif storage == _RLE:
+        planes = _decode_rle(data, width, height, channels)
+    else:
+        raise ValueError(f'{path} has unknown storage format {storage}')
+    return planes.transpose(1, 2, 0)[::-1]
+
+
+def _decode_rle(data: bytes, width: int, height: int, channels: int) -> npt.NDArray[np.uint8]:
+    n_rows = height * channels
+    starts = np.frombuffer(data, dtype='>u4', count=n_rows, offset=_HEADER_SIZE)
+    planes = np.empty((channels, height, width), dtype=np.uint8)
+    rows = planes.reshape(n_rows, width)
+    for i, start in enumerate(starts.tolist()):
+        row = bytearray()
+        pos = start
+        while len(row) < width:
+            count = data[pos] & 0x7f
+            if count == 0:
+                break
+            if data[pos] & 0x80:
+                row += data[pos + 1:pos + 1 + count]
+                pos += 1 + count
+            else:
+                row += data[pos + 1:pos + 2] * count
+                pos += 2
+        if len(row) != width:
+            raise ValueError('run-length encoded row has the wrong length')
+        rows[i] = np.frombuffer(bytes(row), dtype=np.uint8)
+    return planes
@@ -0,0 +1,30 @@
+"""
+Reading vertex-wise data files.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+
+def read_vertstats(path: Path) -> npt.NDArray[np.float64]:
+    """
+    Read a vertex-wise data file having one number per line (the first column is used
+    if there are several).
+
+    :raises ValueError: if the file is not plain numeric text,
+                        e.g. a vertstats file with a header
+    """
+    text = path.read_bytes()
+    first_line = text.split(b'\n', 1)[0].split()
+    n_columns = max(len(first_line), 1)
+    tokens = text.split()
+    if len(tokens) % n_columns != 0:
+        raise ValueError(f'{path} does not have {n_columns} values on every line')
+    try:
+        values = np.array(tokens[::n_columns], dtype=np.float64)
+    except ValueError:
+        raise ValueError(f'{path} is not a plain text file of numbers')
+    return values
+
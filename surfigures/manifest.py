@@ -0,0 +1,98 @@
+"""
+Record of the inputs of previously created figures, for skipping subjects
+whose figure would come out the same.
+
+The manifest is a JSON file in the output directory. For every figure, it
+keeps the modification time, size and SHA-256 hash of each input file, and a
+fingerprint of the options. An input file whose modification time or size changed
+is hashed again, so touching a file does not cause its figure to be re-created,
+and its new modification time and size are recorded if its hash did not change.
+"""
+
+import os
+import threading
+from pathlib import Path
+
+from surfigures.inputs.subject import SubjectSet
+from surfigures.options import Options
+from surfigures.util.cache import ContentHasher
+from surfigures.util.files import read_json, write_json
+
+MANIFEST_NAME = '.surfigures-manifest.json'
+_FORMAT_VERSION = 1
+
+
+class Manifest:
+    """
+    Input files and options of figures in an output directory.
+    """
+
+    def __init__(self, path: Path, options: Options, hasher: ContentHasher | None = None):
+        self.__path = path
+        self.__fingerprint = options.fingerprint()
+        self.__hasher = hasher if hasher is not None else ContentHasher()
+        self.__lock = threading.Lock()
+        self.__figures: dict[str, dict] = self.__load()
+
+    def __load(self) -> dict[str, dict]:
+        return read_json(self.__path, _FORMAT_VERSION, 'manifest').get('figures', {})
+
+    def is_up_to_date(self, inputs: SubjectSet, output_file: Path) -> bool:
+        """
+        Whether ``output_file`` exists and was created from the same input files and options.
+        """
+        key = self.__key(output_file)
+        with self.__lock:
+            entry = self.__figures.get(key)
+        if entry is None or entry['options'] != self.__fingerprint or not output_file.is_file():
+            return False
+        recorded: dict[str, list] = entry['inputs']
+        current = _input_files(inputs)
+        if set(recorded) != set(map(str, current)):
+            return False
+        refreshed = {}
+        for path in current:
+            mtime_ns, size, digest = recorded[str(path)]
+            try:
+                st = path.stat()
+                if (st.st_mtime_ns, st.st_size) != (mtime_ns, size):
+                    if self.__hasher.hash(path) != digest:
+                        return False
+                    refreshed[str(path)] = [st.st_mtime_ns, st.st_size, digest]
+            except OSError:
+                return False
+        if refreshed:
+            # so that touched files are not hashed again by the next run
+            with self.__lock:
+                if self.__figures.get(key) is entry:
+                    self.__figures[key] = {**entry, 'inputs': {**recorded, **refreshed}}
+        return True
+
+    def record(self, inputs: SubjectSet, output_file: Path):
+        """
+        Remember that ``output_file`` was created from ``inputs``.
+        """
+        recorded = {}
+        for path in _input_files(inputs):
+            st = path.stat()
+            recorded[str(path)] = [st.st_mtime_ns, st.st_size, self.__hasher.hash(path)]
+        entry = {'options': self.__fingerprint, 'inputs': recorded}
+        with self.__lock:
+            self.__figures[self.__key(output_file)] = entry
+
+    def save(self):
+        """
+        Write the manifest to its file, atomically.
+        """
+        with self.__lock:
+            figures = dict(self.__figures)
+        write_json(self.__path, _FORMAT_VERSION, {'figures': figures})
+
+    def __key(self, output_file: Path) -> str:
+        return os.path.relpath(output_file, self.__path.parent)
+
+
+def _input_files(inputs: SubjectSet) -> list[Path]:
+    surfaces = (p for layer in inputs.surfaces for p in (layer.left, layer.right))
+    data_files = (p for files in inputs.data_files for p in (files.left, files.right))
+    return sorted({*surfaces, *data_files})
@@ -1,7 +1,13 @@
+import dataclasses
+import hashlib
+import json
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Self
 
+from surfigures import __version__
+from surfigures.draw import constants
+
 
 @dataclass(frozen=True)
 class Options:
@@ -11,6 +17,14 @@ class Options:
     bg: str
     font_color: str
     color_map: str
+    renderer: str = 'ray_trace'
+    """``ray_trace`` runs one process per tile, ``numpy`` renders all tiles of a section in-process"""
+    compositor: str = 'numpy'
+    """``numpy`` puts tiles together in-process, ``imagemagick`` runs ``montage`` and ``convert``"""
+    tile_size: int = constants.TILE_SIZE
+    """width and height of every tile, the spacing and labels are scaled with it"""
+    shadows: bool = True
+    """whether ``ray_trace`` renders shadows"""
 
     @classmethod
     def from_args(cls, args) -> Self:
@@ -21,8 +35,42 @@ class Options:
             bg=args.background_color,
             font_color=args.font_color,
             color_map=args.color_map,
+            renderer=args.renderer,
+            compositor=args.compositor,
+            tile_size=constants.PREVIEW_TILE_SIZE if args.preview else constants.TILE_SIZE,
+            shadows=not args.preview,
         )
 
+    def fingerprint(self) -> str:
+        """
+        Identifies the options and the version of this program, which together
+        with the inputs determine what a figure looks like.
+        """
+        data = json.dumps([__version__, dataclasses.asdict(self)], sort_keys=True)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    @property
+    def font_size(self) -> int:
+        return self.__scaled(constants.FONT_SIZE)
+
+    @property
+    def row_gap(self) -> int:
+        return self.__scaled(constants.ROW_GAP)
+
+    @property
+    def col_cap(self) -> int:
+        return self.__scaled(constants.COL_CAP)
+
+    @property
+    def caption_offset(self) -> int:
+        return self.__scaled(constants.CAPTION_OFFSET)
+
+    def __scaled(self, size: int) -> int:
+        """
+        Scale a size of the default layout to ``tile_size``.
+        """
+        return max(1, round(size * self.tile_size / constants.TILE_SIZE))
+
     def range_for(self, data_file: Path) -> tuple[str, str]:
         for suffix, range in self.range.items():
             if data_file.name.endswith(suffix):
@@ -0,0 +1,353 @@
+"""
+Planning a run without rendering anything, and running a plan later.
+
+``PlanningRunner`` is a ``Runner`` which records every submitted command as a step of
+a ``Plan`` instead of running it. Steps depend on the steps which produce their input
+files. A plan can be written as JSON, as a ``Makefile`` or as a Ninja build file, and a
+JSON plan can be run by ``run_plan`` (``surfigures-plan run plan.json``).
+
+Some commands are queries whose output is needed to plan the remaining steps,
+e.g. ``vertstats_stats``, whose output is drawn on the figure. Queries of input files
+are run while planning. A query of a file which would be produced by a planned step
+cannot be planned.
+
+Python functions submitted in place of commands are planned as steps which run
+``surfigures-plan call``. Only functions whose arguments are paths, strings and numbers
+can be planned, so plans always use the ``ray_trace`` renderer and the ``imagemagick``
+compositor.
+"""
+
+import argparse
+import dataclasses
+import importlib
+import json
+import os
+import shlex
+import subprocess as sp
+import sys
+import tempfile
+from collections import Counter
+from concurrent.futures import Future, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional, Sequence, TypeVar
+
+from loguru import logger
+
+from surfigures.draw.fig import FigureCreator
+from surfigures.inputs.subject import SubjectSet
+from surfigures.options import Options
+from surfigures.run import LoggedRunner
+from surfigures.util.runnable import Runner
+from surfigures.util.scheduler import Scheduler, completed, default_workers
+
+T = TypeVar('T')
+
+PLAN_NAME = 'plan.json'
+MAKEFILE_NAME = 'Makefile'
+NINJA_NAME = 'build.ninja'
+_FORMAT_VERSION = 1
+
+
+class PlanError(Exception):
+    """
+    Something which was submitted cannot be planned.
+    """
+    pass
+
+
+@dataclass(frozen=True)
+class Step:
+    """
+    A command of a plan.
+    """
+    id: int
+    subject: str
+    stage: str
+    """name of the program, or ``python:`` followed by the name of the function"""
+    argv: tuple[str, ...]
+    inputs: tuple[str, ...]
+    """files which are arguments of the command"""
+    outputs: tuple[str, ...]
+    after: tuple[int, ...]
+    """steps which produce any of ``inputs``"""
+
+
+class Plan:
+    """
+    Commands to run, in an order where every step comes after the steps it depends on.
+    """
+
+    def __init__(self, steps: Sequence[Step] = ()):
+        self.__steps: list[Step] = list(steps)
+        self.__producers: dict[str, int] = {output: step.id for step in steps for output in step.outputs}
+
+    @property
+    def steps(self) -> Sequence[Step]:
+        return self.__steps
+
+    def is_produced(self, path: Path) -> bool:
+        return os.fspath(path) in self.__producers
+
+    def add(self, subject: str, stage: str, argv: Sequence[str], inputs: Iterable[Path],
+            outputs: Sequence[Path]) -> Step:
+        outputs = tuple(map(os.fspath, outputs))
+        inputs = tuple(i for i in dict.fromkeys(map(os.fspath, inputs)) if i not in outputs)
+        after = tuple(sorted({self.__producers[i] for i in inputs if i in self.__producers}))
+        step = Step(len(self.__steps), subject, stage, tuple(argv), inputs, outputs, after)
+        self.__steps.append(step)
+        self.__producers.update((output, step.id) for output in step.outputs)
+        return step
+
+    def extend(self, other: 'Plan'):
+        """
+        Add the steps of another plan, after the steps of this one.
+        """
+        for step in other.steps:
+            self.add(step.subject, step.stage, step.argv, map(Path, step.inputs), tuple(map(Path, step.outputs)))
+
+    def summary(self) -> dict:
+        """
+        Number of processes per stage, and the length of the longest chain of steps
+        which depend on each other, which is how many steps must run one after the other
+        even with unlimited parallelism.
+        """
+        depth: list[int] = []
+        for step in self.__steps:
+            depth.append(1 + max((depth[i] for i in step.after), default=0))
+        return {
+            'processes': len(self.__steps),
+            'processes_per_stage': dict(Counter(step.stage for step in self.__steps).most_common()),
+            'subjects': len({step.subject for step in self.__steps}),
+            'longest_chain': max(depth, default=0)
+        }
+
+    def write_json(self, path: Path):
+        steps = [dataclasses.asdict(step) for step in self.__steps]
+        path.write_text(json.dumps({'version': _FORMAT_VERSION, 'steps': steps}, indent=1))
+
+    @classmethod
+    def read_json(cls, path: Path) -> 'Plan':
+        data = json.loads(path.read_text())
+        if data.get('version') != _FORMAT_VERSION:
+            raise ValueError(f'{path} is not a plan of a supported version')
+        fields = {f.name for f in dataclasses.fields(Step)}
+        return cls([Step(**{k: tuple(v) if isinstance(v, list) else v for k, v in s.items() if k in fields})
+                    for s in data['steps']])
+
+    def write_makefile(self, path: Path, plan_path: Path):
+        """
+        Write the plan as a ``Makefile``, for GNU Make 4.3 or later (steps with several
+        outputs are grouped targets). Steps without outputs are phony targets.
+
+        :param plan_path: the plan written by ``write_json``, see ``_command_line``
+        """
+        lines = []
+        targets = []
+        phony = []
+        for step in self.__steps:
+            if step.outputs:
+                outputs = list(map(_make_escape, step.outputs))
+                separator = ' &:' if len(outputs) > 1 else ':'
+            else:
+                outputs = [f'step-{step.id}']
+                separator = ':'
+                phony.extend(outputs)
+            targets.extend(outputs)
+            lines.append(' '.join(outputs) + separator + ''.join(' ' + _make_escape(i) for i in step.inputs))
+            lines.append('\t' + _command_line(step, plan_path).replace('$', '$$'))
+        header = [f'all: {" ".join(targets)}', ' '.join(('.PHONY: all', *phony)), '']
+        path.write_text('\n'.join(header + lines) + '\n')
+
+    def write_ninja(self, path: Path, plan_path: Path):
+        """
+        Write the plan as a Ninja build file. Steps without outputs always run.
+
+        :param plan_path: the plan written by ``write_json``, see ``_command_line``
+        """
+        lines = ['rule run', '  command = $argv', '  description = $stage', '']
+        for step in self.__steps:
+            outputs = ' '.join(map(_ninja_escape, step.outputs)) if step.outputs else f'step-{step.id}'
+            inputs = ' '.join(map(_ninja_escape, step.inputs))
+            lines.append(f'build {outputs}: run {inputs}'.rstrip())
+            lines.append('  argv = ' + _command_line(step, plan_path).replace('$', '$$'))
+            lines.append(f'  stage = {step.stage}')
+        path.write_text('\n'.join(lines) + '\n')
+
+
+class PlanningRunner(Runner):
+    """
+    Records submitted commands in a ``Plan`` instead of running them.
+    """
+
+    def __init__(self, plan: Plan, tmp_dir: Path, subject: str):
+        self.__plan = plan
+        self.__tmp_dir = tmp_dir
+        self.__subject = subject
+
+    @property
+    def tmp_dir(self) -> Path:
+        return self.__tmp_dir
+
+    def run(self, cmd: Sequence[str | os.PathLike], stdout=sp.DEVNULL, stderr=sp.DEVNULL) -> sp.CompletedProcess:
+        if stdout == sp.PIPE:
+            self.__check_query(cmd)
+            return sp.run(cmd, stdout=stdout, stderr=stderr, check=True, text=True)
+        self.__add_command(cmd, ())
+        return sp.CompletedProcess(cmd, 0)
+
+    def submit(self, cmd: Sequence[str | os.PathLike], produces: Sequence[Path] = (),
+               stdout=sp.DEVNULL, stderr=sp.DEVNULL, cacheable: bool = False) -> Future[sp.CompletedProcess]:
+        if stdout == sp.PIPE:
+            return super().submit(cmd, produces, stdout, stderr, cacheable)
+        self.__add_command(cmd, produces)
+        return completed(sp.CompletedProcess(cmd, 0))
+
+    def submit_function(self, fn: Callable[..., T], *args, produces: Sequence[Path] = ()) -> Future[T]:
+        if not produces:
+            # a query, its result is needed now
+            self.__check_query(args)
+            return super().submit_function(fn, *args)
+        call = json.dumps({'function': f'{fn.__module__}:{fn.__qualname__}', 'args': [_encode(a) for a in args]})
+        argv = (sys.executable, '-m', 'surfigures.plan', 'call', call)
+        self.__plan.add(self.__subject, f'python:{fn.__name__}', argv, _paths_in(args), produces)
+        return completed(None)
+
+    def __add_command(self, cmd: Sequence[str | os.PathLike], produces: Sequence[Path]):
+        argv = tuple(map(os.fspath, cmd))
+        self.__plan.add(self.__subject, os.path.basename(argv[0]), argv, _paths_in(cmd), produces)
+
+    def __check_query(self, args: Iterable):
+        for path in _paths_in(args):
+            if self.__plan.is_produced(path):
+                raise PlanError(f'cannot plan a query of {path}, which is produced by a planned step')
+
+
+def plan_subject(plan: Plan, input_set: SubjectSet, output_file: Path, options: Options, tmp_dir: Path):
+    """
+    Add the steps of creating the figure of a subject to a plan.
+
+    :param tmp_dir: directory for intermediate files, which is created now and must exist when the plan is run
+    :raises InputError: if the inputs are not usable
+    """
+    sorted_inputs = input_set.sort()
+    sorted_inputs.validate()
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    plannable = dataclasses.replace(options, renderer='ray_trace', compositor='imagemagick')
+    FigureCreator(sorted_inputs, output_file, plannable).run(PlanningRunner(plan, tmp_dir, sorted_inputs.title))
+
+
+def run_plan(plan: Plan, jobs: int) -> bool:
+    """
+    Run the steps of a plan, as many at the same time as their dependencies allow.
+
+    :param jobs: maximum number of steps to run at the same time
+    :returns: whether every step succeeded. Steps which depend on a failed step are not run.
+    """
+    futures: list[Future] = []
+    with Scheduler(max_workers=jobs) as scheduler:
+        for step in plan.steps:
+            futures.append(scheduler.submit(_run_step, step, after=[futures[i] for i in step.after]))
+        wait(futures)
+    failed = [(step, f.exception()) for step, f in zip(plan.steps, futures) if f.exception() is not None]
+    for step, e in failed:
+        if isinstance(e, sp.CalledProcessError):
+            logger.error('Step {} of {} failed: {}', step.id, step.subject, shlex.join(step.argv))
+    if failed:
+        logger.error('{} of {} steps failed or were skipped', len(failed), len(plan.steps))
+    return not failed
+
+
+def _run_step(step: Step):
+    for output in step.outputs:
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+    sp.run(step.argv, stdout=sp.DEVNULL, check=True)
+
+
+def _command_line(step: Step, plan_path: Path) -> str:
+    """
+    Shell command of a step. Commands which have arguments of many lines (e.g. text drawn
+    by ``convert``) cannot be written on one line, so they are run from the JSON plan instead.
+    """
+    if any('\n' in arg for arg in step.argv):
+        return shlex.join((sys.executable, '-m', 'surfigures.plan', 'step', os.fspath(plan_path), str(step.id)))
+    return shlex.join(step.argv)
+
+
+def _paths_in(args: Iterable) -> Iterable[Path]:
+    for arg in args:
+        if isinstance(arg, (list, tuple)):
+            yield from (a for a in arg if isinstance(a, Path))
+        elif isinstance(arg, Path):
+            yield arg
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, Runner):
+        return {'runner': True}
+    if isinstance(value, Path):
+        return {'path': os.fspath(value)}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    raise PlanError(f'cannot plan a function call with an argument of type {type(value).__name__}')
+
+
+def _decode(value: Any, runner: Runner) -> Any:
+    if isinstance(value, dict):
+        return runner if value.get('runner') else Path(value['path'])
+    if isinstance(value, list):
+        return tuple(_decode(v, runner) for v in value)
+    return value
+
+
+def _resolve(name: str) -> Callable:
+    module_name, qualname = name.split(':')
+    obj = importlib.import_module(module_name)
+    for attr in qualname.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _make_escape(path: str) -> str:
+    return path.replace('$', '$$').replace(' ', '\\ ').replace(':', '\\:')
+
+
+def _ninja_escape(path: str) -> str:
+    return path.replace('$', '$$').replace(' ', '$ ').replace(':', '$:')
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """
+    Command-line entry point for running plans.
+    """
+    parser = argparse.ArgumentParser(description='Run a plan created by surfigures --plan')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='run every step of a plan')
+    run_parser.add_argument('plan', type=Path, help=f'{PLAN_NAME} file')
+    run_parser.add_argument('-j', '--jobs', type=int, default=0,
+                            help='number of steps to run at the same time, by default the number of CPUs')
+    step_parser = subparsers.add_parser('step', help='run one step of a plan')
+    step_parser.add_argument('plan', type=Path, help=f'{PLAN_NAME} file')
+    step_parser.add_argument('id', type=int, help='number of the step')
+    call_parser = subparsers.add_parser('call', help='call a Python function of a planned step')
+    call_parser.add_argument('call', help='JSON of the function and its arguments')
+    args = parser.parse_args(argv)
+
+    if args.command == 'call':
+        call = json.loads(args.call)
+        runner = LoggedRunner(Path(tempfile.gettempdir()), sys.stderr)
+        _resolve(call['function'])(*(_decode(a, runner) for a in call['args']))
+        return
+
+    plan = Plan.read_json(args.plan)
+    if args.command == 'step':
+        _run_step(plan.steps[args.id])
+        return
+    if not run_plan(plan, args.jobs if args.jobs > 0 else default_workers()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,35 +1,94 @@
+import contextlib
+import functools
 import os
+import resource
 import subprocess
+import threading
+from concurrent.futures import Future, wait
 from pathlib import Path
 import shlex
 import subprocess as sp
 import time
+from dataclasses import dataclass
 from tempfile import TemporaryDirectory
-from typing import Optional, Sequence, TextIO
+from typing import Callable, Iterable, Optional, Sequence, TextIO, TypeVar
 
 from loguru import logger
 
 from surfigures.draw.fig import FigureCreator
+from surfigures.draw.web import web_dir_of
+from surfigures.inputs.err import InputError
 from surfigures.inputs.subject import SubjectSet
 from surfigures.options import Options
-from surfigures.util.runnable import Runner
+from surfigures.util.cache import Deduplicator, RenderCache
+from surfigures.util.profile import Measurement, Profile
+from surfigures.util.runnable import Runner, TaskError, is_process_safe
+from surfigures.util.scheduler import Scheduler
+from surfigures.util.tmp import MemoryTmp
+from surfigures.util.workers import WorkerPool
 
+T = TypeVar('T')
 
-def run_surfigures(input_set: SubjectSet, output_file: Path, options: Options) -> Optional[float]:
+
+@dataclass(frozen=True)
+class RunContext:
+    """
+    Resources which are shared by every subject of a run.
+    """
+    scheduler: Optional[Scheduler] = None
+    """worker pool for running commands. If not given, commands are run one at a time."""
+    render_cache: Optional[RenderCache] = None
+    """cache of outputs from cacheable commands"""
+    section_cache: Optional[RenderCache] = None
+    """cache of images of sections, see ``FigureCreator``"""
+    sidecar_dir: Optional[Path] = None
+    """directory for memory-mapped copies of input surfaces"""
+    memory_tmp: Optional[MemoryTmp] = None
+    """memory-backed directory for temporary files. If not given, temporary files are written to disk."""
+    memory_tmp_limit: int = 2 * 1024 ** 3
+    """maximum size in bytes of the temporary files of one subject in ``memory_tmp``"""
+    profile: Optional[Profile] = None
+    """if given, the resource usage of every command is recorded"""
+    workers: Optional[WorkerPool] = None
+    """worker processes for Python tasks. If not given, Python tasks run on threads."""
+    deduplicator: Optional[Deduplicator] = None
+    """if given, identical cacheable commands of every subject are run only once"""
+    web: bool = False
+    """whether to also write images of sections and their manifest for web viewers, see ``surfigures.draw.web``"""
+
+
+def run_surfigures(input_set: SubjectSet, output_file: Path, options: Options,
+                   context: RunContext = RunContext()) -> Optional[float]:
     """
-    :returns: ``None`` if there was an error, or the time spent running ``verify_surface_all.pl`` in seconds.
+    :returns: ``None`` if there was an error, or the time spent creating the figure in seconds.
     """
     start = time.monotonic_ns()
-    sorted_inputs = input_set.sort()
-    fig = FigureCreator(sorted_inputs, output_file, options)
+    try:
+        sorted_inputs = input_set.sort(context.sidecar_dir)
+        sorted_inputs.validate(context.sidecar_dir)
+    except InputError as e:
+        logger.error('{} --> {} !!!FAILED!!! {}', tuple(map(str, input_set.src)), output_file, e)
+        return None
+    fig = FigureCreator(sorted_inputs, output_file, options, context.section_cache,
+                        web_dir_of(output_file) if context.web else None)
     log_path = output_file.with_suffix('.log')
-    with TemporaryDirectory() as tmp_dir, log_path.open('w') as log_handle:
-        runner = LoggedRunner(Path(tmp_dir), log_handle)
+    if context.memory_tmp is not None:
+        reservation = context.memory_tmp.reserve(estimate_tmp_size(sorted_inputs, options),
+                                                 context.memory_tmp_limit, sorted_inputs.title)
+    else:
+        reservation = contextlib.nullcontext()
+    # memory is reserved until the temporary directory is deleted
+    with reservation as tmp_parent, TemporaryDirectory(dir=tmp_parent) as tmp_dir, log_path.open('w') as log_handle:
+        runner = LoggedRunner(Path(tmp_dir), log_handle, context.scheduler, context.render_cache,
+                              context.profile, sorted_inputs.title, context.workers, context.deduplicator)
         ok = True
         try:
             fig.run(runner)
-        except sp.CalledProcessError:
+        except (sp.CalledProcessError, TaskError):
             ok = False
+        finally:
+            # do not delete tmp_dir while commands are still using it
+            runner.wait()
 
     end = time.monotonic_ns()
     elapsed = (end - start) / 1e9
@@ -42,17 +101,203 @@ def run_surfigures(input_set: SubjectSet, output_file: Path, options: Options) -
         return None
 
 
+def estimate_tmp_size(inputs: SubjectSet, options: Options) -> int:
+    """
+    Estimate the peak size of the temporary files of a subject: mid surfaces,
+    coloured surfaces, tiles, and the montage of the ImageMagick compositor.
+
+    :returns: size in bytes, an overestimate
+    """
+    surface_size = max((p.stat().st_size for layer in inputs.surfaces for p in (layer.left, layer.right)), default=0)
+    mid_surfaces = 2 * surface_size
+    coloured_surfaces = len(inputs.data_files) * 2 * surface_size * 3 // 2
+    n_rows = 2 * (len(inputs.surfaces) + len(inputs.data_files))
+    tiles = n_rows * 5 * 4 * options.tile_size ** 2
+    cell_size = (options.tile_size + 2 * options.col_cap) * (options.tile_size + 2 * options.row_gap)
+    montage = n_rows * 6 * 3 * cell_size
+    return mid_surfaces + coloured_surfaces + tiles + montage
+
+
 class LoggedRunner(Runner):
+    """
+    Runs commands and writes them to a log file.
+
+    If given a ``Scheduler``, submitted commands run in its worker pool, each one
+    waiting for the commands which produce its arguments. If given a ``RenderCache``,
+    outputs of cacheable commands are reused. If given a ``Profile``, the resource
+    usage of every command and Python task is recorded under the name of the subject.
+    If given a ``WorkerPool``, Python tasks marked with ``process_safe`` are called in
+    its worker processes, other Python tasks and commands are run as usual. If given a
+    ``Deduplicator``, which is shared by the runners of every subject, a cacheable command
+    which is the same as one run before (e.g. the same views of an identical surface) is
+    not run again.
+    """
 
-    def __init__(self, tmp_dir: Path, log_file: TextIO):
+    def __init__(self, tmp_dir: Path, log_file: TextIO, scheduler: Optional[Scheduler] = None,
+                 render_cache: Optional[RenderCache] = None, profile: Optional[Profile] = None,
+                 subject: str = '', workers: Optional[WorkerPool] = None,
+                 deduplicator: Optional[Deduplicator] = None):
         self.__tmp_dir = tmp_dir
         self.__log_file = log_file
+        self.__scheduler = scheduler
+        self.__render_cache = render_cache
+        self.__profile = profile
+        self.__subject = subject
+        self.__workers = workers
+        self.__deduplicator = deduplicator
+        self.__lock = threading.Lock()
+        self.__producers: dict[Path, Future] = {}
+        self.__submitted: list[Future] = []
 
     @property
     def tmp_dir(self) -> Path:
         return self.__tmp_dir
 
     def run(self, cmd: Sequence[str | os.PathLike], stdout=sp.DEVNULL, stderr=sp.DEVNULL) -> sp.CompletedProcess:
-        self.__log_file.write(shlex.join(map(str, cmd)))
-        self.__log_file.write('\n')
-        return subprocess.run(cmd, stdout=stdout, stderr=stderr, check=True, text=True)
+        self.__log(shlex.join(map(str, cmd)))
+        if self.__profile is None:
+            return subprocess.run(cmd, stdout=stdout, stderr=stderr, check=True, text=True)
+        start = time.monotonic()
+        p, usage = _run_measured(cmd, stdout, stderr)
+        self.__profile.record(Measurement(self.__subject, _stage_of(cmd), time.monotonic() - start,
+                                          usage.ru_utime + usage.ru_stime, usage.ru_maxrss * 1024))
+        p.check_returncode()
+        return p
+
+    def submit(self, cmd: Sequence[str | os.PathLike], produces: Sequence[Path] = (),
+               stdout=sp.DEVNULL, stderr=sp.DEVNULL, cacheable: bool = False) -> Future[sp.CompletedProcess]:
+        if cacheable and self.__deduplicator is not None and len(produces) == 1:
+            fn, args = self.__run_once, (cmd, produces[0], stdout, stderr)
+        elif cacheable and self.__render_cache is not None and len(produces) == 1:
+            fn, args = self.__run_cached, (cmd, produces[0], stdout, stderr)
+        else:
+            fn, args = self.run, (cmd, stdout, stderr)
+        return self.__schedule(fn, args, cmd, produces)
+
+    def submit_function(self, fn: Callable[..., T], *args, produces: Sequence[Path] = ()) -> Future[T]:
+        return self.__schedule(self.__call, (fn, args), _flatten(args), produces)
+
+    def __schedule(self, fn: Callable[..., T], args: tuple, inputs: Iterable, produces: Sequence[Path]) -> Future[T]:
+        if self.__scheduler is None:
+            f = Future()
+            try:
+                f.set_result(fn(*args))
+            except (sp.CalledProcessError, TaskError) as e:
+                f.set_exception(e)
+            return f
+        with self.__lock:
+            after = [self.__producers[arg] for arg in inputs if isinstance(arg, Path) and arg in self.__producers]
+            f = self.__scheduler.submit(fn, *args, after=after)
+            self.__producers.update((output, f) for output in produces)
+            self.__submitted.append(f)
+        return f
+
+    def __call(self, fn: Callable[..., T], args: tuple) -> T:
+        paths = (str(arg) for arg in _flatten(args) if isinstance(arg, (str, Path)))
+        self.__log(f'# python: {fn.__module__}.{fn.__qualname__} {shlex.join(paths)}')
+        start = time.monotonic()
+        start_cpu = time.thread_time()
+        cpu_time = None
+        try:
+            if self.__workers is not None and is_process_safe(fn):
+                result, commands, cpu_time = self.__workers.call(fn, args)
+                for command in commands:
+                    self.__log(command)
+                return result
+            return fn(*args)
+        except (sp.CalledProcessError, TaskError):
+            raise
+        except Exception as e:
+            self.__log(f'# failed: {e!r}')
+            raise TaskError(f'{fn.__qualname__} failed: {e!r}') from e
+        finally:
+            if self.__profile is not None:
+                if cpu_time is None:
+                    cpu_time = time.thread_time() - start_cpu
+                self.__profile.record(Measurement(self.__subject, f'python:{fn.__name__}', time.monotonic() - start,
+                                                  cpu_time))
+
+    def __run_once(self, cmd: Sequence[str | os.PathLike], output: Path, stdout, stderr) -> sp.CompletedProcess:
+        if self.__render_cache is not None:
+            produce = functools.partial(self.__run_cached, cmd, output, stdout, stderr)
+        else:
+            produce = functools.partial(self.run, cmd, stdout, stderr)
+        p = self.__deduplicator.run_once(self.__deduplicator.key(cmd, output), output, produce)
+        if p is None:
+            self.__log(f'# deduplicated: {shlex.join(map(str, cmd))}')
+            return sp.CompletedProcess(cmd, 0, stdout='' if stdout == sp.PIPE else None)
+        return p
+
+    def __run_cached(self, cmd: Sequence[str | os.PathLike], output: Path, stdout, stderr) -> sp.CompletedProcess:
+        key = self.__render_cache.key(cmd, output)
+        start = time.monotonic()
+        if self.__render_cache.fetch(key, output):
+            self.__log(f'# cached: {shlex.join(map(str, cmd))}')
+            if self.__profile is not None:
+                self.__profile.record(Measurement(self.__subject, _stage_of(cmd), time.monotonic() - start,
+                                                  0.0, cached=True))
+            return sp.CompletedProcess(cmd, 0, stdout='' if stdout == sp.PIPE else None)
+        p = self.run(cmd, stdout, stderr)
+        self.__render_cache.store(key, output)
+        return p
+
+    def __log(self, line: str):
+        with self.__lock:
+            self.__log_file.write(line + '\n')
+
+    def wait(self):
+        """
+        Wait for all submitted commands to finish.
+        """
+        with self.__lock:
+            submitted = list(self.__submitted)
+        wait(submitted)
+
+
+def _run_measured(cmd: Sequence[str | os.PathLike], stdout, stderr
+                  ) -> tuple[sp.CompletedProcess, resource.struct_rusage]:
+    """
+    Run a command like ``subprocess.run``, also getting the resource usage of the
+    process. Unlike ``resource.getrusage(RUSAGE_CHILDREN)``, it is not mixed up with
+    other processes which are running at the same time.
+    """
+    with sp.Popen(cmd, stdout=stdout, stderr=stderr, text=True) as p:
+        try:
+            out, err = _read_pipes(p)
+            _, status, usage = os.wait4(p.pid, 0)
+        except BaseException:
+            p.kill()
+            raise
+        p.returncode = os.waitstatus_to_exitcode(status)
+    return sp.CompletedProcess(cmd, p.returncode, out, err), usage
+
+
+def _read_pipes(p: sp.Popen) -> tuple[Optional[str], Optional[str]]:
+    """
+    Read the piped outputs of a process until it closes them.
+    """
+    err = []
+    reader = None
+    if p.stderr is not None:
+        # read both at the same time, in case the process fills the buffer of one while we wait on the other
+        reader = threading.Thread(target=lambda: err.append(p.stderr.read()))
+        reader.start()
+    out = p.stdout.read() if p.stdout is not None else None
+    if reader is not None:
+        reader.join()
+    return out, err[0] if err else None
+
+
+def _stage_of(cmd: Sequence[str | os.PathLike]) -> str:
+    return os.path.basename(os.fspath(cmd[0]))
+
+
+def _flatten(args: Iterable) -> Iterable:
+    """
+    Arguments, and elements of arguments which are lists or tuples.
+    """
+    for arg in args:
+        if isinstance(arg, (list, tuple)):
+            yield from arg
+        else:
+            yield arg
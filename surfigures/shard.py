@@ -0,0 +1,195 @@
+"""
+Splitting a cohort of subjects across several independent runs ("shards").
+
+Every shard finds all of the subjects, then keeps its own share of them. The
+shares are computed the same way by every shard, without any coordination: subjects
+are ordered by their expected cost (most expensive first, ties broken by a hash
+of their title) and each is given to the shard with the least total cost so far.
+
+Each shard writes a summary of how long its subjects took, and ``merge_summaries``
+combines the summaries of all shards. From the command line::
+
+    surfigures-merge-timings -o timings.json shard1/ shard2/ shard3/
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+
+from surfigures.inputs.subject import SubjectSet
+
+SUMMARY_GLOB = '.surfigures-shard-*-of-*.json'
+_SHARD_RE = re.compile(r'^\s*(\d+)\s*/\s*(\d+)\s*$')
+
+
+@dataclass(frozen=True)
+class Shard:
+    """
+    One of ``count`` shards, numbered from 1.
+    """
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, value: str) -> 'Shard':
+        """
+        Parse a shard given as ``i/N``, e.g. ``2/4``.
+
+        :raises ValueError: if the value is not of the form ``i/N`` where ``1 <= i <= N``
+        """
+        match = _SHARD_RE.match(value)
+        if match is None:
+            raise ValueError(f'shard must be given as i/N, got "{value}"')
+        index, count = map(int, match.groups())
+        if not 1 <= index <= count:
+            raise ValueError(f'shard index must be between 1 and {count}, got {index}')
+        return cls(index, count)
+
+    @property
+    def summary_name(self) -> str:
+        """
+        File name of the timing summary of this shard.
+        """
+        return SUMMARY_GLOB.replace('*', str(self.index), 1).replace('*', str(self.count), 1)
+
+    def select(self, subjects: Iterable[tuple[SubjectSet, Path]]) -> list[tuple[SubjectSet, Path]]:
+        """
+        Keep the subjects which belong to this shard.
+
+        :param subjects: every subject and its output file, as found by ``SubjectMapper``
+        :returns: subjects of this shard, most expensive first
+        """
+        subjects = list(subjects)
+        shards = assign([s for s, _ in subjects], self.count)
+        order = _lpt_order([s for s, _ in subjects])
+        return [subjects[i] for i in order if shards[i] == self.index - 1]
+
+
+def expected_cost(subject: SubjectSet) -> int:
+    """
+    Expected cost of creating the figure of a subject, in arbitrary units.
+
+    Every layer and every data file is a section of the figure, and each section
+    is rendered as the same number of tiles.
+    """
+    return len(subject.surfaces) + len(subject.data_files)
+
+
+def assign(subjects: Sequence[SubjectSet], count: int) -> list[int]:
+    """
+    Divide subjects into shards of about equal total expected cost.
+
+    The result only depends on the titles and expected costs of the subjects,
+    not on their order.
+
+    :returns: shard of every subject, from 0 to ``count - 1``
+    """
+    loads = [0] * count
+    shards = [0] * len(subjects)
+    for i in _lpt_order(subjects):
+        shard = min(range(count), key=loads.__getitem__)
+        shards[i] = shard
+        loads[shard] += expected_cost(subjects[i])
+    return shards
+
+
+def _lpt_order(subjects: Sequence[SubjectSet]) -> list[int]:
+    """
+    Indices of subjects from the most to the least expensive, in an order which
+    does not depend on the order of ``subjects``.
+    """
+    def key(i: int):
+        subject = subjects[i]
+        digest = hashlib.sha1(subject.title.encode()).hexdigest()
+        return -expected_cost(subject), digest, subject.title, tuple(map(str, subject.src))
+    return sorted(range(len(subjects)), key=key)
+
+
+def write_summary(path: Path, shard: Shard, subjects: Sequence[tuple[SubjectSet, Path]],
+                  timings: Sequence[Optional[float]], wall_time: float):
+    """
+    Write how long each subject of a shard took.
+
+    :param path: output JSON file
+    :param subjects: subjects of the shard and their output files
+    :param timings: time spent on each subject in seconds, or ``None`` if it failed
+    :param wall_time: total time of the run in seconds
+    """
+    summary = {
+        'shard': shard.index,
+        'count': shard.count,
+        'wall_time': wall_time,
+        'subjects': [
+            {
+                'title': subject.title,
+                'output': str(output_file.relative_to(path.parent)
+                              if output_file.is_relative_to(path.parent) else output_file),
+                'expected_cost': expected_cost(subject),
+                'seconds': seconds
+            }
+            for (subject, output_file), seconds in zip(subjects, timings)
+        ]
+    }
+    path.write_text(json.dumps(summary, indent=1))
+
+
+def merge_summaries(summaries: Iterable[dict]) -> dict:
+    """
+    Combine the timing summaries of shards.
+
+    :returns: timings of every subject, with totals and the shards which are missing
+    """
+    shards: dict[int, dict] = {}
+    counts = set()
+    for summary in summaries:
+        shards[summary['shard']] = summary
+        counts.add(summary['count'])
+    if len(counts) > 1:
+        raise ValueError(f'summaries are from runs with different numbers of shards: {sorted(counts)}')
+    count = counts.pop() if counts else 0
+    subjects = [dict(s, shard=i) for i, summary in sorted(shards.items()) for s in summary['subjects']]
+    timings = [s['seconds'] for s in subjects if s['seconds'] is not None]
+    wall_times = {i: summary['wall_time'] for i, summary in sorted(shards.items())}
+    return {
+        'count': count,
+        'missing_shards': [i for i in range(1, count + 1) if i not in shards],
+        'subjects': subjects,
+        'n_subjects': len(subjects),
+        'n_failed': len(subjects) - len(timings),
+        'total_seconds': sum(timings),
+        'makespan': max(wall_times.values(), default=0.0),
+        'wall_times': wall_times
+    }
+
+
+def merge_main(argv: Optional[Sequence[str]] = None):
+    """
+    Command-line entry point for merging the timing summaries of shards.
+    """
+    parser = argparse.ArgumentParser(description='Combine the timing summaries of surfigures shards')
+    parser.add_argument('inputs', nargs='+', type=Path,
+                        help='summary files, or directories which are searched for summary files')
+    parser.add_argument('-o', '--output', type=Path, help='output JSON file. If not given, print to stdout.')
+    args = parser.parse_args(argv)
+
+    files = []
+    for path in args.inputs:
+        files.extend(sorted(path.rglob(SUMMARY_GLOB)) if path.is_dir() else [path])
+    merged = merge_summaries(json.loads(f.read_text()) for f in files)
+    text = json.dumps(merged, indent=1)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.write_text(text)
+    if merged['missing_shards']:
+        print(f'missing summaries of shards: {merged["missing_shards"]}', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    merge_main()
@@ -0,0 +1,291 @@
+"""
+Content-addressed, size-bounded on-disk cache of command outputs.
+
+A command's output is identified by a hash of its arguments together
+with the contents of its input files, so a cache directory can be shared
+between runs (and between ChRIS jobs) on the same inputs.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Optional, Sequence, TypeVar
+
+from loguru import logger
+
+from surfigures.util.files import atomic_writer
+
+T = TypeVar('T')
+
+_KEY_VERSION = b'surfigures-cache-1'
+DEDUPLICATED_MAX_BYTES = 1024 ** 3
+"""default disk budget for outputs kept by ``Deduplicator`` during a run"""
+_CHUNK_SIZE = 1024 * 1024
+_OUTPUT_PLACEHOLDER = '{output}'
+_SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+class ContentHasher:
+    """
+    Computes and remembers hashes of file contents. A file is hashed again only if its
+    modification time or size changed.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__hashes: dict[tuple[Path, int, int], str] = {}
+
+    def hash(self, path: Path) -> str:
+        st = path.stat()
+        memo_key = (path, st.st_mtime_ns, st.st_size)
+        with self.__lock:
+            if memo_key in self.__hashes:
+                return self.__hashes[memo_key]
+        h = hashlib.sha256()
+        with path.open('rb') as f:
+            while chunk := f.read(_CHUNK_SIZE):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self.__lock:
+            self.__hashes[memo_key] = digest
+        return digest
+
+
+class RenderCache:
+    """
+    A directory of previously created output files, evicted least-recently-used first
+    when their total size exceeds ``max_bytes``.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, hasher: ContentHasher | None = None):
+        self.__directory = directory
+        self.__max_bytes = max_bytes
+        self.__hasher = hasher if hasher is not None else ContentHasher()
+        self.__lock = threading.Lock()
+        self.__size: int | None = None
+        """Approximate total size of the cache, other processes may be writing to it too."""
+        directory.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def directory(self) -> Path:
+        return self.__directory
+
+    def key(self, cmd: Sequence[str | os.PathLike], output: Path) -> str:
+        """
+        Identify the output of a command by its arguments and the contents of its input files.
+
+        Arguments of type ``Path`` are considered to be input files (except for ``output``).
+        """
+        return command_key(cmd, output, self.__hasher)
+
+    def fetch(self, key: str, output: Path) -> bool:
+        """
+        Copy a cached file to ``output``.
+
+        :returns: ``True`` if found
+        """
+        entry = self.__entry(key)
+        try:
+            _link_or_copy(entry, output)
+        except FileNotFoundError:
+            return False
+        try:
+            os.utime(entry)  # modification time is used as the LRU timestamp
+        except FileNotFoundError:
+            pass  # evicted by someone else in the meantime, whatever
+        return True
+
+    def store(self, key: str, output: Path):
+        """
+        Add a copy of ``output`` to the cache.
+        """
+        entry = self.__entry(key)
+        entry.parent.mkdir(exist_ok=True)
+        with output.open('rb') as src, atomic_writer(entry, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        self.__added(entry.stat().st_size)
+
+    def __entry(self, key: str) -> Path:
+        return self.__directory / key[:2] / key
+
+    def __added(self, size: int):
+        with self.__lock:
+            if self.__size is None:
+                self.__size = self.__scan_size()
+            else:
+                self.__size += size
+            if self.__size > self.__max_bytes:
+                self.__size = self.__evict()
+
+    def __entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in self.__directory.glob('??/*'):
+            if path.name.startswith('.'):
+                continue
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def __scan_size(self) -> int:
+        return sum(size for _, size, _ in self.__entries())
+
+    def __evict(self) -> int:
+        entries = self.__entries()
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self.__max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+        logger.debug('Evicted {} files from cache {}', evicted, self.__directory)
+        return total
+
+
+class Deduplicator:
+    """
+    Runs each distinct cacheable command once per run.
+
+    Commands are identified like ``RenderCache.key``, by their arguments and the contents of
+    their input files, so commands on different copies of the same file are the same.
+    A command which is the same as one which was already run (or is running) is not run:
+    its output is hard-linked to the output of the first one.
+
+    The first output of every command is kept in a directory for the whole run, because
+    outputs are deleted along with the temporary directory of their subject. Outputs are
+    kept by hard links, outputs on another file system are only shared while they exist.
+    Kept outputs are evicted least-recently-used first when their total size exceeds ``max_bytes``.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, hasher: ContentHasher | None = None,
+                 max_bytes: int = DEDUPLICATED_MAX_BYTES):
+        """
+        :param directory: directory for keeping outputs during the run, which the caller deletes
+                          afterwards. If not given, outputs are only shared while they exist.
+        :param hasher: computes hashes of input files
+        :param max_bytes: maximum total size of the outputs kept in ``directory``
+        """
+        self.__directory = directory
+        self.__hasher = hasher if hasher is not None else ContentHasher()
+        self.__max_bytes = max_bytes
+        self.__lock = threading.Lock()
+        self.__outputs: dict[str, Future[Path]] = {}
+        self.__kept: OrderedDict[str, int] = OrderedDict()
+        """sizes of the outputs in ``directory``, least recently used first"""
+        self.__kept_size = 0
+        self.deduplicated = 0
+
+    def key(self, cmd: Sequence[str | os.PathLike], output: Path) -> str:
+        return command_key(cmd, output, self.__hasher)
+
+    def run_once(self, key: str, output: Path, produce: Callable[[], T]) -> Optional[T]:
+        """
+        Call ``produce()`` to create ``output``, unless ``key`` was already produced.
+
+        :param key: identifies the contents of ``output``
+        :param output: output file
+        :param produce: creates ``output``
+        :returns: the return value of ``produce``, or ``None`` if ``output`` is a link to an earlier output
+        """
+        while True:
+            with self.__lock:
+                first = self.__outputs.get(key)
+                if first is None:
+                    mine: Future[Path] = Future()
+                    self.__outputs[key] = mine
+            if first is None:
+                return self.__produce(key, output, produce, mine)
+            try:
+                _link_or_copy(first.result(), output)
+            except Exception:
+                # the first command failed, or its output was deleted: the next one to try produces it again
+                with self.__lock:
+                    if self.__outputs.get(key) is first:
+                        del self.__outputs[key]
+                continue
+            with self.__lock:
+                self.deduplicated += 1
+                if key in self.__kept:
+                    self.__kept.move_to_end(key)
+            return None
+
+    def __produce(self, key: str, output: Path, produce: Callable[[], T], mine: Future[Path]) -> T:
+        try:
+            result = produce()
+            kept = self.__keep(key, output)
+        except BaseException as e:
+            with self.__lock:
+                del self.__outputs[key]
+            mine.set_exception(e)
+            raise
+        mine.set_result(kept)
+        return result
+
+    def __keep(self, key: str, output: Path) -> Path:
+        if self.__directory is None:
+            return output
+        kept = self.__directory / key
+        kept.unlink(missing_ok=True)
+        try:
+            os.link(output, kept)
+        except OSError:
+            # e.g. on another file system: copying would cost more than rendering again
+            return output
+        size = kept.stat().st_size
+        with self.__lock:
+            self.__kept_size += size - self.__kept.pop(key, 0)
+            self.__kept[key] = size
+            while self.__kept_size > self.__max_bytes and len(self.__kept) > 1:
+                evicted, evicted_size = self.__kept.popitem(last=False)
+                self.__kept_size -= evicted_size
+                (self.__directory / evicted).unlink(missing_ok=True)
+                # duplicates of an evicted output are produced again by the next one
+        return kept
+
+
+def command_key(cmd: Sequence[str | os.PathLike], output: Path, hasher: ContentHasher) -> str:
+    """
+    Identify the output of a command by its arguments and the contents of its input files.
+
+    Arguments of type ``Path`` are considered to be input files (except for ``output``).
+    """
+    h = hashlib.sha256(_KEY_VERSION)
+    for arg in cmd:
+        if isinstance(arg, Path) and arg != output:
+            h.update(b'\0file:' + hasher.hash(arg).encode())
+        elif str(arg) == str(output):
+            h.update(b'\0' + _OUTPUT_PLACEHOLDER.encode())
+        else:
+            h.update(b'\0arg:' + str(arg).encode())
+    return h.hexdigest() + output.suffix
+
+
+def parse_size(s: str) -> int:
+    """
+    Parse a size in bytes, e.g. ``"500M"`` or ``"10G"``.
+    """
+    normalized = s.strip().upper().removesuffix('B').removesuffix('I')
+    unit = normalized[-1:] if normalized[-1:] in _SIZE_UNITS else ''
+    number = normalized[:len(normalized) - len(unit)]
+    try:
+        return int(float(number) * _SIZE_UNITS[unit])
+    except ValueError:
+        raise ValueError(f'Invalid size: "{s}"')
+
+
+def _link_or_copy(src: Path, dst: Path):
+    try:
+        os.link(src, dst)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(src, dst)
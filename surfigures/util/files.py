@@ -0,0 +1,85 @@
+"""
+Files which are replaced atomically, so that other processes (and a crashed run)
+never leave or see a partially written file.
+"""
+
+import contextlib
+import fcntl
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import IO, Iterator
+
+from loguru import logger
+
+_INCOMING_PREFIX = '.incoming-'
+"""prefix of files which are still being written"""
+
+
+@contextlib.contextmanager
+def atomic_writer(path: Path, mode: str = 'w', suffix: str = '') -> Iterator[IO]:
+    """
+    Open a temporary file next to ``path``, which replaces ``path`` if the block
+    exits without an error, or is deleted otherwise.
+
+    :param path: file to write
+    :param mode: ``'w'`` for text, ``'wb'`` for binary
+    :param suffix: suffix of the temporary file
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=_INCOMING_PREFIX, suffix=suffix)
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def read_json(path: Path, version: int, description: str) -> dict:
+    """
+    Read a JSON object written by ``write_json``.
+
+    :param path: JSON file
+    :param version: expected format version
+    :param description: what the file is, for the warning if it cannot be read
+    :returns: the object, or an empty dict if the file does not exist, cannot be read,
+              or is of another version
+    """
+    try:
+        data = json.loads(path.read_text())
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning('Ignoring unreadable {} {}: {}', description, path, e)
+        return {}
+    if not isinstance(data, dict) or data.get('version') != version:
+        return {}
+    return data
+
+
+def write_json(path: Path, version: int, data: dict):
+    """
+    Write a JSON object along with its format version, atomically.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    text = json.dumps({'version': version, **data}, indent=1, sort_keys=True)
+    with atomic_writer(path, suffix='.json') as f:
+        f.write(text)
+
+
+
+@contextlib.contextmanager
+def locked(path: Path) -> Iterator[None]:
+    """
+    Hold an exclusive lock on ``path`` (by locking ``path.lock`` next to it),
+    for a read-modify-write of a file which other processes also update.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + '.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,135 @@
+"""
+Limits on the CPU and memory of this process imposed by cgroups (v1 or v2),
+e.g. by the CPU and memory limits of a container.
+
+``os.sched_getaffinity`` counts every CPU of the node even if the container
+may only use a fraction of them. Running as many concurrent ``ray_trace``
+processes as there are CPUs then oversubscribes the CPU quota, and every
+process is throttled.
+"""
+
+import math
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, Optional, TypeVar
+
+T = TypeVar('T')
+
+CGROUP_ROOT = Path('/sys/fs/cgroup')
+PROC_CGROUP = Path('/proc/self/cgroup')
+JOB_MEMORY = 256 * 1024 ** 2
+"""rough peak memory of one command, e.g. ``ray_trace`` of a pair of CIVET surfaces"""
+_UNLIMITED_MEMORY = 2 ** 60
+"""cgroup v1 reports "no limit" as a very large number"""
+
+
+@dataclass(frozen=True)
+class Limits:
+    """
+    Resources available to this process.
+    """
+    cpus: float
+    """number of CPUs which may be used, possibly fractional"""
+    memory: Optional[int] = None
+    """maximum memory in bytes, or ``None`` if unlimited"""
+
+    @classmethod
+    def detect(cls, cgroup_root: Path = CGROUP_ROOT, proc_cgroup: Path = PROC_CGROUP) -> 'Limits':
+        """
+        Find the limits of this process from its cgroups.
+        """
+        cgroups = _read_proc_cgroup(proc_cgroup)
+        quota = _min_over(_controller_dirs(cgroup_root, cgroups, 'cpu'), _read_cpu_quota)
+        cpus = float(len(os.sched_getaffinity(0)))
+        if quota is not None:
+            cpus = min(cpus, quota)
+        memory = _min_over(_controller_dirs(cgroup_root, cgroups, 'memory'), _read_memory_limit)
+        return cls(cpus, memory)
+
+    def jobs(self, reserved_memory: int = 0) -> int:
+        """
+        Number of commands which may run at the same time: at most one per whole CPU
+        (but at least one), and as many as fit in memory.
+
+        :param reserved_memory: memory used by this process (and its worker processes),
+                                which is not available to commands
+        """
+        jobs = max(1, math.floor(self.cpus))
+        if self.memory is not None:
+            jobs = min(jobs, max(1, (self.memory - reserved_memory) // JOB_MEMORY))
+        return jobs
+
+
+def _read_proc_cgroup(path: Path) -> dict[str, str]:
+    """
+    Parse ``/proc/self/cgroup``.
+
+    :returns: path of the cgroup of every controller, where ``''`` is the cgroup v2 hierarchy
+    """
+    cgroups = {}
+    try:
+        lines = path.read_text().splitlines()
+    except OSError:
+        return cgroups
+    for line in lines:
+        parts = line.split(':', 2)
+        if len(parts) != 3:
+            continue
+        _, controllers, cgroup = parts
+        for controller in controllers.split(',') if controllers else ('',):
+            cgroups[controller] = cgroup.lstrip('/')
+    return cgroups
+
+
+def _controller_dirs(root: Path, cgroups: dict[str, str], controller: str) -> Iterator[tuple[str, Path]]:
+    """
+    Directories of the cgroup of this process and of its ancestors, for either version of cgroups.
+
+    Inside of a container, the cgroup of the container is usually mounted at the root
+    (and the path in ``/proc/self/cgroup`` does not exist), so the root is always tried.
+
+    :returns: generator of the cgroup version and a directory
+    """
+    for version, base, cgroup in (('v1', root / controller, cgroups.get(controller)), ('v2', root, cgroups.get(''))):
+        if cgroup is None:
+            continue
+        directory = base / cgroup
+        while True:
+            if directory.is_dir():
+                yield version, directory
+            if directory == base:
+                break
+            directory = directory.parent
+
+
+def _min_over(dirs: Iterator[tuple[str, Path]], read: Callable[[str, Path], Optional[T]]) -> Optional[T]:
+    limits = []
+    for version, directory in dirs:
+        try:
+            limit = read(version, directory)
+        except (OSError, ValueError):
+            continue
+        if limit is not None:
+            limits.append(limit)
+    return min(limits, default=None)
+
+
+def _read_cpu_quota(version: str, directory: Path) -> Optional[float]:
+    if version == 'v2':
+        quota, period = (directory / 'cpu.max').read_text().split()
+        if quota == 'max':
+            return None
+        return int(quota) / int(period)
+    quota = int((directory / 'cpu.cfs_quota_us').read_text())
+    if quota <= 0:
+        return None
+    return quota / int((directory / 'cpu.cfs_period_us').read_text())
+
+
+def _read_memory_limit(version: str, directory: Path) -> Optional[int]:
+    if version == 'v2':
+        limit = (directory / 'memory.max').read_text().strip()
+        return None if limit == 'max' else int(limit)
+    limit = int((directory / 'memory.limit_in_bytes').read_text())
+    return None if limit >= _UNLIMITED_MEMORY else limit
@@ -0,0 +1,124 @@
+"""
+Resource usage of the commands and Python tasks run for every subject.
+
+Every command is recorded with its wall time, CPU time (user and system) and peak
+resident memory, which are measured for that process alone using ``os.wait4``.
+Python tasks are recorded with the CPU time of the thread which ran them; their
+times include any command they run themselves.
+
+The stage of a command is the name of its program, e.g. ``ray_trace``, and the
+stage of a Python task is ``python:`` followed by the name of the function.
+"""
+
+import csv
+import dataclasses
+import json
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class Measurement:
+    """
+    Resources used by one command or Python task.
+    """
+    subject: str
+    stage: str
+    wall_time: float
+    """seconds"""
+    cpu_time: float
+    """user and system CPU time in seconds"""
+    max_rss: Optional[int] = None
+    """peak resident memory in bytes, not known for Python tasks"""
+    cached: bool = False
+    """whether the output was found in the cache instead of running the command"""
+
+
+CSV_FIELDS = tuple(f.name for f in dataclasses.fields(Measurement))
+
+
+class Profile:
+    """
+    Measurements of every command and Python task of a run, collected from many threads.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__measurements: list[Measurement] = []
+
+    def record(self, measurement: Measurement):
+        with self.__lock:
+            self.__measurements.append(measurement)
+
+    @property
+    def measurements(self) -> list[Measurement]:
+        with self.__lock:
+            return list(self.__measurements)
+
+    def summary(self) -> dict:
+        """
+        Totals per stage and per subject.
+
+        :returns: JSON-serializable ``{'stages': {...}, 'subjects': {...}}``,
+                  where subjects also have their wall time per stage
+        """
+        stages = defaultdict(_Totals)
+        subjects = defaultdict(_Totals)
+        subject_stages = defaultdict(lambda: defaultdict(float))
+        for m in self.measurements:
+            stages[m.stage].add(m)
+            subjects[m.subject].add(m)
+            subject_stages[m.subject][m.stage] += m.wall_time
+        return {
+            'stages': {stage: totals.to_dict() for stage, totals in sorted(stages.items())},
+            'subjects': {
+                subject: totals.to_dict() | {'wall_time_per_stage': dict(sorted(subject_stages[subject].items()))}
+                for subject, totals in sorted(subjects.items())
+            }
+        }
+
+    def write_json(self, path: Path):
+        """
+        Write the totals per stage and per subject.
+        """
+        path.write_text(json.dumps(self.summary(), indent=1))
+
+    def write_csv(self, path: Path):
+        """
+        Write every measurement, one per row.
+        """
+        with path.open('w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDS)
+            for m in self.measurements:
+                writer.writerow(dataclasses.astuple(m))
+
+
+class _Totals:
+    def __init__(self):
+        self.count = 0
+        self.cached = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.max_rss: Optional[int] = None
+
+    def add(self, m: Measurement):
+        self.count += 1
+        self.cached += m.cached
+        self.wall_time += m.wall_time
+        self.cpu_time += m.cpu_time
+        if m.max_rss is not None:
+            self.max_rss = max(self.max_rss or 0, m.max_rss)
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'cached': self.cached,
+            'wall_time': self.wall_time,
+            'cpu_time': self.cpu_time,
+            'mean_wall_time': self.wall_time / self.count if self.count else 0.0,
+            'max_rss': self.max_rss
+        }
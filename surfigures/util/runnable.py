@@ -1,10 +1,34 @@
 import abc
 import os
+from concurrent.futures import Future
 from pathlib import Path
-from typing import Generic, TypeVar, Sequence
+from typing import Callable, Generic, TypeVar, Sequence
 import subprocess as sp
 
 T = TypeVar('T')
+F = TypeVar('F', bound=Callable)
+
+
+class TaskError(Exception):
+    """
+    A Python function submitted to a ``Runner`` failed.
+    """
+    pass
+
+
+def process_safe(fn: F) -> F:
+    """
+    Mark a function which ``Runner.submit_function`` may call in another process.
+
+    Such a function has arguments which can be pickled, communicates only through files and
+    its return value, and only uses its ``Runner`` argument (if any) to ``run`` commands.
+    """
+    fn.process_safe = True
+    return fn
+
+
+def is_process_safe(fn: Callable) -> bool:
+    return getattr(fn, 'process_safe', False)
 
 
 class Runner(abc.ABC):
@@ -28,6 +52,47 @@ class Runner(abc.ABC):
     def run(self, cmd: Sequence[str | os.PathLike], stdout=sp.DEVNULL, stderr=sp.DEVNULL) -> sp.CompletedProcess:
         ...
 
+    def submit(self, cmd: Sequence[str | os.PathLike], produces: Sequence[Path] = (),
+               stdout=sp.DEVNULL, stderr=sp.DEVNULL, cacheable: bool = False) -> Future[sp.CompletedProcess]:
+        """
+        Run a command in the background.
+
+        Implementations may run ``cmd`` concurrently with other submitted commands,
+        but only after the commands which produce any of its arguments have finished.
+
+        :param cmd: command to run
+        :param produces: output files created by ``cmd``, which other commands might depend on
+        :param cacheable: whether the output of ``cmd`` is entirely determined by its arguments,
+                          where arguments of type ``Path`` are input files.
+                          Implementations may reuse previously created outputs of cacheable commands.
+        :returns: a future for the completed process
+        """
+        f = Future()
+        try:
+            f.set_result(self.run(cmd, stdout=stdout, stderr=stderr))
+        except sp.CalledProcessError as e:
+            f.set_exception(e)
+        return f
+
+    def submit_function(self, fn: Callable[..., T], *args, produces: Sequence[Path] = ()) -> Future[T]:
+        """
+        Call a Python function in the background, in place of running a command.
+
+        Like ``submit``, arguments of type ``Path`` (or sequences of ``Path``) are input files,
+        and the function is only called after the commands which produce them have finished.
+
+        :param fn: function to call
+        :param produces: output files created by ``fn``
+        :returns: a future for the return value of ``fn``. If ``fn`` raises an exception,
+                  the future fails with ``TaskError``.
+        """
+        f = Future()
+        try:
+            f.set_result(fn(*args))
+        except Exception as e:
+            f.set_exception(TaskError(f'{fn.__qualname__} failed: {e!r}'))
+        return f
+
 
 class Runnable(abc.ABC, Generic[T]):
     """
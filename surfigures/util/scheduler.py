@@ -0,0 +1,181 @@
+"""
+A dependency-aware worker pool for running the nodes of a task graph.
+
+Tasks are submitted together with the futures which they depend on.
+A task is only handed to a worker once all of its dependencies have
+completed, so workers never block waiting on each other and a single
+pool can be shared by every subject of a run.
+"""
+
+import heapq
+import itertools
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Callable, Iterable, TypeVar
+
+from surfigures.util.limits import Limits
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class Scheduler:
+    """
+    A ``ThreadPoolExecutor`` which understands dependencies between tasks.
+    """
+
+    def __init__(self, max_workers: int):
+        self.__max_workers = max_workers
+        self.__pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='surfigures-worker')
+
+    @property
+    def max_workers(self) -> int:
+        return self.__max_workers
+
+    def submit(self, fn: Callable[..., T], *args, after: Iterable[Future] = ()) -> Future[T]:
+        """
+        Call ``fn(*args)`` in the worker pool after every future of ``after`` is done.
+
+        If any dependency failed, ``fn`` is not called and the returned future
+        fails with the same exception.
+        """
+        result: Future[T] = Future()
+
+        def start():
+            try:
+                inner = self.__pool.submit(fn, *args)
+            except RuntimeError as e:  # pool was shut down
+                result.set_exception(e)
+                return
+            _chain(inner, result)
+
+        when_all_done(after, start, result)
+        return result
+
+    def shutdown(self, wait: bool = True):
+        self.__pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+
+class LargestFirst:
+    """
+    Hands tasks to an executor, so that whenever a worker is free it starts
+    the task of highest priority among those which are waiting.
+
+    Tasks may be submitted while others are running.
+    """
+
+    def __init__(self, executor: Executor):
+        self.__executor = executor
+        self.__lock = threading.Lock()
+        self.__waiting: list[tuple[float, int, Future, Callable, tuple]] = []
+        self.__counter = itertools.count()
+
+    def submit(self, priority: float, fn: Callable[..., T], *args) -> Future[T]:
+        """
+        Call ``fn(*args)`` once a worker is free and no waiting task has a higher priority.
+        Tasks of the same priority are started in the order they were submitted.
+        """
+        result: Future[T] = Future()
+        with self.__lock:
+            heapq.heappush(self.__waiting, (-priority, next(self.__counter), result, fn, args))
+        # every call of __run_next starts one task, the one of highest priority at that time
+        self.__executor.submit(self.__run_next)
+        return result
+
+    def __run_next(self):
+        with self.__lock:
+            _, _, result, fn, args = heapq.heappop(self.__waiting)
+        if not result.set_running_or_notify_cancel():
+            return
+        try:
+            result.set_result(fn(*args))
+        except BaseException as e:
+            result.set_exception(e)
+
+
+def default_workers() -> int:
+    """
+    Number of commands to run at the same time, given the CPU and memory limits of this process.
+    """
+    return Limits.detect().jobs()
+
+
+def completed(value: T) -> Future[T]:
+    """
+    Create a future which is already done.
+    """
+    f: Future[T] = Future()
+    f.set_result(value)
+    return f
+
+
+def then(future: Future[T], fn: Callable[[T], R]) -> Future[R]:
+    """
+    Transform the result of a future. ``fn`` should be cheap, it is called
+    by whichever thread completes ``future``.
+    """
+    result: Future[R] = Future()
+
+    def callback(f: Future[T]):
+        if f.exception() is not None:
+            result.set_exception(f.exception())
+            return
+        try:
+            result.set_result(fn(f.result()))
+        except BaseException as e:
+            result.set_exception(e)
+
+    future.add_done_callback(callback)
+    return result
+
+
+def gather(*futures: Future[T]) -> Future[list[T]]:
+    """
+    Combine futures into a future of a list of their results.
+    """
+    result: Future[list[T]] = Future()
+    when_all_done(futures, lambda: result.set_result([f.result() for f in futures]), result)
+    return result
+
+
+def when_all_done(futures: Iterable[Future], fn: Callable[[], None], result: Future):
+    """
+    Call ``fn()`` once all of ``futures`` are done. If any of them failed,
+    ``fn`` is not called and the exception is set on ``result`` instead.
+    """
+    futures = list(futures)
+    if not futures:
+        fn()
+        return
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def callback(f: Future):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if not last:
+            return
+        failed = next((d.exception() for d in futures if d.exception() is not None), None)
+        if failed is not None:
+            result.set_exception(failed)
+        else:
+            fn()
+
+    for dep in futures:
+        dep.add_done_callback(callback)
+
+
+def _chain(source: Future[T], destination: Future[T]):
+    def callback(f: Future[T]):
+        if f.exception() is not None:
+            destination.set_exception(f.exception())
+        else:
+            destination.set_result(f.result())
+    source.add_done_callback(callback)
@@ -0,0 +1,98 @@
+"""
+Choosing where temporary files of a subject are written.
+
+By default, temporary files are written to the default temporary directory,
+which might be on network-backed scratch storage. In memory mode, they are written
+to a memory-backed file system (``/dev/shm``), so that tiles are handed to the
+compositing step without any disk traffic.
+
+Subjects which run at the same time all see the same free space, so the space each
+subject may need is reserved until its temporary directory is deleted.
+"""
+
+import contextlib
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Iterator, Optional
+
+from loguru import logger
+
+SHM = Path('/dev/shm')
+
+
+def memory_tmp_root() -> Optional[Path]:
+    """
+    :returns: a directory backed by memory, or ``None`` if there is none
+    """
+    if SHM.is_dir() and os.access(SHM, os.W_OK | os.X_OK):
+        return SHM
+    logger.warning('{} is not available, temporary files will be written to disk', SHM)
+    return None
+
+
+class MemoryTmp:
+    """
+    A memory-backed directory shared by the subjects of a run, which keeps track of
+    the space reserved by the subjects using it.
+    """
+
+    def __init__(self, root: Path):
+        self.__root = root
+        self.__lock = threading.Lock()
+        self.__reserved = 0
+
+    @property
+    def root(self) -> Path:
+        return self.__root
+
+    @property
+    def reserved(self) -> int:
+        with self.__lock:
+            return self.__reserved
+
+    @contextlib.contextmanager
+    def reserve(self, needed: int, limit: int, title: str) -> Iterator[Optional[Path]]:
+        """
+        Decide where to create the temporary directory of a subject, like ``choose_tmp_parent``,
+        and reserve ``needed`` bytes of memory until the context is exited.
+
+        :returns: context of ``root``, or ``None`` for the default temporary directory
+        """
+        with self.__lock:
+            parent = choose_tmp_parent(self.__root, needed, limit, title, self.__reserved)
+            if parent is not None:
+                self.__reserved += needed
+        try:
+            yield parent
+        finally:
+            if parent is not None:
+                with self.__lock:
+                    self.__reserved -= needed
+
+
+def choose_tmp_parent(memory_root: Optional[Path], needed: int, limit: int, title: str,
+                      reserved: int = 0) -> Optional[Path]:
+    """
+    Decide where to create the temporary directory of a subject.
+
+    :param memory_root: memory-backed directory, or ``None`` to always use the disk
+    :param needed: estimated size of the subject's temporary files, in bytes
+    :param limit: maximum size of temporary files in memory per subject, in bytes
+    :param title: name of the subject, for logging
+    :param reserved: bytes of ``memory_root`` reserved by other subjects
+    :returns: ``memory_root``, or ``None`` for the default temporary directory
+    """
+    if memory_root is None:
+        return None
+    if needed > limit:
+        logger.info('{} needs about {} MiB of temporary files, more than the limit of {} MiB in memory. '
+                    'Using disk instead.', title, needed >> 20, limit >> 20)
+        return None
+    free = shutil.disk_usage(memory_root).free - reserved
+    if needed > free:
+        logger.info('{} needs about {} MiB of temporary files, but only {} MiB is free (and not reserved) in {}. '
+                    'Using disk instead.', title, needed >> 20, free >> 20, memory_root)
+        return None
+    return memory_root
@@ -0,0 +1,113 @@
+"""
+A pool of long-lived worker processes for the in-process replacements of MNI tools.
+
+Python functions submitted to a ``Runner`` normally run on threads, where parsing and
+formatting of text files holds the GIL. Functions marked with ``process_safe`` can
+instead run in a ``WorkerPool``, where each worker is started once (from a fork server
+which has already imported NumPy and the replacements) and keeps its own cache of parsed
+files for the whole run.
+
+Only the function, its arguments and its (small) return value go through pipes.
+Outputs such as coloured surfaces and tiles are files. Every ``.obj`` file is parsed
+once into a binary sidecar in the sidecar directory of the run, which every worker
+memory-maps, so the pages of a surface are shared between processes (see
+``surfigures.io.cache.default_sidecar_dir``).
+"""
+
+import multiprocessing
+import os
+import shlex
+import subprocess as sp
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional, Sequence, TypeVar
+
+from surfigures.io import cache as io_cache
+from surfigures.util.runnable import Runner
+
+T = TypeVar('T')
+
+PRELOAD = (
+    'numpy',
+    'surfigures.draw.colour',
+    'surfigures.draw.composite',
+    'surfigures.draw.raster',
+    'surfigures.draw.stats',
+    'surfigures.inputs.subject',
+)
+"""modules imported by the fork server, which every worker starts with"""
+
+
+class WorkerPool:
+    """
+    Calls functions in long-lived worker processes.
+    """
+
+    def __init__(self, max_workers: int, data_cache_size: int = io_cache.DEFAULT_MAX_BYTES,
+                 sidecar_dir: Optional[Path] = None):
+        """
+        :param max_workers: number of worker processes
+        :param data_cache_size: memory budget of the cache of parsed files of every worker
+        :param sidecar_dir: directory of binary copies of surfaces shared by every process,
+                            see ``surfigures.io.cache.default_sidecar_dir``
+        """
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(list(PRELOAD))
+        self.__pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                          initializer=_init_worker, initargs=(data_cache_size, sidecar_dir))
+
+    def call(self, fn: Callable[..., T], args: tuple) -> tuple[T, list[str], float]:
+        """
+        Call ``fn(*args)`` in a worker process and wait for its result. An argument which
+        is a ``Runner`` is replaced by a runner in the worker, which runs commands itself.
+
+        :returns: the return value of ``fn``, the commands it ran, and the CPU time it used
+        :raises: the exception raised by ``fn``
+        """
+        sent = tuple(_RunnerPlaceholder() if isinstance(arg, Runner) else arg for arg in args)
+        return self.__pool.submit(_call, fn, sent).result()
+
+    def shutdown(self):
+        self.__pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+
+class _RunnerPlaceholder:
+    pass
+
+
+class _WorkerRunner(Runner):
+    """
+    Runs the commands of a function called in a worker, e.g. when it falls back to an MNI tool.
+    """
+
+    def __init__(self):
+        self.commands: list[str] = []
+
+    @property
+    def tmp_dir(self) -> Path:
+        return Path(tempfile.gettempdir())
+
+    def run(self, cmd: Sequence[str | os.PathLike], stdout=sp.DEVNULL, stderr=sp.DEVNULL) -> sp.CompletedProcess:
+        self.commands.append(shlex.join(map(str, cmd)))
+        return sp.run(cmd, stdout=stdout, stderr=stderr, check=True, text=True)
+
+
+def _init_worker(data_cache_size: int, sidecar_dir: Optional[Path]):
+    io_cache.shared.max_bytes = data_cache_size
+    io_cache.default_sidecar_dir = sidecar_dir
+
+
+def _call(fn: Callable[..., T], args: tuple) -> tuple[T, list[str], float]:
+    runner = _WorkerRunner()
+    args = tuple(runner if isinstance(arg, _RunnerPlaceholder) else arg for arg in args)
+    start = time.process_time()
+    result = fn(*args)
+    return result, runner.commands, time.process_time() - start
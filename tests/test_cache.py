@@ -0,0 +1,129 @@
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from surfigures.io.cache import ArrayCache
+from surfigures.util.cache import Deduplicator, RenderCache, parse_size
+
+
+@pytest.mark.parametrize(
+    "s, expected",
+    [
+        ('100', 100),
+        ('2K', 2048),
+        ('1.5M', 1536 * 1024),
+        ('10G', 10 * 1024 ** 3),
+        ('500Mi', 500 * 1024 ** 2),
+    ]
+)
+def test_parse_size(s, expected):
+    assert parse_size(s) == expected
+
+
+def test_key_depends_on_contents(tmp_path: Path):
+    cache = RenderCache(tmp_path / 'cache', 1000)
+    surface = tmp_path / 'a.obj'
+    surface.write_text('hello')
+    cmd = ('ray_trace', '-output', str(tmp_path / 'out.rgb'), surface)
+    key1 = cache.key(cmd, tmp_path / 'out.rgb')
+    assert key1 == cache.key(('ray_trace', '-output', str(tmp_path / 'other.rgb'), surface), tmp_path / 'other.rgb')
+    surface.write_text('changed')
+    os.utime(surface, ns=(1, 1))
+    assert key1 != cache.key(cmd, tmp_path / 'out.rgb')
+
+
+def _render(deduplicator: Deduplicator, surface: Path, output: Path, runs: list[Path]):
+    cmd = ('ray_trace', '-output', str(output), surface)
+    return deduplicator.run_once(deduplicator.key(cmd, output), output,
+                                 lambda: runs.append(output) or output.write_text('tile'))
+
+
+def test_deduplicator_runs_copies_once(tmp_path: Path):
+    deduplicator = Deduplicator()
+    runs = []
+    for name in ('a.obj', 'b.obj'):
+        (tmp_path / name).write_text('same surface')
+    _render(deduplicator, tmp_path / 'a.obj', tmp_path / 'a.rgb', runs)
+    assert _render(deduplicator, tmp_path / 'b.obj', tmp_path / 'b.rgb', runs) is None
+    assert runs == [tmp_path / 'a.rgb']
+    assert (tmp_path / 'b.rgb').read_text() == 'tile'
+    assert deduplicator.deduplicated == 1
+
+    # without a directory for the run, an output deleted along with its temporary
+    # directory is rendered again once, and the new output is shared from then on
+    for output in ('a.rgb', 'b.rgb'):
+        (tmp_path / output).unlink()
+    for output in ('c.rgb', 'd.rgb'):
+        _render(deduplicator, tmp_path / 'b.obj', tmp_path / output, runs)
+    assert runs == [tmp_path / 'a.rgb', tmp_path / 'c.rgb']
+    assert deduplicator.deduplicated == 2
+
+
+def test_deduplicator_outlives_subjects(tmp_path: Path):
+    (tmp_path / 'kept').mkdir()
+    deduplicator = Deduplicator(tmp_path / 'kept')
+    runs = []
+    surface = tmp_path / 'template.obj'
+    surface.write_text('template')
+    subjects = [tmp_path / name for name in ('a', 'b', 'c')]
+    for subject in subjects:
+        subject.mkdir()
+    _render(deduplicator, surface, subjects[0] / 'tile.rgb', runs)
+    shutil.rmtree(subjects[0])  # subject A is done
+    for subject in subjects[1:]:
+        assert _render(deduplicator, surface, subject / 'tile.rgb', runs) is None
+        assert (subject / 'tile.rgb').read_text() == 'tile'
+    assert runs == [subjects[0] / 'tile.rgb']
+    assert deduplicator.deduplicated == 2
+
+
+def test_store_fetch_and_evict(tmp_path: Path):
+    cache = RenderCache(tmp_path / 'cache', 10)
+    output = tmp_path / 'tile.rgb'
+    output.write_text('123456')
+    cache.store('aaaa.rgb', output)
+    assert cache.fetch('aaaa.rgb', tmp_path / 'fetched.rgb')
+    assert (tmp_path / 'fetched.rgb').read_text() == '123456'
+
+    os.utime(cache.directory / 'aa' / 'aaaa.rgb', (0, 0))
+    cache.store('bbbb.rgb', output)  # over size limit, the least recently used is evicted
+    assert not cache.fetch('aaaa.rgb', tmp_path / 'evicted.rgb')
+    assert cache.fetch('bbbb.rgb', tmp_path / 'kept.rgb')
+
+
+def test_array_cache_parses_once_and_evicts(tmp_path: Path):
+    calls = []
+
+    def loader(p: Path):
+        calls.append(p)
+        return np.zeros(100, dtype=np.uint8)
+
+    a = tmp_path / 'a.txt'
+    b = tmp_path / 'b.txt'
+    a.write_text('a')
+    b.write_text('b')
+    cache = ArrayCache(max_bytes=150)
+    (tmp_path / 'sub').mkdir()
+    cache.get(a, loader)
+    cache.get(tmp_path / 'sub' / '..' / 'a.txt', loader)
+    assert calls == [a]
+    cache.get(b, loader)  # a is evicted
+    cache.get(a, loader)
+    assert len(calls) == 3
+
+
+def test_deduplicator_evicts_kept_outputs(tmp_path: Path):
+    (tmp_path / 'kept').mkdir()
+    deduplicator = Deduplicator(tmp_path / 'kept', max_bytes=6)
+    runs = []
+    for name in ('a', 'b'):
+        (tmp_path / f'{name}.obj').write_text(name)
+        _render(deduplicator, tmp_path / f'{name}.obj', tmp_path / f'{name}.rgb', runs)
+        (tmp_path / f'{name}.rgb').unlink()
+    assert len(list((tmp_path / 'kept').iterdir())) == 1
+    _render(deduplicator, tmp_path / 'a.obj', tmp_path / 'a2.rgb', runs)  # evicted, rendered again
+    _render(deduplicator, tmp_path / 'b.obj', tmp_path / 'b2.rgb', runs)  # evicted by a2
+    assert runs == [tmp_path / 'a.rgb', tmp_path / 'b.rgb', tmp_path / 'a2.rgb', tmp_path / 'b2.rgb']
@@ -0,0 +1,16 @@
+import numpy as np
+
+from surfigures.draw.colour import COLOR_MAPS, LUT_SIZE, colour_vertices
+
+
+def test_colour_vertices_clamps_to_range():
+    data = np.array([-5.0, 0.0, 5.0, 10.0, 20.0])
+    colours = colour_vertices(data, 'gray', 0.0, 10.0)
+    assert colours.shape == (5, 4)
+    assert np.allclose(colours[:, 0], [0.0, 0.0, 128 / 255, 1.0, 1.0], atol=1e-6)
+    assert np.all(colours[:, 3] == 1.0)
+
+
+def test_inverted_color_map():
+    assert np.array_equal(COLOR_MAPS['hot'][::-1], COLOR_MAPS['hot_inv'])
+    assert len(COLOR_MAPS['spectral']) == LUT_SIZE
@@ -0,0 +1,40 @@
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from surfigures.draw.composite import Annotation, Layout, composite, stack, supports_colors
+from surfigures.io.sgi import write_sgi
+
+
+def test_composite(tmp_path: Path):
+    red = np.zeros((10, 20, 3), dtype=np.uint8)
+    red[:, :, 0] = 255
+    transparent = np.zeros((20, 20, 4), dtype=np.uint8)
+    write_sgi(tmp_path / 'red.rgb', red)
+    write_sgi(tmp_path / 'transparent.rgb', transparent)
+    layout = Layout(n_col=3, n_row=1, tile_size=20, spacing_x=1, spacing_y=5)
+    output = tmp_path / 'figure.png'
+    composite(output, (tmp_path / 'red.rgb', None, tmp_path / 'transparent.rgb'), layout,
+              [Annotation(50, 20, 'hi\nthere')], 'white', 'black', 8)
+
+    figure = np.asarray(Image.open(output).convert('RGB'))
+    assert figure.shape == (30, 66, 3)
+    assert tuple(figure[15, 11]) == (255, 0, 0)  # tile is centered in its cell
+    assert tuple(figure[5, 11]) == (255, 255, 255)
+    assert np.any(figure[:, 44:] != 255)  # text
+
+
+def test_supports_colors():
+    assert supports_colors('white', 'green', '#ff0000')
+    assert not supports_colors('black', 'green1')
+
+
+def test_stack(tmp_path: Path):
+    Image.new('RGB', (4, 2), 'red').save(tmp_path / 'a.png')
+    Image.new('RGB', (3, 1), 'blue').save(tmp_path / 'b.png')
+    stack(tmp_path / 'stacked.png', (tmp_path / 'a.png', tmp_path / 'b.png'), 'white')
+    stacked = np.asarray(Image.open(tmp_path / 'stacked.png'))
+    assert stacked.shape == (3, 4, 3)
+    assert tuple(stacked[2, 0]) == (0, 0, 255)
+    assert tuple(stacked[2, 3]) == (255, 255, 255)
@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import numpy as np
+
+from surfigures.cost import CostModel, read_n_points
+from surfigures.inputs.groups import DataFiles, Layer
+from surfigures.inputs.subject import SubjectSet
+from surfigures.io.obj import Surface, write_obj
+
+
+def _subject(tmp_path: Path, title: str, n_points: int, n_data_files: int) -> SubjectSet:
+    surface = Surface.from_points(np.random.rand(n_points, 3), np.array([[0, 1, 2]], dtype=np.int32))
+    obj = tmp_path / f'{title}.obj'
+    write_obj(obj, surface)
+    return SubjectSet(title, (tmp_path / title,), [Layer('layer', obj, obj)],
+                      [DataFiles(str(i), obj, obj) for i in range(n_data_files)])
+
+
+def test_read_n_points(tmp_path: Path):
+    subject = _subject(tmp_path, 'a', 100, 0)
+    assert read_n_points(subject.surfaces[0].left) == 100
+
+
+def test_estimates(tmp_path: Path):
+    small = _subject(tmp_path, 'small', 10, 0)
+    many_data_files = _subject(tmp_path, 'many_data_files', 10, 3)
+    many_points = _subject(tmp_path, 'many_points', 1000, 0)
+    timings = tmp_path / 'timings.json'
+
+    model = CostModel(timings)
+    assert model.estimate(small) < model.estimate(many_data_files) < model.estimate(many_points)
+    model.record(small, 4.0)
+    model.record(many_points, 1.0)
+    model.save()
+
+    model = CostModel(timings)
+    assert model.estimate(small) == 4.0
+    assert model.estimate(many_points) == 1.0
+    # 5 seconds for 2020 vertex-sections
+    assert np.isclose(model.estimate(many_data_files), 80 * 5 / 2020)
+
+
+def test_concurrent_saves_are_merged(tmp_path: Path):
+    a = _subject(tmp_path, 'a', 10, 0)
+    b = _subject(tmp_path, 'b', 10, 0)
+    timings = tmp_path / 'timings.json'
+    first = CostModel(timings)
+    second = CostModel(timings)
+    first.record(a, 2.0)
+    second.record(b, 3.0)
+    first.save()
+    second.save()
+
+    model = CostModel(timings)
+    assert model.estimate(a) == 2.0
+    assert model.estimate(b) == 3.0
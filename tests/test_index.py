@@ -0,0 +1,51 @@
+from pathlib import Path
+
+from surfigures.inputs.find import SubjectMapper
+from surfigures.inputs.index import DirIndex
+
+
+def _touch(*paths: Path):
+    for path in paths:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+
+
+def test_dir_index(tmp_path: Path):
+    _touch(tmp_path / 'a' / 'x.obj', tmp_path / 'a' / 'y.txt', tmp_path / 'b' / 'c' / 'z.obj')
+    (tmp_path / 'link').symlink_to(tmp_path / 'a')
+    index = DirIndex(tmp_path)
+    assert list(index.directories())[0] == tmp_path
+    assert set(index.leaf_directories()) == {tmp_path / 'a', tmp_path / 'b' / 'c', tmp_path / 'link'}
+    assert index.glob(tmp_path / 'a', '*.obj') == [tmp_path / 'a' / 'x.obj']
+    assert index.contains(tmp_path / 'b' / 'c', '*.obj')
+    assert not index.contains(tmp_path / 'b', '*.obj')
+    assert index.is_file(tmp_path / 'a' / 'y.txt')
+    assert index.exists(tmp_path / 'b') and not index.is_file(tmp_path / 'b')
+    assert not index.exists(tmp_path / 'a' / 'missing.txt')
+
+
+def test_dir_index_is_lazy(tmp_path: Path):
+    _touch(tmp_path / 'a' / 'x.obj')
+    (tmp_path / 'b').mkdir()
+    leaves = DirIndex(tmp_path).leaf_directories()
+    assert next(leaves) == tmp_path / 'a'
+    # not listed yet, so files added now are found
+    _touch(tmp_path / 'b' / 'c' / 'z.obj')
+    assert list(leaves) == [tmp_path / 'b' / 'c']
+
+
+def test_subject_mapper(tmp_path: Path):
+    incoming = tmp_path / 'incoming'
+    outgoing = tmp_path / 'outgoing'
+    _touch(
+        incoming / 'same' / 'gray_left.obj', incoming / 'same' / 'gray_right.obj',
+        incoming / 'same' / 'thickness_left.txt', incoming / 'same' / 'thickness_right.txt',
+        incoming / 'sided' / 'sub-left' / 'gray.obj', incoming / 'sided' / 'sub-right' / 'gray.obj',
+        incoming / 'broken' / 'gray_left.obj',
+    )
+    results = list(SubjectMapper(incoming, outgoing).map('.txt', '{}.png'))
+    found = {output.relative_to(outgoing): subject for (subject, output), _ in filter(lambda r: r[0], results)}
+    assert set(found) == {Path('same.png'), Path('sided') / 'sub.png'}
+    assert [d.caption for d in found[Path('same.png')].data_files] == ['thickness.txt']
+    assert found[Path('sided') / 'sub.png'].src == (incoming / 'sided' / 'sub-left', incoming / 'sided' / 'sub-right')
+    assert sum(1 for ok, err in results if err is not None) == 1
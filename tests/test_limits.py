@@ -0,0 +1,44 @@
+import os
+from pathlib import Path
+
+from surfigures.util.limits import JOB_MEMORY, Limits
+
+
+def _write(path: Path, text: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_cgroup_v2(tmp_path: Path):
+    proc = tmp_path / 'cgroup'
+    proc.write_text('0::/kubepods/pod/container\n')
+    root = tmp_path / 'fs'
+    _write(root / 'kubepods/pod/container/cpu.max', 'max 100000\n')
+    _write(root / 'kubepods/pod/container/memory.max', 'max\n')
+    _write(root / 'kubepods/pod/cpu.max', '50000 100000\n')
+    _write(root / 'kubepods/pod/memory.max', f'{4 * JOB_MEMORY}\n')
+    limits = Limits.detect(root, proc)
+    assert limits.cpus == min(0.5, len(os.sched_getaffinity(0)))
+    assert limits.memory == 4 * JOB_MEMORY
+    assert limits.jobs() == 1
+
+
+def test_cgroup_v1_in_container(tmp_path: Path):
+    proc = tmp_path / 'cgroup'
+    proc.write_text('4:memory:/docker/abc\n3:cpu,cpuacct:/docker/abc\n')
+    root = tmp_path / 'fs'
+    # the cgroup of the container is mounted at the root, /docker/abc does not exist
+    _write(root / 'cpu/cpu.cfs_quota_us', '-1\n')
+    _write(root / 'cpu/cpu.cfs_period_us', '100000\n')
+    _write(root / 'memory/memory.limit_in_bytes', f'{3 * JOB_MEMORY}\n')
+    limits = Limits.detect(root, proc)
+    assert limits.cpus == len(os.sched_getaffinity(0))
+    assert limits.memory == 3 * JOB_MEMORY
+
+
+def test_jobs():
+    assert Limits(cpus=8).jobs() == 8
+    assert Limits(cpus=1.5).jobs() == 1
+    assert Limits(cpus=0.5).jobs() == 1
+    assert Limits(cpus=8, memory=5 * JOB_MEMORY).jobs(reserved_memory=2 * JOB_MEMORY) == 3
+    assert Limits(cpus=8, memory=JOB_MEMORY).jobs(reserved_memory=2 * JOB_MEMORY) == 1
@@ -0,0 +1,53 @@
+import dataclasses
+import os
+from pathlib import Path
+
+from surfigures.inputs.groups import DataFiles, Layer
+from surfigures.inputs.subject import SubjectSet
+from surfigures.manifest import Manifest
+from surfigures.options import Options
+from surfigures.util.cache import ContentHasher
+
+
+class CountingHasher(ContentHasher):
+    def __init__(self):
+        super().__init__()
+        self.hashed = []
+
+    def hash(self, path: Path) -> str:
+        self.hashed.append(path)
+        return super().hash(path)
+
+
+OPTIONS = Options(range={}, min='0.0', max='10.0', bg='white', font_color='green', color_map='spectral')
+
+
+def test_manifest(tmp_path: Path):
+    files = []
+    for name in ('left.obj', 'right.obj', 'left.txt', 'right.txt'):
+        files.append(tmp_path / name)
+        files[-1].write_text(name)
+    subject = SubjectSet('subject', (tmp_path,), [Layer('layer', *files[:2])], [DataFiles('data', *files[2:])])
+    output = tmp_path / 'out' / 'subject.png'
+    output.parent.mkdir()
+    manifest_path = output.parent / 'manifest.json'
+
+    manifest = Manifest(manifest_path, OPTIONS)
+    assert not manifest.is_up_to_date(subject, output)
+    output.write_text('figure')
+    manifest.record(subject, output)
+    manifest.save()
+
+    manifest = Manifest(manifest_path, OPTIONS)
+    assert manifest.is_up_to_date(subject, output)
+    os.utime(files[2], ns=(1, 1))  # touched, same contents
+    assert manifest.is_up_to_date(subject, output)
+    manifest.save()
+    hasher = CountingHasher()
+    assert Manifest(manifest_path, OPTIONS, hasher).is_up_to_date(subject, output)
+    assert hasher.hashed == []  # the new modification time was recorded
+    files[2].write_text('changed')
+    assert not manifest.is_up_to_date(subject, output)
+
+    other_options = Manifest(manifest_path, dataclasses.replace(OPTIONS, color_map='hot'))
+    assert not other_options.is_up_to_date(dataclasses.replace(subject, data_files=[]), output)
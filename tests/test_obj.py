@@ -0,0 +1,99 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from surfigures.io.obj import Surface, average, prune_sidecars, read_obj, write_obj
+
+SQUARE_OBJ = """P 0.3 0.3 0.4 10 1 4
+0 0 0
+2 0 0
+2 2 0
+0 2 0
+
+0 0 1
+0 0 1
+0 0 1
+0 0 1
+
+2
+0 1 1 1 1
+
+3 6
+
+0 1 2 0 2 3
+"""
+
+
+def test_read_obj(tmp_path: Path):
+    obj = tmp_path / 'square.obj'
+    obj.write_text(SQUARE_OBJ)
+    surface = read_obj(obj)
+    assert surface.n_points == 4
+    assert surface.points.shape == (4, 3)
+    assert np.array_equal(surface.triangles, [[0, 1, 2], [0, 2, 3]])
+    assert surface.area() == pytest.approx(4.0)
+
+
+def test_read_not_obj(tmp_path: Path):
+    txt = tmp_path / 'data.txt'
+    txt.write_text('1.0\n2.0\n')
+    with pytest.raises(ValueError):
+        read_obj(txt)
+
+
+def test_write_and_read_colored(tmp_path: Path):
+    obj = tmp_path / 'square.obj'
+    obj.write_text(SQUARE_OBJ)
+    surface = read_obj(obj)
+    colours = np.linspace(0, 1, 16).reshape(4, 4)
+    colored = tmp_path / 'colored.obj'
+    write_obj(colored, surface, colours)
+    lines = colored.read_text().split('\n')
+    assert lines[11] == '2'  # number of triangles
+    assert lines[12] == '2'  # colour flag: one colour per vertex
+    assert len(lines[13].split()) == 4
+    reread = read_obj(colored)
+    assert np.array_equal(reread.points, surface.points)
+    assert np.array_equal(reread.triangles, surface.triangles)
+    assert np.allclose(reread.colours, colours, atol=1e-3)
+
+
+def test_sidecar(tmp_path: Path):
+    obj = tmp_path / 'square.obj'
+    obj.write_text(SQUARE_OBJ)
+    sidecar_dir = tmp_path / 'sidecars'
+    first = read_obj(obj, sidecar_dir)
+    assert len(list(sidecar_dir.glob('*.npy'))) == 4
+    second = read_obj(obj, sidecar_dir)
+    assert isinstance(second.points, np.memmap)
+    assert np.array_equal(first.triangles, second.triangles)
+
+
+def test_average(tmp_path: Path):
+    obj = tmp_path / 'square.obj'
+    obj.write_text(SQUARE_OBJ)
+    surface = read_obj(obj)
+    bigger = Surface.from_points(surface.points * 3, surface.triangles)
+    mid = average([surface, bigger])
+    assert np.allclose(mid.points, surface.points * 2)
+    assert np.allclose(mid.normals, [0, 0, 1])
+
+    other = Surface.from_points(surface.points, surface.triangles[::-1])
+    with pytest.raises(ValueError):
+        average([surface, other])
+
+
+def test_prune_sidecars(tmp_path: Path):
+    sidecar_dir = tmp_path / 'sidecars'
+    for name in ('old', 'new'):
+        obj = tmp_path / f'{name}.obj'
+        obj.write_text(SQUARE_OBJ)
+        read_obj(obj, sidecar_dir)
+    for sidecar in sidecar_dir.glob('old.*'):
+        os.utime(sidecar, ns=(1, 1))
+    size = sum(p.stat().st_size for p in sidecar_dir.glob('new.*'))
+    assert prune_sidecars(sidecar_dir, size) == 1
+    assert not list(sidecar_dir.glob('old.*'))
+    assert len(list(sidecar_dir.glob('new.*'))) == 4
@@ -0,0 +1,12 @@
+from surfigures.draw import constants
+from surfigures.options import Options
+
+
+def test_layout_scales_with_tile_size():
+    full = Options(range={}, min='0.0', max='10.0', bg='white', font_color='green', color_map='spectral')
+    assert (full.font_size, full.row_gap, full.col_cap) == (constants.FONT_SIZE, constants.ROW_GAP, constants.COL_CAP)
+    preview = Options(range={}, min='0.0', max='10.0', bg='white', font_color='green', color_map='spectral',
+                      tile_size=200, shadows=False)
+    assert (preview.font_size, preview.row_gap, preview.caption_offset) == (14, 25, 50)
+    assert preview.col_cap == 1
+    assert preview.fingerprint() != full.fingerprint()
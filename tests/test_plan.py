@@ -0,0 +1,67 @@
+import shutil
+import subprocess as sp
+from pathlib import Path
+
+import pytest
+
+from surfigures.plan import Plan, PlanError, PlanningRunner, run_plan
+
+
+def _count_lines(path: Path) -> str:
+    return f'{len(path.read_text().splitlines())} lines'
+
+
+def test_plan_and_run(tmp_path: Path):
+    source = tmp_path / 'source.txt'
+    source.write_text('a\nb\n')
+    copy = tmp_path / 'copy.txt'
+    both = tmp_path / 'both.txt'
+
+    plan = Plan()
+    runner = PlanningRunner(plan, tmp_path, 'subject')
+    runner.submit(('cp', source, copy), produces=(copy,))
+    runner.submit(('sh', '-c', 'cat "$0" "$1" > "$2"', source, copy, both), produces=(both,))
+    # queries of input files run while planning, queries of planned outputs cannot be planned
+    assert runner.submit_function(_count_lines, source).result() == '2 lines'
+    with pytest.raises(PlanError):
+        runner.submit_function(_count_lines, copy)
+    assert not copy.exists()
+
+    assert [step.after for step in plan.steps] == [(), (0,)]
+    assert plan.summary()['longest_chain'] == 2
+    plan.write_json(tmp_path / 'plan.json')
+    plan = Plan.read_json(tmp_path / 'plan.json')
+    assert run_plan(plan, jobs=2)
+    assert both.read_text() == 'a\nb\na\nb\n'
+
+
+def test_failed_step_skips_dependents(tmp_path: Path):
+    output = tmp_path / 'output'
+    plan = Plan()
+    plan.add('subject', 'false', ('false', str(output)), (), (output,))
+    plan.add('subject', 'cat', ('cat', str(output)), (output,), ())
+    assert not run_plan(plan, jobs=1)
+
+
+def test_extend(tmp_path: Path):
+    plan = Plan()
+    plan.add('first', 'touch', ('touch', str(tmp_path / 'a')), (), (tmp_path / 'a',))
+    subject_plan = Plan()
+    subject_plan.add('second', 'touch', ('touch', str(tmp_path / 'b')), (), (tmp_path / 'b',))
+    subject_plan.add('second', 'cp', ('cp', str(tmp_path / 'b'), str(tmp_path / 'c')),
+                     (tmp_path / 'b',), (tmp_path / 'c',))
+    plan.extend(subject_plan)
+    assert [(step.id, step.subject, step.after) for step in plan.steps] == [(0, 'first', ()), (1, 'second', ()),
+                                                                          (2, 'second', (1,))]
+
+
+@pytest.mark.skipif(shutil.which('make') is None, reason='make is not installed')
+def test_makefile(tmp_path: Path):
+    plan = Plan()
+    runner = PlanningRunner(plan, tmp_path, 'subject')
+    text = tmp_path / 'text.txt'
+    runner.submit(('sh', '-c', 'printf "$0" > "$1"', 'two\nlines', text), produces=(text,))
+    plan.write_json(tmp_path / 'plan.json')
+    plan.write_makefile(tmp_path / 'Makefile', tmp_path / 'plan.json')
+    sp.run(('make', '-s', '-f', tmp_path / 'Makefile'), check=True, cwd=Path(__file__).parent.parent)
+    assert text.read_text() == 'two\nlines'
@@ -0,0 +1,32 @@
+import io
+import subprocess as sp
+from pathlib import Path
+
+import pytest
+
+from surfigures.run import LoggedRunner
+from surfigures.util.profile import Profile
+
+
+def _hello(name: str) -> str:
+    return f'hello {name}'
+
+
+def test_profiled_runner(tmp_path: Path):
+    profile = Profile()
+    runner = LoggedRunner(tmp_path, io.StringIO(), profile=profile, subject='subject')
+    assert runner.run(('sh', '-c', 'echo out; echo err >&2'), stdout=sp.PIPE, stderr=sp.PIPE).stdout == 'out\n'
+    with pytest.raises(sp.CalledProcessError):
+        runner.run(('sh', '-c', 'exit 3'))
+    assert runner.submit_function(_hello, 'world').result() == 'hello world'
+
+    stages = [m.stage for m in profile.measurements]
+    assert stages == ['sh', 'sh', 'python:_hello']
+    assert all(m.max_rss > 0 for m in profile.measurements[:2])
+
+    summary = profile.summary()
+    assert summary['stages']['sh']['count'] == 2
+    assert summary['subjects']['subject']['count'] == 3
+
+    profile.write_csv(tmp_path / 'profile.csv')
+    assert len((tmp_path / 'profile.csv').read_text().splitlines()) == 4
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from surfigures.draw.raster import camera, render
+from surfigures.io.obj import Surface
+from surfigures.io.sgi import read_sgi, write_sgi
+
+TRIANGLES = np.array([[0, 1, 2], [0, 2, 3]], dtype=np.int32)
+SQUARE = Surface.from_points([[0, 0, 0], [2, 0, 0], [2, 2, 0], [0, 2, 0]], TRIANGLES)
+
+
+def test_camera():
+    line_of_sight, up = camera(('-view', '0', '0', '-2', '0', '1', '1'))
+    assert np.allclose(line_of_sight, [0, 0, -1])
+    assert np.allclose(up, [0, 1, 0])
+    with pytest.raises(ValueError):
+        camera(('-perspective',))
+
+
+def test_render_nearest_surface_is_visible():
+    red = np.tile([1.0, 0.0, 0.0, 1.0], (4, 1))
+    near = Surface(SQUARE.points + [0, 0, 1], SQUARE.normals, TRIANGLES, red)
+    image = render([SQUARE, near], ('-top',), 20)
+    assert image.shape == (20, 20, 4)
+    assert np.all(image[:, :, 3] == 255)
+    assert np.all(image[:, :, 0] == 255) and np.all(image[:, :, 1] == 0)
+
+    side = render([SQUARE], ('-left',), 20)
+    assert np.count_nonzero(side[:, :, 3]) == 0  # seen edge-on
+
+
+def test_sgi_round_trip(tmp_path: Path):
+    image = np.arange(2 * 3 * 4, dtype=np.uint8).reshape(2, 3, 4)
+    write_sgi(tmp_path / 'tile.rgb', image)
+    assert np.array_equal(read_sgi(tmp_path / 'tile.rgb'), image)
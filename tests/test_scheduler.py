@@ -0,0 +1,63 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from surfigures.util.scheduler import LargestFirst, Scheduler, gather
+
+
+def test_dependencies_run_first():
+    order = []
+    lock = threading.Lock()
+
+    def record(x):
+        with lock:
+            order.append(x)
+        return x
+
+    with Scheduler(max_workers=4) as scheduler:
+        a = scheduler.submit(record, 'a')
+        b = scheduler.submit(record, 'b')
+        c = scheduler.submit(record, 'c', after=[a, b])
+        d = scheduler.submit(record, 'd', after=[c])
+        assert gather(a, b, c, d).result() == ['a', 'b', 'c', 'd']
+    assert order.index('c') > order.index('a')
+    assert order.index('c') > order.index('b')
+    assert order[-1] == 'd'
+
+
+def test_failed_dependency_propagates():
+    called = []
+
+    def fail():
+        raise ValueError('oops')
+
+    with Scheduler(max_workers=2) as scheduler:
+        a = scheduler.submit(fail)
+        b = scheduler.submit(called.append, 'b', after=[a])
+        with pytest.raises(ValueError):
+            b.result()
+    assert called == []
+
+
+def test_largest_first():
+    started = []
+    running = threading.Event()
+    release = threading.Event()
+
+    def record(x):
+        started.append(x)
+        running.set()
+        release.wait()
+        return x
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        queue = LargestFirst(pool)
+        futures = [queue.submit(1, record, 1)]
+        running.wait()
+        futures += [queue.submit(priority, record, priority) for priority in (2, 5, 3, 4)]
+        futures[3].cancel()
+        release.set()
+    assert started == [1, 5, 4, 2]
+    assert futures[2].result() == 5
+    assert futures[3].cancelled()
@@ -0,0 +1,62 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from surfigures.args import parser
+from surfigures.inputs.groups import DataFiles, Layer
+from surfigures.inputs.subject import SubjectSet
+from surfigures.shard import Shard, assign, expected_cost, merge_main, write_summary
+
+
+def _subject(title: str, n_layers: int, n_data_files: int) -> SubjectSet:
+    p = Path(title)
+    return SubjectSet(title, (p,), [Layer(str(i), p, p) for i in range(n_layers)],
+                      [DataFiles(str(i), p, p) for i in range(n_data_files)])
+
+
+def test_parse():
+    assert Shard.parse('2/4') == Shard(2, 4)
+    for bad in ('0/4', '5/4', '2', 'a/b'):
+        with pytest.raises(ValueError):
+            Shard.parse(bad)
+
+
+def test_invalid_arguments_are_usage_errors():
+    assert parser.parse_args(['--shard', '2/4', '--max-memory', '4G']).shard == Shard(2, 4)
+    for bad in (['--shard', '5/4'], ['--max-memory', 'lots'], ['--cache-size=-1G']):
+        with pytest.raises(SystemExit):
+            parser.parse_args(bad)
+
+
+def test_select():
+    subjects = [(_subject(f'sub{i}', 1 + i % 3, i % 5), Path(f'sub{i}.png')) for i in range(50)]
+    shards = [Shard(i, 4).select(subjects) for i in range(1, 5)]
+    assert sorted(s.title for shard in shards for s, _ in shard) == sorted(s.title for s, _ in subjects)
+    assert Shard(3, 4).select(reversed(subjects)) == shards[2]
+    loads = [sum(expected_cost(s) for s, _ in shard) for shard in shards]
+    assert max(loads) - min(loads) <= max(expected_cost(s) for s, _ in subjects)
+
+
+def test_assign_is_independent_of_order():
+    subjects = [_subject(f'sub{i}', 1, i % 4) for i in range(20)]
+    by_title = dict(zip((s.title for s in subjects), assign(subjects, 3)))
+    reordered = subjects[::-1]
+    assert dict(zip((s.title for s in reordered), assign(reordered, 3))) == by_title
+
+
+def test_merge(tmp_path: Path, capsys):
+    for i in (1, 2):
+        shard = Shard(i, 2)
+        subject = _subject(f'sub{i}', 1, 1)
+        write_summary(tmp_path / shard.summary_name, shard, [(subject, tmp_path / f'sub{i}.png')], [10.0 * i], 30.0)
+    merge_main([str(tmp_path), '-o', str(tmp_path / 'merged.json')])
+    merged = json.loads((tmp_path / 'merged.json').read_text())
+    assert merged['n_subjects'] == 2
+    assert merged['total_seconds'] == 30.0
+    assert merged['missing_shards'] == []
+
+    (tmp_path / Shard(2, 2).summary_name).unlink()
+    with pytest.raises(SystemExit):
+        merge_main([str(tmp_path)])
+    assert json.loads(capsys.readouterr().out)['missing_shards'] == [2]
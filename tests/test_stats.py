@@ -0,0 +1,46 @@
+import re
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from surfigures.draw.stats import summarize
+from surfigures.io.vertstats import read_vertstats
+
+EXAMPLES = Path(__file__).parent.parent / 'examples'
+INCOMING = EXAMPLES / 'incoming' / 'same_folder'
+DATA_FILES = [
+    'mni_icbm_01_native_rms_tlaplace_30mm_left.txt',
+    'mni_icbm_01_native_rms_tlaplace_30mm_right.txt',
+    'mni_icbm_01_gray_surface_left_81920.smtherr.txt',
+    'mni_icbm_01_gray_surface_right_81920.smtherr.txt',
+]
+
+
+def _recorded_vertstats_stats() -> list[str]:
+    """
+    Outputs of ``vertstats_stats`` on ``DATA_FILES``, in the same order, as recorded in the example log.
+    """
+    log = (EXAMPLES / 'outgoing' / 'same_folder.log').read_text()
+    return re.findall(r"'(Column0: \n.*?)'", log, flags=re.DOTALL)
+
+
+@pytest.mark.parametrize('data_file, expected', list(zip(DATA_FILES, _recorded_vertstats_stats())))
+def test_same_as_vertstats_stats(data_file: str, expected: str):
+    actual = summarize(read_vertstats(INCOMING / data_file))
+    actual_lines = actual.split('\n')
+    expected_lines = expected.split('\n')
+    assert len(actual_lines) == len(expected_lines)
+    for a, e in zip(actual_lines, expected_lines):
+        a_label, _, a_value = a.partition(':')
+        e_label, _, e_value = e.partition(':')
+        assert a_label == e_label
+        assert len(a_value) - len(a_value.lstrip()) == len(e_value) - len(e_value.lstrip())
+        if e_value.strip():
+            # example data files are rounded to 6 significant digits, and vertstats_stats
+            # accumulates in single precision, so only the first few digits agree.
+            assert float(a_value) == pytest.approx(float(e_value), rel=1e-3)
+
+
+def test_median_of_even_count_is_upper_middle():
+    assert 'Median:  3\n' in summarize(np.array([4.0, 1.0, 3.0, 2.0]))
@@ -0,0 +1,22 @@
+import shutil
+from pathlib import Path
+
+from surfigures.util.tmp import MemoryTmp, choose_tmp_parent
+
+
+def test_choose_tmp_parent(tmp_path: Path):
+    assert choose_tmp_parent(None, 10, 100, 'subject') is None
+    assert choose_tmp_parent(tmp_path, 10, 100, 'subject') == tmp_path
+    assert choose_tmp_parent(tmp_path, 1000, 100, 'subject') is None
+
+
+def test_memory_tmp_reserves_space(tmp_path: Path):
+    memory_tmp = MemoryTmp(tmp_path)
+    free = shutil.disk_usage(tmp_path).free
+    with memory_tmp.reserve(free // 2 + 1, free, 'first') as first:
+        assert first == tmp_path
+        with memory_tmp.reserve(free // 2 + 1, free, 'second') as second:
+            assert second is None
+    assert memory_tmp.reserved == 0
+    with memory_tmp.reserve(free // 2 + 1, free, 'third') as third:
+        assert third == tmp_path
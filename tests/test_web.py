@@ -0,0 +1,38 @@
+import json
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from surfigures.draw import web
+from surfigures.draw.composite import Annotation, Layout
+from surfigures.draw.ray_trace import EmptyRayTrace, HemiPos, HemiRayTrace
+from surfigures.draw.tile import LazyTile, PositionedLabel
+from surfigures.io.sgi import write_sgi
+
+
+def test_web_section_and_manifest(tmp_path: Path):
+    red = np.zeros((20, 20, 3), dtype=np.uint8)
+    red[:, :, 0] = 255
+    write_sgi(tmp_path / 'red.rgb', red)
+    layout = Layout(n_col=2, n_row=1, tile_size=20, spacing_x=2, spacing_y=4)
+    web_dir = tmp_path / 'subject.web'
+
+    images = web.write_section(web_dir, 0, (tmp_path / 'red.rgb', None), layout, 'white')
+    assert [(i['width'], i['height']) for i in images] == [(48, 28), (24, 14), (12, 7)]
+    full = np.asarray(Image.open(web_dir / images[0]['file']).convert('RGB'))
+    assert tuple(full[14, 12]) == (255, 0, 0)
+
+    rows = [[LazyTile(HemiRayTrace(Path('lh.obj'), HemiPos.left), (PositionedLabel(0.1, 0.1, 'L'),)),
+             LazyTile(EmptyRayTrace())]]
+    section = web.describe_section('lh.obj', rows, layout, [Annotation(3, 6, 'L'), Annotation(30, 2, 'lh.obj')])
+    web.write_manifest(web_dir, 'subject', tmp_path / 'subject.png', [section, section], [images, images],
+                       28, 'white', 'green')
+
+    manifest = json.loads((web_dir / web.MANIFEST_NAME).read_text())
+    assert manifest['figure'] == 'subject.png'
+    assert (manifest['width'], manifest['height']) == (48, 56)
+    assert [s['top'] for s in manifest['sections']] == [0, 28]
+    assert manifest['sections'][0]['tiles'] == [
+        {'row': 0, 'col': 0, 'x': 2, 'y': 4, 'width': 20, 'height': 20, 'labels': ['L']}
+    ]
@@ -0,0 +1,49 @@
+import io
+from pathlib import Path
+
+import numpy as np
+
+from surfigures.draw.stats import summarize, vertstats_stats
+from surfigures.inputs.subject import _average_surfaces
+from surfigures.run import LoggedRunner
+from surfigures.util.workers import WorkerPool
+
+TRIANGLE_OBJ = """P 0.3 0.3 0.4 10 1 3
+0 0 0
+1 0 0
+0 1 0
+
+0 0 1
+0 0 1
+0 0 1
+
+1
+0 1 1 1 1
+
+3
+
+0 1 2
+"""
+
+
+def test_worker_processes(tmp_path: Path):
+    data = np.arange(10, dtype=np.float64)
+    data_file = tmp_path / 'data.txt'
+    np.savetxt(data_file, data)
+    log = io.StringIO()
+    with WorkerPool(max_workers=1) as workers:
+        runner = LoggedRunner(tmp_path, log, workers=workers)
+        assert runner.submit_function(vertstats_stats, runner, data_file).result() == summarize(data)
+        # not marked as process_safe, called in this process
+        assert runner.submit_function(summarize, data).result() == summarize(data)
+    assert 'vertstats_stats' in log.getvalue()
+
+
+def test_workers_use_sidecars(tmp_path: Path):
+    surface = tmp_path / 'triangle.obj'
+    surface.write_text(TRIANGLE_OBJ)
+    sidecar_dir = tmp_path / 'sidecars'
+    with WorkerPool(max_workers=1, sidecar_dir=sidecar_dir) as workers:
+        runner = LoggedRunner(tmp_path, io.StringIO(), workers=workers)
+        runner.submit_function(_average_surfaces, runner, tmp_path / 'mid.obj', (surface,)).result()
+    assert len(list(sidecar_dir.glob('triangle.*.npy'))) == 4